@@ -61,6 +61,7 @@ CUSTOM_APPS = [
     'advisors',
     'internships',
     'telegram_bot',
+    'notifications',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + CUSTOM_APPS
@@ -193,10 +194,21 @@ CELERY_TASK_ROUTES = {
     'advisors.tasks.*': {'queue': 'advisors'},
     'internships.tasks.*': {'queue': 'internships'},
     'telegram_bot.tasks.*': {'queue': 'telegram'},
+    'notifications.tasks.*': {'queue': 'notifications'},
 }
 
 CELERY_FLOWER_PORT = 5555
 
+# New third-year assignments are collected per advisor and mailed as one digest per window
+ADVISOR_DIGEST_WINDOW_SECONDS = int(os.getenv("ADVISOR_DIGEST_WINDOW_SECONDS", 300))
+# Delta sync: rows stamped this long before changed_since are sent again, since updated_at is set before commit
+ADVISOR_SYNC_OVERLAP_SECONDS = int(os.getenv("ADVISOR_SYNC_OVERLAP_SECONDS", 120))
+ADVISOR_SYNC_TOMBSTONE_DAYS = int(os.getenv("ADVISOR_SYNC_TOMBSTONE_DAYS", 30))  # Older clients reload the full dashboard
+# History rows written within this window share one analytics rollup rebuild per year
+ROLLUP_REFRESH_DELAY_SECONDS = int(os.getenv("ROLLUP_REFRESH_DELAY_SECONDS", 60))
+# An import job with no progress for this long no longer blocks re-uploading its file
+IMPORT_JOB_STALE_SECONDS = int(os.getenv("IMPORT_JOB_STALE_SECONDS", 1800))
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'AAU Internship Tracking API',
     'DESCRIPTION': 'API for managing Internships at AAU',
@@ -257,6 +269,47 @@ EMAIL_HOST_USER = 'aau57.sis@gmail.com'  # Your Gmail address
 EMAIL_HOST_PASSWORD = 'ypoa vdvv qcet haea'  # Your Gmail app password (explained below)
 DEFAULT_FROM_EMAIL = 'aau57.sis@gmail.com'  # The "from" email address that will appear in emails
 
+# Outgoing mail is queued in notifications.EmailOutbox and sent in batches over one SMTP connection
+EMAIL_OUTBOX_RATE_PER_MINUTE = int(os.getenv("EMAIL_OUTBOX_RATE_PER_MINUTE", 20))  # Provider send quota
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", 50))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", 5))
+
+# Internship status pushes to the Telegram bot, queued in telegram_bot.PendingStatusUpdate
+TELEGRAM_BOT_URL = os.getenv("TELEGRAM_BOT_URL", "https://is-internship-tracking-bot.onrender.com")
+TELEGRAM_BOT_TRANSPORT = 'telegram_bot.dispatcher.HttpStatusTransport'
+TELEGRAM_BOT_TIMEOUT = (3.05, 10)  # (connect, read) seconds; a cold bot host is retried later
+TELEGRAM_STATUS_BATCH_SIZE = int(os.getenv("TELEGRAM_STATUS_BATCH_SIZE", 100))
+TELEGRAM_STATUS_MAX_ATTEMPTS = int(os.getenv("TELEGRAM_STATUS_MAX_ATTEMPTS", 8))
+
+# Student document uploads, streamed to storage by students.storage
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # Larger uploads are spooled to a temp file rather than held in RAM
+DOCUMENT_UPLOAD_CHUNK_SIZE = 6 * 1024 * 1024  # Supabase's resumable (TUS) endpoint takes 6 MB chunks
+DOCUMENT_RESUMABLE_THRESHOLD = int(os.getenv("DOCUMENT_RESUMABLE_THRESHOLD", 6 * 1024 * 1024))
+DOCUMENT_SPOOL_DIR = os.getenv("DOCUMENT_SPOOL_DIR") or None  # Staged uploads for the worker; must be shared with it (default: system temp dir)
+DOCUMENT_MAX_UPLOAD_SIZE = int(os.getenv("DOCUMENT_MAX_UPLOAD_SIZE", 20 * 1024 * 1024))
+DOCUMENT_SIGNED_UPLOAD_EXPIRY = int(os.getenv("DOCUMENT_SIGNED_UPLOAD_EXPIRY", 15 * 60))  # Seconds a direct upload link and its token stay valid
+DOCUMENT_INSPECTION_WORKERS = int(os.getenv("DOCUMENT_INSPECTION_WORKERS", 2))  # Processes parsing stored reports in each worker
+DOCUMENT_INSPECTION_TIMEOUT = int(os.getenv("DOCUMENT_INSPECTION_TIMEOUT", 60))  # Seconds one PDF may take to parse
+
+# Storage backend: students.storage.LocalFileStorage, SupabaseStorage or S3Storage
+DOCUMENT_STORAGE_BACKEND = os.getenv("DOCUMENT_STORAGE_BACKEND", "students.storage.SupabaseStorage")
+DOCUMENT_STORAGE_TIMEOUT = (
+    float(os.getenv("DOCUMENT_STORAGE_CONNECT_TIMEOUT", 3.05)),
+    float(os.getenv("DOCUMENT_STORAGE_READ_TIMEOUT", 60)),
+)  # (connect, read) seconds
+DOCUMENT_STORAGE_POOL_SIZE = int(os.getenv("DOCUMENT_STORAGE_POOL_SIZE", 4))  # Keep-alive connections per process
+DOCUMENT_STORAGE_LOCAL_ROOT = os.getenv("DOCUMENT_STORAGE_LOCAL_ROOT", os.path.join(BASE_DIR, "documents"))
+DOCUMENT_STORAGE_LOCAL_URL = os.getenv("DOCUMENT_STORAGE_LOCAL_URL", "/documents/")
+SUPABASE_URL = os.getenv("SUPABASE_URL", "https://cavdgitwbubdtqdctvlz.supabase.co")
+SUPABASE_API_KEY = os.getenv("SUPABASE_API_KEY", "")  # Required by SupabaseStorage
+SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET", "student-document")
+DOCUMENT_STORAGE_S3_BUCKET = os.getenv("DOCUMENT_STORAGE_S3_BUCKET", "student-document")
+DOCUMENT_STORAGE_S3_ENDPOINT_URL = os.getenv("DOCUMENT_STORAGE_S3_ENDPOINT_URL", "")  # Empty for AWS
+DOCUMENT_STORAGE_S3_REGION = os.getenv("DOCUMENT_STORAGE_S3_REGION", "")
+DOCUMENT_STORAGE_S3_ACCESS_KEY_ID = os.getenv("DOCUMENT_STORAGE_S3_ACCESS_KEY_ID", "")
+DOCUMENT_STORAGE_S3_SECRET_ACCESS_KEY = os.getenv("DOCUMENT_STORAGE_S3_SECRET_ACCESS_KEY", "")
+DOCUMENT_STORAGE_S3_PUBLIC_URL = os.getenv("DOCUMENT_STORAGE_S3_PUBLIC_URL", "")  # Base URL documents are served from (default: the bucket endpoint)
+
 
 
 # Default primary key field type
@@ -36,4 +36,7 @@ urlpatterns = [
     path('aau_api/doc/schema/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
 ]
 
+# Documents kept by students.storage.LocalFileStorage (served only when DEBUG is on)
+urlpatterns += static(settings.DOCUMENT_STORAGE_LOCAL_URL, document_root=settings.DOCUMENT_STORAGE_LOCAL_ROOT)
+
 
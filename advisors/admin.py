@@ -1,4 +1,6 @@
 from django.contrib import admin
-from .models import Advisor
+from .models import Advisor, AdvisorDashboardStats, AdvisorSyncTombstone
 
-admin.site.register(Advisor)
\ No newline at end of file
+admin.site.register(Advisor)
+admin.site.register(AdvisorDashboardStats)
+admin.site.register(AdvisorSyncTombstone)
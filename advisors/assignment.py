@@ -0,0 +1,172 @@
+# advisors/assignment.py
+"""
+Capacity-aware batch assignment of students to advisors.
+
+An advisor's load is every student pointing at them in either
+ThirdYearStudentList or Student (a student moves from the first to the second
+on registration), counted for all advisors in one query. A batch is then
+assigned in memory from a heap ordered by load / assignment_weight, skipping
+advisors at max_students, and written back with one UPDATE per table.
+
+Callers take `lock_assignments()` inside their transaction before loading the
+engine, so two imports can't both hand out the same spare capacity.
+"""
+import heapq
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Case, Count, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from internships.models import ThirdYearStudentList
+from students.models import Student
+from utils.cache_namespaces import (
+    bump, advisor_namespace, student_namespace, telegram_namespace, ADMIN_NAMESPACE,
+)
+from .models import Advisor, AdvisorDashboardStats
+from .tasks import queue_assignment_digests
+
+# Application-wide key for pg_advisory_xact_lock
+ASSIGNMENT_LOCK_KEY = 0x41415531
+
+
+def lock_assignments():
+    """Serialize advisor assignment until the current transaction ends (Postgres only)"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [ASSIGNMENT_LOCK_KEY])
+
+
+def load_subquery(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(assigned_advisor=OuterRef('pk')).order_by()
+            .values('assigned_advisor').annotate(count=Count('pk')).values('count')
+        ),
+        0,
+    )
+
+
+class AdvisorAssignmentEngine:
+    """
+    Hands out the advisor with the lowest weighted load that still has room.
+    With every weight at 1 and no capacities this is the least-loaded-first,
+    then first_name, order get_next_available_advisor() always used.
+    """
+
+    def __init__(self):
+        advisors = Advisor.objects.annotate(
+            load=load_subquery(ThirdYearStudentList) + load_subquery(Student)
+        ).values_list('id', 'first_name', 'load', 'max_students', 'assignment_weight')
+
+        self.advisors = {}
+        self.heap = []
+        for advisor_id, first_name, load, max_students, weight in advisors:
+            self.advisors[advisor_id] = {
+                'first_name': first_name or '', 'load': load, 'max_students': max_students, 'weight': weight,
+            }
+            self.push(advisor_id)
+
+    def __bool__(self):
+        return bool(self.heap)
+
+    def load(self, advisor_id):
+        return self.advisors[advisor_id]['load']
+
+    def push(self, advisor_id):
+        advisor = self.advisors[advisor_id]
+        # A weight of 0 pauses new assignments for the advisor
+        if not advisor['weight']:
+            return
+        if advisor['max_students'] is not None and advisor['load'] >= advisor['max_students']:
+            return
+        heapq.heappush(self.heap, ((advisor['load'] + 1) / advisor['weight'], advisor['first_name'], advisor_id))
+
+    def next_advisor_id(self):
+        """The advisor for the next student, or None when every advisor is full"""
+        if not self.heap:
+            return None
+        _, _, advisor_id = heapq.heappop(self.heap)
+        self.advisors[advisor_id]['load'] += 1
+        self.push(advisor_id)
+        return advisor_id
+
+    def assign(self, keys):
+        """{key: advisor_id} for a batch, in order; keys left over once everyone is full are omitted"""
+        assignments = {}
+        for key in keys:
+            advisor_id = self.next_advisor_id()
+            if advisor_id is None:
+                break
+            assignments[key] = advisor_id
+        return assignments
+
+
+def apply_assignments(model, assignments):
+    """
+    Write {pk: advisor_id} with a single UPDATE. Rows that got an advisor in
+    the meantime are left alone. Returns the number of rows updated.
+    """
+    by_advisor = defaultdict(list)
+    for pk, advisor_id in assignments.items():
+        by_advisor[advisor_id].append(pk)
+    if not by_advisor:
+        return 0
+
+    changes = {
+        'assigned_advisor_id': Case(
+            *(When(pk__in=pks, then=Value(advisor_id)) for advisor_id, pks in by_advisor.items()),
+            output_field=IntegerField(),
+        ),
+    }
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        changes['updated_at'] = timezone.now()  # update() skips auto_now; delta sync reads it
+    return model.objects.filter(pk__in=assignments, assigned_advisor__isnull=True).update(**changes)
+
+
+def assign_students_to_advisors():
+    """
+    Give every registered and third-year student without an advisor one, in a
+    single locked pass. Returns (assigned, still unassigned because every
+    advisor is full).
+    """
+    with transaction.atomic():
+        lock_assignments()
+        engine = AdvisorAssignmentEngine()
+
+        # Registered students are already interning, so they go first
+        students = dict(
+            Student.objects.filter(assigned_advisor__isnull=True).order_by('id')
+            .values_list('id', 'university_id')
+        )
+        third_year_ids = list(
+            ThirdYearStudentList.objects.filter(assigned_advisor__isnull=True).order_by('university_id')
+            .values_list('university_id', flat=True)
+        )
+        student_assignments = engine.assign(students)
+        third_year_assignments = engine.assign(third_year_ids)
+
+        apply_assignments(Student, student_assignments)
+        apply_assignments(ThirdYearStudentList, third_year_assignments)
+
+        # The bulk UPDATEs skip the model signals, so their work is done here
+        queue_assignment_digests(
+            (advisor_id, university_id) for university_id, advisor_id in third_year_assignments.items()
+        )
+        for advisor_id in set(student_assignments.values()):
+            AdvisorDashboardStats.refresh(advisor_id)
+        telegram_ids = (
+            Student.objects.filter(id__in=student_assignments).exclude(telegram_id=None)
+            .values_list('telegram_id', flat=True)
+        )
+        bump(
+            ADMIN_NAMESPACE,
+            *(advisor_namespace(advisor_id)
+              for advisor_id in {*student_assignments.values(), *third_year_assignments.values()}),
+            *(student_namespace(students[pk]) for pk in student_assignments),
+            *(telegram_namespace(telegram_id) for telegram_id in telegram_ids),
+        )
+
+    assigned = len(student_assignments) + len(third_year_assignments)
+    return assigned, len(students) + len(third_year_ids) - assigned
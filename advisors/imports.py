@@ -0,0 +1,120 @@
+# advisors/imports.py
+"""
+Bulk advisor registration from an uploaded sheet.
+
+Taken emails and usernames are pre-fetched into sets, users and advisors are
+written with bulk_create, and the PBKDF2 hashing is spread over a thread
+pool (hashlib releases the GIL while it iterates).
+"""
+import random
+import string
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from notifications import outbox
+from utils.cache_namespaces import bump, ADMIN_NAMESPACE
+from .models import Advisor
+
+REQUIRED_COLUMNS = {'advisor_name', 'email', 'f_name', 'l_name', 'phone_number'}
+HASH_WORKERS = 4
+
+
+def generate_password(length=10):
+    """Generate a secure random password"""
+    return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
+
+
+def clean_string(value):
+    """Ensure value is string, trimmed, and non-null"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Numeric cells such as phone numbers
+    return str(value).strip()
+
+
+def read_headers(sheet):
+    headers = [cell.value for cell in next(sheet.iter_rows(min_row=1, max_row=1))]
+    if not REQUIRED_COLUMNS.issubset(headers):
+        raise ValueError(f"Missing required columns. Found: {set(h for h in headers if h)}. Required: {REQUIRED_COLUMNS}")
+    return headers
+
+
+def iter_sheet_rows(sheet, headers):
+    """Yield (row_number, {column: cleaned value}) for every non-empty data row"""
+    for row_number, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
+        if not row or not any(row):
+            continue
+        row_data = dict(zip(headers, row))
+        yield row_number, {column: clean_string(row_data.get(column)) for column in REQUIRED_COLUMNS}
+
+
+class AdvisorImport:
+    """One registration run: taken emails/usernames, pending rows and row errors"""
+
+    def __init__(self, hash_workers=HASH_WORKERS):
+        self.hash_workers = hash_workers
+        self.taken_emails = {email.lower() for email in User.objects.exclude(email='').values_list('email', flat=True)}
+        self.taken_usernames = set(User.objects.values_list('username', flat=True))
+        self.pending = []
+        self.errors = []
+
+    def unique_username(self, advisor_name):
+        base_username = advisor_name.replace(" ", "").lower()
+        username = base_username
+        counter = 1
+        while username in self.taken_usernames:
+            username = f"{base_username}{counter}"
+            counter += 1
+        self.taken_usernames.add(username)
+        return username
+
+    def row_error(self, row):
+        if not all(row.values()):
+            return "One or more required fields are empty."
+        if not row['phone_number'].isdigit():
+            return "Invalid phone number: must contain digits only."
+        if row['email'].lower() in self.taken_emails:
+            return "Email already exists."
+        return None
+
+    def add_rows(self, rows):
+        for row_number, row in rows:
+            error = self.row_error(row)
+            if error:
+                self.errors.append({"row": row_number, "email": row['email'], "error": error})
+                continue
+            self.taken_emails.add(row['email'].lower())
+            self.pending.append({
+                **row,
+                "username": self.unique_username(row['advisor_name']),
+                "password": generate_password(),
+            })
+
+    def hash_passwords(self):
+        with ThreadPoolExecutor(max_workers=self.hash_workers) as pool:
+            return list(pool.map(make_password, (row['password'] for row in self.pending)))
+
+    def save(self, credential_email):
+        """Create every pending user and advisor and queue `credential_email(...)` for each in the same transaction"""
+        password_hashes = self.hash_passwords()
+        users = [
+            User(username=row['username'], email=row['email'], password=password_hash, is_active=True)
+            for row, password_hash in zip(self.pending, password_hashes)
+        ]
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            Advisor.objects.bulk_create([
+                Advisor(user=user, first_name=row['f_name'], last_name=row['l_name'], phone_number=row['phone_number'])
+                for user, row in zip(users, self.pending)
+            ])
+            outbox.enqueue(*(
+                credential_email(row['advisor_name'], row['email'], row['username'], row['password'])
+                for row in self.pending
+            ))
+            # bulk_create skips post_save, so the cached admin advisor list is invalidated here
+            bump(ADMIN_NAMESPACE)
+        return len(users)
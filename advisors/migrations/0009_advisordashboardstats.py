@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advisors', '0008_delete_advisorlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdvisorDashboardStats',
+            fields=[
+                ('advisor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='dashboard_stats', serialize=False, to='advisors.advisor')),
+                ('assigned_students', models.PositiveIntegerField(default=0)),
+                ('pending_approval', models.PositiveIntegerField(default=0)),
+                ('reports_to_review', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advisors', '0009_advisordashboardstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdvisorSyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('student', 'Student'), ('offer_letter', 'Offer letter'), ('report', 'Report')], max_length=20)),
+                ('object_id', models.CharField(max_length=50)),
+                ('university_id', models.CharField(max_length=20)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+                ('advisor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_tombstones', to='advisors.advisor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['advisor', 'deleted_at'], name='advisors_ad_advisor_812310_idx')],
+            },
+        ),
+    ]
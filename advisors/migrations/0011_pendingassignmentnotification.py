@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advisors', '0010_advisorsynctombstone'),
+        ('internships', '0013_importjob_kind'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingAssignmentNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('advisor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_assignment_notifications', to='advisors.advisor')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='internships.thirdyearstudentlist')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['advisor', 'created_at'], name='advisors_pe_advisor_8fe793_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advisors', '0011_pendingassignmentnotification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='advisor',
+            name='assignment_weight',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='advisor',
+            name='max_students',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -1,6 +1,10 @@
+from datetime import timedelta
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.core.validators import EmailValidator
+from django.db.models.functions import Greatest
 
 class Advisor(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True)  
@@ -9,8 +13,117 @@ class Advisor(models.Model):
     last_name = models.CharField(max_length=50, blank=True, null=True)
     number_of_expected_reports = models.PositiveIntegerField(default=4)
     report_submission_interval_days = models.PositiveIntegerField(default=15)
+    # Assignment: None means no cap; a weight of 2 takes twice the share, 0 takes no new students
+    max_students = models.PositiveIntegerField(null=True, blank=True)
+    assignment_weight = models.PositiveSmallIntegerField(default=1)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
-    
-    
\ No newline at end of file
+
+
+class AdvisorDashboardStats(models.Model):
+    """Denormalized dashboard counters, kept in step by advisors.signals"""
+    advisor = models.OneToOneField(Advisor, on_delete=models.CASCADE, primary_key=True, related_name='dashboard_stats')
+    assigned_students = models.PositiveIntegerField(default=0)
+    pending_approval = models.PositiveIntegerField(default=0)
+    reports_to_review = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COUNTERS = ('assigned_students', 'pending_approval', 'reports_to_review')
+
+    def __str__(self):
+        return f"Dashboard stats for {self.advisor}"
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.COUNTERS}
+
+    @classmethod
+    def refresh(cls, advisor_id):
+        """Recompute the counters from the source tables (used on first read and after bulk writes)"""
+        from students.models import Student
+
+        counts = Student.objects.filter(assigned_advisor_id=advisor_id).aggregate(
+            assigned_students=models.Count('id', distinct=True),
+            pending_approval=models.Count(
+                'internshipofferletter',
+                filter=models.Q(internshipofferletter__advisor_approved='Pending'),
+                distinct=True
+            ),
+            reports_to_review=models.Count('internshipreport', distinct=True),
+        )
+        stats, _ = cls.objects.update_or_create(advisor_id=advisor_id, defaults=counts)
+        return stats
+
+    @classmethod
+    def apply_delta(cls, advisor_id, **deltas):
+        """Shift counters in place; falls back to a full refresh when the row does not exist yet"""
+        if not advisor_id:
+            return
+        changes = {
+            name: Greatest(models.F(name) + delta, 0)
+            for name, delta in deltas.items() if delta
+        }
+        if not changes:
+            return
+        if not cls.objects.filter(advisor_id=advisor_id).update(**changes):
+            cls.refresh(advisor_id)
+
+    @classmethod
+    def for_advisor(cls, advisor_id):
+        try:
+            return cls.objects.get(advisor_id=advisor_id)
+        except cls.DoesNotExist:
+            return cls.refresh(advisor_id)
+
+
+class AdvisorSyncTombstone(models.Model):
+    """Records rows that left an advisor's dashboard so delta-sync clients can drop them"""
+    KIND_CHOICES = [
+        ('student', 'Student'),
+        ('offer_letter', 'Offer letter'),
+        ('report', 'Report'),
+    ]
+
+    advisor = models.ForeignKey(Advisor, on_delete=models.CASCADE, related_name='sync_tombstones')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.CharField(max_length=50)
+    university_id = models.CharField(max_length=20)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['advisor', 'deleted_at'])]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} removed from {self.advisor}"
+
+    @staticmethod
+    def retention_cutoff():
+        """Changes before this can no longer be synced incrementally"""
+        return timezone.now() - timedelta(days=settings.ADVISOR_SYNC_TOMBSTONE_DAYS)
+
+    @classmethod
+    def record(cls, advisor_id, kind, object_id, university_id):
+        if advisor_id:
+            cls.objects.create(advisor_id=advisor_id, kind=kind, object_id=str(object_id), university_id=university_id)
+            # Each advisor's expired tombstones are pruned as new ones arrive
+            cls.objects.filter(advisor_id=advisor_id, deleted_at__lt=cls.retention_cutoff()).delete()
+
+
+class PendingAssignmentNotification(models.Model):
+    """A third-year student newly assigned to an advisor, waiting for the next assignment digest"""
+    advisor = models.ForeignKey(Advisor, on_delete=models.CASCADE, related_name='pending_assignment_notifications')
+    student = models.ForeignKey('internships.ThirdYearStudentList', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['advisor', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.student_id} assigned to {self.advisor}"
+
+    @classmethod
+    def record(cls, assignments):
+        """Queue (advisor_id, university_id) pairs; returns the advisors that need a digest"""
+        rows = [cls(advisor_id=advisor_id, student_id=university_id) for advisor_id, university_id in assignments if advisor_id]
+        cls.objects.bulk_create(rows)
+        return {row.advisor_id for row in rows}
@@ -1,53 +1,134 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
-from .models import Advisor
+from utils.cache_namespaces import bump, advisor_namespace, telegram_namespace, ADMIN_NAMESPACE
+from .models import Advisor, AdvisorDashboardStats, AdvisorSyncTombstone
 from students.models import Student, InternshipOfferLetter, InternshipReport
 from internships.models import ThirdYearStudentList
 
-def clear_advisor_cache(advisor_id):
-    """Clear all cache related to a specific advisor"""
-    # Clear advisor-specific cache patterns
-    cache.delete_pattern(f'advisor_{advisor_id}_*')
-    cache.delete_pattern(f'students_advisor_{advisor_id}_*')
-    
-    # Also clear general advisor cache
-    cache.delete_pattern('advisor_students_*')
-    cache.delete_pattern('advisor_profile_*')
+def clear_advisor_cache(*advisor_ids):
+    """Invalidate every response cached for the given advisors"""
+    bump(*(advisor_namespace(advisor_id) for advisor_id in advisor_ids if advisor_id))
 
 @receiver([post_save, post_delete], sender=Advisor)
 def invalidate_advisor_cache(sender, instance, **kwargs):
     """Clear cache when advisor data changes"""
     clear_advisor_cache(instance.id)
-    # Also clear any user-specific cache
-    if hasattr(instance, 'user'):
-        cache.delete_pattern(f'user_{instance.user.id}_*')
+    # Student status pages show the advisor's name and report settings; the admin lists show advisors too
+    telegram_ids = (
+        Student.objects.filter(assigned_advisor_id=instance.id)
+        .exclude(telegram_id=None)
+        .values_list('telegram_id', flat=True)
+    )
+    bump(ADMIN_NAMESPACE, *(telegram_namespace(telegram_id) for telegram_id in telegram_ids))
 
 @receiver([post_save, post_delete], sender=Student)
 def invalidate_student_cache(sender, instance, **kwargs):
     """Clear cache when student data changes"""
-    if instance.assigned_advisor:
-        clear_advisor_cache(instance.assigned_advisor.id)
-    # Clear student-specific cache
-    cache.delete_pattern(f'student_{instance.university_id}_*')
+    clear_advisor_cache(instance.assigned_advisor_id, getattr(instance, '_previous_advisor_id', None))
 
 @receiver([post_save, post_delete], sender=InternshipOfferLetter)
 def invalidate_offer_letter_cache(sender, instance, **kwargs):
     """Clear cache when offer letter changes"""
-    if instance.student and instance.student.assigned_advisor:
-        clear_advisor_cache(instance.student.assigned_advisor.id)
-    cache.delete_pattern('offer_letter_*')
+    clear_advisor_cache(instance.student.assigned_advisor_id)
 
 @receiver([post_save, post_delete], sender=InternshipReport)
 def invalidate_report_cache(sender, instance, **kwargs):
     """Clear cache when report changes"""
-    if instance.student and instance.student.assigned_advisor:
-        clear_advisor_cache(instance.student.assigned_advisor.id)
-    cache.delete_pattern('internship_report_*')
+    clear_advisor_cache(instance.student.assigned_advisor_id)
 
 @receiver([post_save, post_delete], sender=ThirdYearStudentList)
 def invalidate_third_year_cache(sender, instance, **kwargs):
     """Clear cache when third year student list changes"""
-    if instance.assigned_advisor:
-        clear_advisor_cache(instance.assigned_advisor.id)
-    cache.delete_pattern('third_year_students_*')
+    clear_advisor_cache(instance.assigned_advisor_id)
+
+
+# Dashboard counters. Each write shifts the affected advisor's row in
+# AdvisorDashboardStats inside the writer's transaction, so reads stay a
+# single primary-key lookup. pre_save hooks remember the state being replaced.
+
+@receiver(pre_save, sender=Student)
+def remember_previous_advisor(sender, instance, **kwargs):
+    instance._previous_advisor_id = None
+    if instance.pk:
+        instance._previous_advisor_id = (
+            Student.objects.filter(pk=instance.pk).values_list('assigned_advisor_id', flat=True).first()
+        )
+
+@receiver(post_save, sender=Student)
+def update_stats_on_student_save(sender, instance, created, **kwargs):
+    """Move the student (and its pending letter / reports) between advisors' counters"""
+    current = instance.assigned_advisor_id
+    if created:
+        AdvisorDashboardStats.apply_delta(current, assigned_students=1)
+        return
+
+    previous = getattr(instance, '_previous_advisor_id', None)
+    if previous == current:
+        return
+
+    pending = InternshipOfferLetter.objects.filter(student=instance, advisor_approved='Pending').count()
+    reports = InternshipReport.objects.filter(student=instance).count()
+    AdvisorDashboardStats.apply_delta(
+        previous, assigned_students=-1, pending_approval=-pending, reports_to_review=-reports
+    )
+    AdvisorDashboardStats.apply_delta(
+        current, assigned_students=1, pending_approval=pending, reports_to_review=reports
+    )
+
+@receiver(post_delete, sender=Student)
+def update_stats_on_student_delete(sender, instance, **kwargs):
+    # Offer letters and reports are cascaded first and adjust their own counters
+    AdvisorDashboardStats.apply_delta(instance.assigned_advisor_id, assigned_students=-1)
+
+@receiver(pre_save, sender=InternshipOfferLetter)
+def remember_previous_approval(sender, instance, **kwargs):
+    instance._previous_approval = None
+    if instance.pk:
+        instance._previous_approval = (
+            InternshipOfferLetter.objects.filter(pk=instance.pk).values_list('advisor_approved', flat=True).first()
+        )
+
+@receiver(post_save, sender=InternshipOfferLetter)
+def update_stats_on_offer_letter_save(sender, instance, created, **kwargs):
+    was_pending = getattr(instance, '_previous_approval', None) == 'Pending'
+    is_pending = instance.advisor_approved == 'Pending'
+    AdvisorDashboardStats.apply_delta(
+        instance.student.assigned_advisor_id, pending_approval=int(is_pending) - int(was_pending)
+    )
+
+@receiver(post_delete, sender=InternshipOfferLetter)
+def update_stats_on_offer_letter_delete(sender, instance, **kwargs):
+    if instance.advisor_approved == 'Pending':
+        AdvisorDashboardStats.apply_delta(instance.student.assigned_advisor_id, pending_approval=-1)
+
+@receiver(post_save, sender=InternshipReport)
+def update_stats_on_report_save(sender, instance, created, **kwargs):
+    if created:
+        AdvisorDashboardStats.apply_delta(instance.student.assigned_advisor_id, reports_to_review=1)
+
+@receiver(post_delete, sender=InternshipReport)
+def update_stats_on_report_delete(sender, instance, **kwargs):
+    AdvisorDashboardStats.apply_delta(instance.student.assigned_advisor_id, reports_to_review=-1)
+
+
+# Tombstones for the delta-sync mode of AdvisorStudentsView
+
+@receiver(post_save, sender=Student)
+def tombstone_reassigned_student(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_advisor_id', None)
+    if not created and previous and previous != instance.assigned_advisor_id:
+        AdvisorSyncTombstone.record(previous, 'student', instance.pk, instance.university_id)
+
+@receiver(post_delete, sender=Student)
+def tombstone_deleted_student(sender, instance, **kwargs):
+    AdvisorSyncTombstone.record(instance.assigned_advisor_id, 'student', instance.pk, instance.university_id)
+
+@receiver(post_delete, sender=InternshipOfferLetter)
+def tombstone_deleted_offer_letter(sender, instance, **kwargs):
+    student = instance.student
+    AdvisorSyncTombstone.record(student.assigned_advisor_id, 'offer_letter', instance.pk, student.university_id)
+
+@receiver(post_delete, sender=InternshipReport)
+def tombstone_deleted_report(sender, instance, **kwargs):
+    student = instance.student
+    AdvisorSyncTombstone.record(student.assigned_advisor_id, 'report', instance.pk, student.university_id)
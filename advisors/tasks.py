@@ -1,37 +1,132 @@
 # advisors/tasks.py
+from functools import partial
 from celery import shared_task
-from django.core.mail import send_mail
-from advisors.models import Advisor
-from internships.models import ThirdYearStudentList
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.db import transaction
+from advisors.models import Advisor, PendingAssignmentNotification
+from advisors.imports import AdvisorImport, read_headers, iter_sheet_rows
+from internships.models import ImportJob
+from notifications import outbox
+from openpyxl import load_workbook
+import os
+import time
+
+def digest_scheduled_key(advisor_id):
+    return f'advisor-digest-scheduled:{advisor_id}'
+
+
+def queue_assignment_digests(assignments):
+    """
+    Record new (advisor_id, university_id) assignments and make sure each
+    affected advisor has one digest scheduled at the end of the current window.
+    Call inside the transaction that creates the assignments.
+    """
+    for advisor_id in PendingAssignmentNotification.record(assignments):
+        # Flagged only after commit: a rolled-back chunk must not hold off the next digest
+        transaction.on_commit(partial(schedule_assignment_digest, advisor_id))
+
+
+def schedule_assignment_digest(advisor_id):
+    window = settings.ADVISOR_DIGEST_WINDOW_SECONDS
+    # The flag outlives the countdown slightly so a digest is never scheduled twice per window
+    if cache.add(digest_scheduled_key(advisor_id), 1, timeout=window + 60):
+        send_assignment_digest_task.apply_async(args=[advisor_id], countdown=window)
+
 
 @shared_task(bind=True, max_retries=3)
-def notify_advisor_task(self, advisor_id):
+def send_assignment_digest_task(self, advisor_id):
+    """Mail an advisor the students assigned since their last digest"""
     try:
-        advisor = Advisor.objects.select_related('user').get(id=advisor_id)
-        advisor_email = advisor.user.email
+        # Assignments arriving from here on schedule the next digest
+        cache.delete(digest_scheduled_key(advisor_id))
 
-        students = ThirdYearStudentList.objects.filter(assigned_advisor=advisor)
-        if not students.exists():
+        advisor = Advisor.objects.select_related('user').get(id=advisor_id)
+        pending = list(
+            PendingAssignmentNotification.objects.filter(advisor_id=advisor_id)
+            .select_related('student').order_by('created_at')
+        )
+        if not pending:
             return
 
-        student_lines = [f"{s.full_name} (ID: {s.university_id})" for s in students]
+        student_lines = [f"{p.student.full_name} (ID: {p.student.university_id})" for p in pending]
         student_list_text = "\n".join(student_lines)
 
         subject = "AAU Internship – Your Assigned Students"
         message = (
             f"Dear {advisor.first_name},\n\n"
-            f"You have been assigned the following students:\n\n"
+            f"You have been assigned the following new students:\n\n"
             f"{student_list_text}\n\n"
             f"Best regards,\nAAU Internship Team"
         )
-        
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email="aau57.sis@gmail.com",
-            recipient_list=[advisor_email],
-            fail_silently=False,
-        )
-        return f"Notification sent to {advisor_email}"
+
+        with transaction.atomic():
+            outbox.enqueue(EmailMessage(
+                subject=subject,
+                body=message,
+                from_email="aau57.sis@gmail.com",
+                to=[advisor.user.email],
+            ))
+            PendingAssignmentNotification.objects.filter(pk__in=[p.pk for p in pending]).delete()
+        return f"Digest of {len(pending)} students queued for {advisor.user.email}"
+    except Advisor.DoesNotExist:
+        return
     except Exception as e:
         self.retry(countdown=30, exc=e)
+
+
+def credential_email(advisor_name, email, username, password):
+    return EmailMessage(
+        subject="Your Advisor Account Credentials",
+        body=(
+            f"Dear {advisor_name},\n\n"
+            f"Your advisor account has been created.\n\n"
+            f"Username: {username}\nPassword: {password}\n\n"
+            "Please login and update your password immediately."
+        ),
+        from_email="admin@yourdomain.com",
+        to=[email],
+    )
+
+
+@shared_task(bind=True, max_retries=3)
+def register_advisors_task(self, job_id, file_path):
+    """Register every advisor in an uploaded sheet and queue their credential emails"""
+    job = ImportJob.objects.get(pk=job_id)
+    job.mark_running(self.request.id)
+    try:
+        started = time.monotonic()
+        workbook = load_workbook(filename=file_path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            advisor_import = AdvisorImport()
+            advisor_import.add_rows(iter_sheet_rows(sheet, read_headers(sheet)))
+        finally:
+            workbook.close()
+        parsed = time.monotonic()
+
+        # Accounts and the job's progress commit together, so a retry never finds half an import
+        with transaction.atomic():
+            created = advisor_import.save(credential_email)
+            job.record_chunk(
+                rows_seen=len(advisor_import.pending) + len(advisor_import.errors),
+                rows_created=created,
+                next_row=job.next_row,
+                errors=advisor_import.errors,
+                parse_seconds=parsed - started,
+                write_seconds=time.monotonic() - parsed,
+            )
+    except Exception as e:
+        if self.request.retries >= self.max_retries:
+            job.finish('failed', error=str(e))
+            if os.path.exists(file_path):
+                os.unlink(file_path)
+            raise
+        self.retry(countdown=60, exc=e)
+
+    job.finish('completed')
+    if os.path.exists(file_path):
+        os.unlink(file_path)
+
+    return job.progress()
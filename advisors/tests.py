@@ -1,3 +1,513 @@
-from django.test import TestCase
+import os
+import tempfile
+from collections import Counter
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from openpyxl import Workbook
+from rest_framework.test import APIClient
+
+from advisors.assignment import AdvisorAssignmentEngine, apply_assignments, assign_students_to_advisors
+from advisors.models import Advisor, AdvisorDashboardStats, AdvisorSyncTombstone, PendingAssignmentNotification
+from advisors.tasks import (
+    register_advisors_task, queue_assignment_digests, send_assignment_digest_task, digest_scheduled_key,
+)
+from internships.models import Department, ThirdYearStudentList, ImportJob
+from notifications.models import EmailOutbox
+from students.models import Student, InternshipOfferLetter, InternshipReport
+from students.serializers import TEXT_EXCERPT_LENGTH
+from utils.cache_namespaces import advisor_namespace, generation_key
+from utils.get_next_available_advisor import get_next_available_advisor
+
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AdvisorStudentsViewQueryTest(TestCase):
+    """The advisor dashboard must cost the same number of queries for any cohort size"""
+
+    # advisor lookup, stats row, students (+department, offer letter),
+    # reports prefetch and the third-year list
+    QUERY_BUDGET = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(
+            name="Software Engineering",
+            internship_duration_weeks=12,
+            internship_start=date(2025, 6, 1),
+            internship_end=date(2025, 9, 1),
+        )
+
+    def make_advisor(self, username, student_count):
+        # bulk_create keeps the cache-invalidation signals out of the fixture
+        user = User.objects.create_user(username=username, password="secret-pass")
+        advisor = Advisor.objects.bulk_create([Advisor(user=user, first_name=username)])[0]
+
+        students = Student.objects.bulk_create([
+            Student(
+                university_id=f"{username}/{i:04d}",
+                institutional_email=f"{username}{i}@aau.edu.et",
+                full_name=f"Student {i}",
+                phone_number="0911000000",
+                department=self.department,
+                assigned_advisor=advisor,
+                start_date=date(2025, 6, 1),
+            )
+            for i in range(student_count)
+        ])
+        InternshipOfferLetter.objects.bulk_create([
+            InternshipOfferLetter(
+                student=student,
+                company_name="Acme",
+                advisor_approved="Pending" if i % 2 else "Approved",
+            )
+            for i, student in enumerate(students)
+        ])
+        InternshipReport.objects.bulk_create([
+            InternshipReport(student=student, report_number=number)
+            for student in students
+            for number in (1, 2)
+        ])
+        ThirdYearStudentList.objects.bulk_create([
+            ThirdYearStudentList(
+                university_id=f"{username}-3y-{i}",
+                full_name=f"Third Year {i}",
+                institutional_email=f"{username}.3y{i}@aau.edu.et",
+                assigned_advisor=advisor,
+            )
+            for i in range(student_count)
+        ])
+        AdvisorDashboardStats.refresh(advisor.pk)
+        return User.objects.get(pk=user.pk)
+
+    def fetch_dashboard(self, user, query="?page_size=100", budget=QUERY_BUDGET):
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(user=user)
+        with self.assertNumQueries(budget):
+            response = client.get(f"/aau_api/advisor/students/{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_query_count_is_independent_of_cohort_size(self):
+        small = self.fetch_dashboard(self.make_advisor("small", 1))
+        large = self.fetch_dashboard(self.make_advisor("large", 40))
+
+        self.assertEqual(len(small["students"]), 1)
+        self.assertEqual(len(large["students"]), 40)
+
+    def test_stats_match_rows(self):
+        data = self.fetch_dashboard(self.make_advisor("stats", 6))
+
+        self.assertEqual(data["stats"], {
+            "assigned_students": 6,
+            "pending_approval": 3,
+            "reports_to_review": 12,
+        })
+        self.assertEqual(len(data["third_year_students"]), 6)
+        self.assertEqual(len(data["students"][0]["internship_reports"]), 2)
+
+    def test_compact_first_page(self):
+        user = self.make_advisor("compact", 5)
+        # advisor lookup and one page of students
+        data = self.fetch_dashboard(user, "?fields=full_name,status&include=&page_size=2", budget=2)
+
+        self.assertEqual(list(data["students"][0]), ["id", "full_name", "status"])
+        self.assertNotIn("third_year_students", data)
+        self.assertNotIn("stats", data)
+        self.assertIsNotNone(data["next"])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AdvisorDashboardInvalidationTest(TestCase):
+    """Writes go through the signal hooks: counters move and cached dashboards are invalidated"""
+
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(
+            name="Information Systems",
+            internship_duration_weeks=12,
+            internship_start=date(2025, 6, 1),
+            internship_end=date(2025, 9, 1),
+        )
+        self.user = User.objects.create_user(username="advisor", password="secret-pass")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.advisor = Advisor.objects.create(user=self.user, first_name="Abebe")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def add_student(self, university_id):
+        return Student.objects.create(
+            university_id=university_id,
+            institutional_email=f"{university_id}@aau.edu.et",
+            full_name="Student",
+            phone_number="0911000000",
+            department=self.department,
+            assigned_advisor=self.advisor,
+        )
+
+    def test_counters_follow_writes(self):
+        student = self.add_student("UGR/0001/15")
+        offer_letter = InternshipOfferLetter.objects.create(student=student, company_name="Acme")
+        InternshipReport.objects.create(student=student, report_number=1)
+
+        stats = AdvisorDashboardStats.objects.get(advisor=self.advisor)
+        self.assertEqual(stats.as_dict(), {"assigned_students": 1, "pending_approval": 1, "reports_to_review": 1})
+
+        offer_letter.advisor_approved = "Approved"
+        offer_letter.save()
+        student.delete()
+
+        stats.refresh_from_db()
+        self.assertEqual(stats.as_dict(), {"assigned_students": 0, "pending_approval": 0, "reports_to_review": 0})
+
+    def test_cached_dashboard_is_invalidated_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_student("UGR/0001/15")
+        self.assertEqual(len(self.client.get("/aau_api/advisor/students/").data["students"]), 1)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.add_student("UGR/0002/15")
+            self.add_student("UGR/0003/15")
+        # Both writes are coalesced into one flush
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(len(self.client.get("/aau_api/advisor/students/").data["students"]), 3)
+
+    def test_rolled_back_writes_do_not_invalidate(self):
+        key = generation_key(advisor_namespace(self.advisor.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_student("UGR/0001/15")
+        generation = cache.get(key)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.add_student("UGR/0002/15")
+                raise RuntimeError("roll back")
+        self.assertEqual(callbacks, [])
+        self.assertEqual(cache.get(key), generation)
+
+    def test_renamed_advisor_invalidates_the_admin_list(self):
+        admin = APIClient()
+        admin.force_authenticate(user=User.objects.create_superuser(username="registrar", password="secret-pass"))
+        self.assertEqual(admin.get("/aau_api/internship/advisors/").data["results"][0]["first_name"], "Abebe")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.advisor.first_name = "Alemu"
+            self.advisor.save()
+
+        self.assertEqual(admin.get("/aau_api/internship/advisors/").data["results"][0]["first_name"], "Alemu")
+
+
+@override_settings(CACHES=LOCMEM_CACHE, ADVISOR_SYNC_OVERLAP_SECONDS=120)
+class AdvisorDeltaSyncTest(TestCase):
+    def setUp(self):
+        department = Department.objects.create(
+            name="Computer Science",
+            internship_duration_weeks=12,
+            internship_start=date(2025, 6, 1),
+            internship_end=date(2025, 9, 1),
+        )
+        self.user = User.objects.create_user(username="delta", password="secret-pass")
+        self.advisor = Advisor.objects.create(user=self.user, first_name="Delta")
+        self.students = [
+            Student.objects.create(
+                university_id=f"UGR/000{i}/15",
+                institutional_email=f"delta{i}@aau.edu.et",
+                full_name=f"Student {i}",
+                department=department,
+                assigned_advisor=self.advisor,
+            )
+            for i in range(2)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def changes(self, since):
+        return self.client.get("/aau_api/advisor/students/", {"changed_since": since.isoformat()})
+
+    def test_only_changes_since_the_last_poll_are_returned(self):
+        since = timezone.now() + timedelta(minutes=10)  # Beyond the overlap of the setUp writes
+        Student.objects.filter(pk=self.students[0].pk).update(updated_at=since + timedelta(seconds=1))
+
+        data = self.changes(since).data
+        self.assertEqual([student["id"] for student in data["students"]], [self.students[0].pk])
+        self.assertEqual(data["deleted"], [])
+
+    def test_rows_stamped_before_a_late_commit_are_sent_again(self):
+        since = timezone.now() + timedelta(minutes=10)
+        # Saved a minute before the poll but committed after it
+        Student.objects.filter(pk=self.students[1].pk).update(updated_at=since - timedelta(seconds=60))
+
+        data = self.changes(since).data
+        self.assertEqual([student["id"] for student in data["students"]], [self.students[1].pk])
+
+    def test_deleted_and_moved_rows_are_tombstoned(self):
+        since = timezone.now() + timedelta(minutes=10)
+        gone, moved = self.students
+        gone.delete()
+        moved.assigned_advisor = Advisor.objects.create(first_name="Other")
+        moved.save()
+        AdvisorSyncTombstone.objects.update(deleted_at=since + timedelta(seconds=1))
+
+        deleted = self.changes(since).data["deleted"]
+        self.assertEqual(
+            sorted(entry["university_id"] for entry in deleted if entry["kind"] == "student"),
+            ["UGR/0000/15", "UGR/0001/15"],
+        )
+
+    @override_settings(ADVISOR_SYNC_TOMBSTONE_DAYS=30)
+    def test_expired_tombstones_are_pruned_and_old_cursors_rejected(self):
+        AdvisorSyncTombstone.record(self.advisor.pk, "student", 1, "UGR/0009/15")
+        AdvisorSyncTombstone.objects.update(deleted_at=timezone.now() - timedelta(days=31))
+        self.students[0].delete()
+
+        self.assertEqual(
+            list(AdvisorSyncTombstone.objects.values_list("university_id", flat=True)), ["UGR/0000/15"]
+        )
+        self.assertEqual(self.changes(timezone.now() - timedelta(days=31)).status_code, 410)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class RegisterAdvisorsTaskTest(TestCase):
+    def write_sheet(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(["advisor_name", "email", "f_name", "l_name", "phone_number"])
+        sheet.append(["Abebe Kebede", "abebe@aau.edu.et", "Abebe", "Kebede", "0911000001"])
+        sheet.append(["Sara Tesfaye", "sara@aau.edu.et", "Sara", "Tesfaye", "0911000002"])
+        with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as sheet_file:
+            workbook.save(sheet_file)
+        return sheet_file.name
+
+    def test_failed_progress_write_rolls_back_the_accounts(self):
+        job = ImportJob.objects.create(kind="advisors")
+        record_chunk = ImportJob.record_chunk
+        calls = []
+
+        def fail_once(import_job, **progress):
+            calls.append(progress)
+            if len(calls) == 1:
+                raise RuntimeError("database went away")
+            return record_chunk(import_job, **progress)
+
+        with mock.patch.object(ImportJob, "record_chunk", autospec=True, side_effect=fail_once):
+            register_advisors_task.apply(args=[str(job.pk), self.write_sheet()])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "completed")
+        self.assertEqual((job.rows_created, job.errors), (2, []))
+        self.assertEqual(Advisor.objects.count(), 2)
+        self.assertEqual(EmailOutbox.objects.count(), 2)
+
+    def test_failed_enqueue_fails_the_job(self):
+        with open(self.write_sheet(), "rb") as sheet_file:
+            sheet = SimpleUploadedFile("advisors.xlsx", sheet_file.read())
+        os.unlink(sheet_file.name)
+
+        broker_down = ConnectionError("broker down")
+        with mock.patch.object(register_advisors_task, "delay", side_effect=broker_down) as delay:
+            response = APIClient().post("/aau_api/advisor/register/", {"file": sheet}, format="multipart")
+
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(os.path.exists(delay.call_args.args[1]))
+        job = ImportJob.objects.get()
+        self.assertEqual(job.status, "failed")
+        self.assertIsNone(ImportJob.active_for_file("advisors", job.file_sha256))
+
+
+@override_settings(CACHES=LOCMEM_CACHE, ADVISOR_DIGEST_WINDOW_SECONDS=300)
+class AssignmentDigestTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="digest", email="digest@aau.edu.et")
+        self.advisor = Advisor.objects.create(user=user, first_name="Digest")
+        ThirdYearStudentList.objects.bulk_create([
+            ThirdYearStudentList(
+                university_id=f"UGR/000{i}/16", full_name=f"Student {i}", institutional_email=f"s{i}@aau.edu.et",
+            )
+            for i in range(3)
+        ])
+
+    def assign(self, *university_ids):
+        queue_assignment_digests((self.advisor.pk, university_id) for university_id in university_ids)
+
+    def test_assignments_in_one_window_share_a_digest(self):
+        with mock.patch.object(send_assignment_digest_task, "apply_async") as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assign("UGR/0000/16")
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assign("UGR/0001/16")
+
+        apply_async.assert_called_once_with(args=[self.advisor.pk], countdown=300)
+
+    def test_rolled_back_chunk_does_not_hold_off_the_digest(self):
+        with mock.patch.object(send_assignment_digest_task, "apply_async") as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    self.assign("UGR/0000/16")
+                    raise RuntimeError("chunk failed")
+            self.assertIsNone(cache.get(digest_scheduled_key(self.advisor.pk)))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assign("UGR/0000/16")
+
+        apply_async.assert_called_once()
+
+    def test_digest_mails_pending_students_and_reopens_the_window(self):
+        with mock.patch.object(send_assignment_digest_task, "apply_async"):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assign("UGR/0000/16", "UGR/0002/16")
+
+        send_assignment_digest_task.apply(args=[self.advisor.pk])
+
+        email = EmailOutbox.objects.get()
+        self.assertIn("Student 0 (ID: UGR/0000/16)", email.body)
+        self.assertIn("Student 2 (ID: UGR/0002/16)", email.body)
+        self.assertFalse(PendingAssignmentNotification.objects.exists())
+        self.assertIsNone(cache.get(digest_scheduled_key(self.advisor.pk)))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AdvisorAssignmentTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(
+            name="Computer Science",
+            internship_duration_weeks=12,
+            internship_start=date(2025, 6, 1),
+            internship_end=date(2025, 9, 1),
+        )
+
+    def add_third_year(self, count, advisor=None):
+        return ThirdYearStudentList.objects.bulk_create([
+            ThirdYearStudentList(
+                university_id=f"UGR/{i:04d}/16", full_name=f"Student {i}", institutional_email=f"s{i}@aau.edu.et",
+                assigned_advisor=advisor,
+            )
+            for i in range(count)
+        ])
+
+    def add_registered(self, university_id, advisor=None):
+        # bulk_create skips Student.save(), which would look the advisor up itself
+        return Student.objects.bulk_create([Student(
+            university_id=university_id,
+            institutional_email=f"{university_id.replace('/', '-')}@aau.edu.et",
+            full_name="Registered Student",
+            phone_number="0911000000",
+            department=self.department,
+            assigned_advisor=advisor,
+        )])[0]
+
+    def advisor_loads(self):
+        return Counter(ThirdYearStudentList.objects.values_list('assigned_advisor__first_name', flat=True))
+
+    def test_full_advisors_leave_the_rest_unassigned(self):
+        abebe = Advisor.objects.create(first_name="Abebe", max_students=2)
+        Advisor.objects.create(first_name="Bekele", max_students=1)
+        self.add_registered("UGR/0100/15", advisor=abebe)  # Counts towards Abebe's load
+        self.add_third_year(4)
+
+        self.assertEqual(assign_students_to_advisors(), (2, 2))
+        self.assertEqual(self.advisor_loads(), {"Abebe": 1, "Bekele": 1, None: 2})
+        self.assertIsNone(get_next_available_advisor())
+
+    def test_weights_scale_the_share_and_zero_pauses(self):
+        Advisor.objects.create(first_name="Abebe", assignment_weight=2)
+        Advisor.objects.create(first_name="Bekele", assignment_weight=1)
+        Advisor.objects.create(first_name="Chala", assignment_weight=0)
+
+        assignments = AdvisorAssignmentEngine().assign(range(6))
+
+        names = dict(Advisor.objects.values_list('id', 'first_name'))
+        self.assertEqual(Counter(names[advisor_id] for advisor_id in assignments.values()), {"Abebe": 4, "Bekele": 2})
+
+    def test_apply_assignments_leaves_rows_assigned_in_the_meantime(self):
+        abebe = Advisor.objects.create(first_name="Abebe")
+        bekele = Advisor.objects.create(first_name="Bekele")
+        first, second = self.add_third_year(2)
+        ThirdYearStudentList.objects.filter(pk=second.pk).update(assigned_advisor=bekele)
+
+        updated = apply_assignments(ThirdYearStudentList, {first.pk: abebe.pk, second.pk: abebe.pk})
+
+        self.assertEqual(updated, 1)
+        self.assertEqual(
+            dict(ThirdYearStudentList.objects.values_list('university_id', 'assigned_advisor')),
+            {first.pk: abebe.pk, second.pk: bekele.pk},
+        )
+
+    def test_registered_students_refresh_stats_and_updated_at(self):
+        advisor = Advisor.objects.create(first_name="Abebe")
+        AdvisorDashboardStats.refresh(advisor.pk)
+        student = self.add_registered("UGR/0100/15")
+        long_ago = timezone.now() - timedelta(days=30)
+        Student.objects.filter(pk=student.pk).update(updated_at=long_ago)
+
+        self.assertEqual(assign_students_to_advisors(), (1, 0))
+
+        student.refresh_from_db()
+        self.assertEqual(student.assigned_advisor_id, advisor.pk)
+        self.assertGreater(student.updated_at, long_ago)
+        self.assertEqual(AdvisorDashboardStats.objects.get(advisor=advisor).assigned_students, 1)
+
+    def test_next_available_advisor_is_the_least_loaded(self):
+        abebe = Advisor.objects.create(first_name="Abebe")
+        bekele = Advisor.objects.create(first_name="Bekele")
+        self.add_third_year(1, advisor=abebe)
+
+        self.assertEqual(get_next_available_advisor(), bekele)
+
+        Advisor.objects.filter(pk=bekele.pk).update(assignment_weight=0)
+        self.assertEqual(get_next_available_advisor(), abebe)
+
+    def test_auto_assign_view(self):
+        Advisor.objects.create(first_name="Abebe", max_students=2)
+        self.add_third_year(3)
+        client = APIClient()
+        path = "/aau_api/internship/auto-assign-advisors/"
+
+        client.force_authenticate(user=User.objects.create_user(username="advisor"))
+        self.assertEqual(client.post(path).status_code, 403)
+
+        client.force_authenticate(user=User.objects.create_superuser(username="registrar", password="secret-pass"))
+        response = client.post(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["assigned"], response.data["unassigned"]), (2, 1))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class StudentDetailViewTest(TestCase):
+    def test_reports_carry_a_text_excerpt(self):
+        cache.clear()
+        user = User.objects.create_user(username="advisor", password="secret-pass")
+        advisor = Advisor.objects.create(user=user, first_name="Abebe")
+        department = Department.objects.create(
+            name="Software Engineering",
+            internship_duration_weeks=12,
+            internship_start=date(2025, 6, 1),
+            internship_end=date(2025, 9, 1),
+        )
+        student = Student.objects.create(
+            university_id="UGR/1234/15", institutional_email="s@aau.edu.et", full_name="Student",
+            phone_number="0911000000", department=department, assigned_advisor=advisor,
+        )
+        InternshipReport.objects.create(
+            student=student, report_number=1, inspection_status='inspected', page_count=12, text="week one " * 500,
+        )
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        response = client.get("/aau_api/advisor/students/UGR123415/")
+
+        self.assertEqual(response.status_code, 200)
+        report, = response.data["internship_reports"]
+        self.assertNotIn("text", report)
+        self.assertEqual(report["text_excerpt"], ("week one " * 500)[:TEXT_EXCERPT_LENGTH])
+        self.assertEqual((report["inspection_status"], report["page_count"]), ("inspected", 12))
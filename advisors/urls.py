@@ -2,7 +2,7 @@ from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (AdvisorRegistrationView, 
                     LoginView, LogoutView,
-                    AdvisorStudentsView,
+                    AdvisorStudentsView, AdvisorDashboardStatsView, AdvisorThirdYearStudentsView,
                     ApproveOfferLetterView, UpdateAdvisorProfileView, StudentDetailView, UpdateAdvisorSettingsView
                     )
 
@@ -10,6 +10,8 @@ from .views import (AdvisorRegistrationView,
 
 urlpatterns = [
     path('students/', AdvisorStudentsView.as_view(), name='advisor-students'),
+    path('students/third-year/', AdvisorThirdYearStudentsView.as_view(), name='advisor-third-year-students'),
+    path('dashboard-stats/', AdvisorDashboardStatsView.as_view(), name='advisor-dashboard-stats'),
     path("students/<str:university_id>/", StudentDetailView.as_view(), name="student-detail"),
     path('profile/', UpdateAdvisorProfileView.as_view(), name='update-advisor-profile'),
     path("update-settings/", UpdateAdvisorSettingsView.as_view(), name="update-advisor-settings"),
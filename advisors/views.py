@@ -5,7 +5,7 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
-from advisors.models import Advisor
+from advisors.models import Advisor, AdvisorDashboardStats, AdvisorSyncTombstone
 from students.models import Student, InternshipOfferLetter,InternshipReport
 from internships.serializers import CompanySerializer
 from students.serializers import StudentSerializer, InternshipReportSerializer, InternshipOfferLetterSerializer, InternshipReportReadSerializer , InternshipOfferLetterReadSerializer
@@ -14,20 +14,23 @@ from rest_framework.permissions import IsAuthenticated
 from .serializers import AdvisorRegistrationSerializer, AdvisorSerializer, UserSerializer, AdvisorProfileSerializer, AdvisorSettingsSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.http import Http404
+from django.conf import settings
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.db.models import Q
 from datetime import timedelta
-import requests
-import random
-import string
-from django.core.mail import send_mail
 from rest_framework.exceptions import ValidationError
 from django.contrib.auth import password_validation
 from django.db import transaction
-from internships.models import ThirdYearStudentList
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_headers
+from internships.models import ThirdYearStudentList, ImportJob
+from internships.imports import spool_upload
+from internships.serializers import ImportJobSerializer
+from .tasks import register_advisors_task
+from telegram_bot.dispatcher import queue_status_update
+import os
+from utils.cache_namespaces import cache_response, advisor_namespaces, advisor_namespace, student_namespace
 from rest_framework.throttling import ScopedRateThrottle
+from rest_framework.pagination import CursorPagination
 class UpdateAdvisorProfileView(APIView):
     permission_classes = [IsAuthenticated]
     throttle_scope = 'advisor'
@@ -40,8 +43,7 @@ class UpdateAdvisorProfileView(APIView):
             raise Http404
 
 
-    @method_decorator(cache_page(300))
-    @method_decorator(vary_on_headers('Authorization'))
+    @cache_response(300, advisor_namespaces)
     def get(self, request, *args, **kwargs):
         advisor = self.get_object(request.user)
         serializer = AdvisorProfileSerializer(advisor)
@@ -87,17 +89,8 @@ class UpdateAdvisorProfileView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-def generate_password(length=10):
-    """Generate a secure random password"""
-    return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
-
-
-def clean_string(value):
-    """Ensure value is string, trimmed, and non-null"""
-    return str(value).strip() if pd.notna(value) else ""
-
-
 class AdvisorRegistrationView(APIView):
+    """Queue an advisor sheet for registration; returns the ImportJob to poll"""
     permission_classes = [AllowAny]
     throttle_scope = 'sensitive'
     throttle_classes = [ScopedRateThrottle]
@@ -108,89 +101,37 @@ class AdvisorRegistrationView(APIView):
             return Response({"error": "❌ No file uploaded."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            df = pd.read_excel(file)
+            tmp_file_path, file_sha256 = spool_upload(file)
 
-            required_columns = {'advisor_name', 'email', 'f_name', 'l_name', 'phone_number'}
-            if not required_columns.issubset(df.columns):
+            active_job = ImportJob.active_for_file('advisors', file_sha256)
+            if active_job:
+                os.unlink(tmp_file_path)
                 return Response({
-                    "error": f"❌ Missing required columns. Found: {set(df.columns)}. Required: {required_columns}"
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            failed_rows = []
-            successful_emails = []
-
-            for index, row in df.iterrows():
-                try:
-                    advisor_name = clean_string(row['advisor_name'])
-                    email = clean_string(row['email'])
-                    f_name = clean_string(row['f_name'])
-                    l_name = clean_string(row['l_name'])
-                    phone_number = clean_string(row['phone_number'])
-
-                    if not all([advisor_name, email, f_name, l_name, phone_number]):
-                        raise ValueError("⚠️ One or more required fields are empty.")
-
-                    if not phone_number.isdigit():
-                        raise ValueError("📵 Invalid phone number: must contain digits only.")
-
-                    if User.objects.filter(email=email).exists():
-                        raise ValueError("📧 Email already exists.")
-
-                    # Unique username
-                    base_username = advisor_name.replace(" ", "").lower()
-                    username = base_username
-                    counter = 1
-                    while User.objects.filter(username=username).exists():
-                        username = f"{base_username}{counter}"
-                        counter += 1
-
-                    password = generate_password()
-
-                    # ✅ Register user and advisor (no atomic block)
-                    user = User.objects.create_user(username=username, email=email, password=password)
-                    user.is_active = True
-                    user.save()
-
-                    Advisor.objects.create(
-                        user=user,
-                        first_name=f_name,
-                        last_name=l_name,
-                        phone_number=phone_number
-                    )
-
-                    # ✅ Try to send email, but don't raise errors
-                    try:
-                        send_mail(
-                            subject="Your Advisor Account Credentials",
-                            message=(
-                                f"Dear {advisor_name},\n\n"
-                                f"Your advisor account has been created.\n\n"
-                                f"Username: {username}\nPassword: {password}\n\n"
-                                "Please login and update your password immediately."
-                            ),
-                            from_email="admin@yourdomain.com",
-                            recipient_list=[email],
-                            fail_silently=True  # Don't throw error if it fails
-                        )
-                    except Exception as email_error:
-                        print(f"⚠️ Failed to send email to {email}: {email_error}")
-
-                    successful_emails.append(email)
-
-                except Exception as e:
-                    failed_rows.append({
-                        "row_number": index + 2,
-                        "email": email,
-                        "error": str(e)
-                    })
+                    "message": "This file is already being processed.",
+                    "job": ImportJobSerializer(active_job).data,
+                }, status=status.HTTP_200_OK)
+
+            job = ImportJob.objects.create(
+                kind='advisors',
+                created_by=request.user if request.user.is_authenticated else None,
+                file_name=file.name[:255],
+                file_sha256=file_sha256,
+            )
+            result = register_advisors_task.delay(str(job.id), tmp_file_path)
+            ImportJob.objects.filter(pk=job.pk, task_id='').update(task_id=result.id)
 
             return Response({
-                "✅ successful_emails": successful_emails,
-                "❌ failed_rows": failed_rows,
-                "summary": f"{len(successful_emails)} succeeded, {len(failed_rows)} failed"
-            }, status=status.HTTP_200_OK)
+                "message": "Advisor registration is being processed.",
+                "task_status": "processing",
+                "job_id": str(job.id),
+            }, status=status.HTTP_202_ACCEPTED)
 
         except Exception as global_error:
+            if 'tmp_file_path' in locals() and os.path.exists(tmp_file_path):
+                os.unlink(tmp_file_path)
+            # A job that was never queued would otherwise block this sheet as "already being processed"
+            if 'job' in locals():
+                job.finish('failed', error=f"Could not queue the registration: {global_error}")
             return Response({
                 "error": f"❌ Something went wrong while processing the file: {str(global_error)}"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -229,86 +170,260 @@ class LogoutView(APIView):
         except Exception as e:
             return Response({"error": "Invalid token"}, status=status.HTTP_400_BAD_REQUEST)
 
-        
+
+
+def get_offer_letter(student):
+    """Return the student's offer letter from the select_related cache, or None"""
+    try:
+        return student.internshipofferletter
+    except InternshipOfferLetter.DoesNotExist:
+        return None
+
+
+class AdvisorStudentCursorPagination(CursorPagination):
+    """Keyset pagination on the student primary key"""
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class ThirdYearStudentCursorPagination(CursorPagination):
+    """Keyset pagination on the third-year list primary key"""
+    ordering = 'university_id'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+def parse_csv_param(request, name, allowed):
+    """Read a comma-separated query parameter; returns None when the parameter is absent"""
+    raw = request.query_params.get(name)
+    if raw is None:
+        return None
+    values = {value.strip() for value in raw.split(',') if value.strip()}
+    unknown = values - set(allowed)
+    if unknown:
+        raise ValidationError({name: f"Unknown value(s): {', '.join(sorted(unknown))}. Allowed: {', '.join(allowed)}"})
+    return values
+
 
 class AdvisorStudentsView(APIView):
     """
     Get a list of students assigned to the logged-in advisor,
     including offer letter, reports, dashboard stats, and third-year student list.
+
+    Students are cursor-paginated on their id. `fields=` limits the student
+    keys returned and `include=` picks the nested sections, so a compact first
+    page can be fetched with e.g. `?fields=full_name,status&include=stats`.
+    The third-year list is only sent with the first page; the rest can be
+    paged through `students/third-year/`.
+
+    With `changed_since=<ISO timestamp>` only the students, offer letters and
+    reports modified after that point are returned, together with tombstones
+    for rows that were deleted or moved to another advisor. Clients pass the
+    returned `server_time` as their next `changed_since`. Rows are stamped
+    before their transaction commits, so anything stamped within
+    ADVISOR_SYNC_OVERLAP_SECONDS before `changed_since` is sent again; clients
+    upsert by id. A `changed_since` older than the kept tombstones answers 410
+    and the client reloads the full dashboard.
     """
     permission_classes = [AllowAny]
     throttle_scope = 'advisor'
     throttle_classes = [ScopedRateThrottle]
+    pagination_class = AdvisorStudentCursorPagination
+
+    STUDENT_FIELDS = (
+        'id', 'university_id', 'full_name', 'institutional_email', 'phone_number', 'telegram_id',
+        'status', 'start_date', 'end_date', 'department', 'company_name',
+    )
+    INCLUDE_SECTIONS = ('offer_letter', 'reports', 'third_year', 'stats')
+
+    def get_student_queryset(self, advisor, fields, include):
+        columns = [name for name in fields if name not in ('department', 'company_name')]
+        queryset = Student.objects.filter(assigned_advisor=advisor)
+
+        if 'department' in fields:
+            queryset = queryset.select_related('department')
+            columns += ['department', 'department__name']
+        if 'company_name' in fields or 'offer_letter' in include:
+            queryset = queryset.select_related('internshipofferletter')
+            columns.append('internshipofferletter')
+        if 'reports' in include:
+            queryset = queryset.prefetch_related('internshipreport_set')
+
+        return queryset.only('id', *columns)
+
+    def serialize_student(self, student, fields, include):
+        data = {}
+        for name in fields:
+            if name == 'department':
+                data[name] = student.department.name
+            elif name != 'company_name':
+                data[name] = getattr(student, name)
+
+        if 'company_name' in fields or 'offer_letter' in include:
+            offer_letter = get_offer_letter(student)
+            if 'company_name' in fields:
+                data['company_name'] = offer_letter.company_name if offer_letter else None
+            if 'offer_letter' in include:
+                data['offer_letter'] = InternshipOfferLetterReadSerializer(offer_letter).data if offer_letter else None
+        if 'reports' in include:
+            data['internship_reports'] = InternshipReportReadSerializer(
+                student.internshipreport_set.all(), many=True
+            ).data
+        return data
 
-    @method_decorator(cache_page(3600))
-    @method_decorator(vary_on_headers('Authorization'))
     def get(self, request):
         advisor = getattr(request.user, "advisor", None)
         if not advisor:
             return Response({"error": "User is not an advisor"}, status=status.HTTP_403_FORBIDDEN)
 
-        students = Student.objects.filter(assigned_advisor=advisor)
-        third_year_students = ThirdYearStudentList.objects.filter(assigned_advisor=advisor)
-
-        student_data = []
-        total_assigned_students = students.count()
-        pending_approval_count = 0
-        reports_to_review_count = 0
-
-        for student in students:
-            offer_letter = InternshipOfferLetter.objects.filter(student=student).first()
-            reports = InternshipReport.objects.filter(student=student)
-
-            if offer_letter and offer_letter.advisor_approved == "Pending":
-                pending_approval_count += 1
-
-            reports_to_review_count += reports.count()
-
-            student_data.append({
-                "id": student.id,
-                "university_id": student.university_id,
-                "full_name": student.full_name,
-                "institutional_email": student.institutional_email,
-                "phone_number": student.phone_number,
-                "telegram_id": student.telegram_id,
-                "status": student.status,
-                "start_date": student.start_date,
-                "end_date": student.end_date,
-                "department": student.department.name,
-                "company_name": offer_letter.company_name if offer_letter else None,
-                "offer_letter": InternshipOfferLetterReadSerializer(offer_letter).data if offer_letter else None,
-                "internship_reports": InternshipReportReadSerializer(reports, many=True).data
-            })
-
-        third_year_data = []
-        for s in third_year_students:
-            third_year_data.append({
-                "university_id": s.university_id,
-                "full_name": s.full_name,
-                "institutional_email": s.institutional_email
-            })
+        if 'changed_since' in request.query_params:
+            return self.get_changes(request, advisor)
+        return self.get_document(request, advisor)
+
+    def get_changes(self, request, advisor):
+        # A '+' in an unencoded UTC offset arrives as a space
+        raw = request.query_params.get('changed_since', '').replace(' ', '+')
+        since = parse_datetime(raw)
+        if since is None:
+            return Response({"error": "changed_since must be an ISO 8601 timestamp"}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        if since < AdvisorSyncTombstone.retention_cutoff():
+            return Response({"error": "changed_since is too old. Reload the full dashboard."}, status=status.HTTP_410_GONE)
+
+        server_time = timezone.now()
+        window_start = since - timedelta(seconds=settings.ADVISOR_SYNC_OVERLAP_SECONDS)
+        changed_student = Q(student__updated_at__gt=window_start)
+
+        students = (
+            Student.objects.filter(assigned_advisor=advisor, updated_at__gt=window_start)
+            .select_related('department', 'internshipofferletter')
+            .order_by('id')
+        )
+        # Rows of a student that just moved to this advisor are sent along with it
+        offer_letters = (
+            InternshipOfferLetter.objects.filter(student__assigned_advisor=advisor)
+            .filter(Q(updated_at__gt=window_start) | changed_student)
+            .select_related('student')
+        )
+        reports = (
+            InternshipReport.objects.filter(student__assigned_advisor=advisor)
+            .filter(Q(updated_at__gt=window_start) | changed_student)
+            .select_related('student')
+        )
+        deleted = (
+            AdvisorSyncTombstone.objects.filter(advisor=advisor, deleted_at__gt=window_start)
+            .order_by('deleted_at')
+            .values('kind', 'object_id', 'university_id', 'deleted_at')
+        )
+
+        fields = list(self.STUDENT_FIELDS)
+        return Response({
+            "changed_since": since,
+            "server_time": server_time,
+            "students": [self.serialize_student(student, fields, set()) for student in students],
+            "offer_letters": [
+                {
+                    "id": offer_letter.id,
+                    "student_id": offer_letter.student_id,
+                    "university_id": offer_letter.student.university_id,
+                    **InternshipOfferLetterReadSerializer(offer_letter).data,
+                }
+                for offer_letter in offer_letters
+            ],
+            "internship_reports": [
+                {
+                    "id": report.id,
+                    "student_id": report.student_id,
+                    "university_id": report.student.university_id,
+                    **InternshipReportReadSerializer(report).data,
+                }
+                for report in reports
+            ],
+            "deleted": list(deleted),
+        }, status=status.HTTP_200_OK)
+
+    @cache_response(3600, advisor_namespaces)
+    def get_document(self, request, advisor):
+        fields = parse_csv_param(request, 'fields', self.STUDENT_FIELDS)
+        fields = [name for name in self.STUDENT_FIELDS if fields is None or name in fields or name == 'id']
+        include = parse_csv_param(request, 'include', self.INCLUDE_SECTIONS)
+        if include is None:
+            include = set(self.INCLUDE_SECTIONS)
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(self.get_student_queryset(advisor, fields, include), request, view=self)
 
         response_data = {
-            "students": student_data,
-            "third_year_students": third_year_data,
-            "stats": {
-                "assigned_students": total_assigned_students,
-                "pending_approval": pending_approval_count,
-                "reports_to_review": reports_to_review_count
-            }
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+            "students": [self.serialize_student(student, fields, include) for student in page],
         }
 
+        first_page = paginator.cursor_query_param not in request.query_params
+        if 'third_year' in include and first_page:
+            response_data["third_year_students"] = list(
+                ThirdYearStudentList.objects.filter(assigned_advisor=advisor)
+                .order_by('university_id')
+                .values('university_id', 'full_name', 'institutional_email')
+            )
+        if 'stats' in include:
+            response_data["stats"] = AdvisorDashboardStats.for_advisor(advisor.id).as_dict()
+
         return Response(response_data, status=status.HTTP_200_OK)
 
 
+class AdvisorThirdYearStudentsView(generics.ListAPIView):
+    """Cursor-paginated third-year (not yet registered) students assigned to the logged-in advisor"""
+    permission_classes = [AllowAny]
+    throttle_scope = 'advisor'
+    throttle_classes = [ScopedRateThrottle]
+    pagination_class = ThirdYearStudentCursorPagination
+
+    def get_queryset(self):
+        return ThirdYearStudentList.objects.filter(
+            assigned_advisor=self.request.user.advisor
+        ).values('university_id', 'full_name', 'institutional_email')
+
+    def list(self, request, *args, **kwargs):
+        if not getattr(request.user, "advisor", None):
+            return Response({"error": "User is not an advisor"}, status=status.HTTP_403_FORBIDDEN)
+
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(list(page))
+
+
+class AdvisorDashboardStatsView(APIView):
+    """Dashboard counters for the logged-in advisor, read from the denormalized stats row"""
+    permission_classes = [AllowAny]
+    throttle_scope = 'advisor'
+    throttle_classes = [ScopedRateThrottle]
+
+    def get(self, request):
+        advisor = getattr(request.user, "advisor", None)
+        if not advisor:
+            return Response({"error": "User is not an advisor"}, status=status.HTTP_403_FORBIDDEN)
+
+        stats = AdvisorDashboardStats.for_advisor(advisor.id)
+        return Response(stats.as_dict(), status=status.HTTP_200_OK)
+
+
+def student_detail_namespaces(view, request, university_id):
+    advisor = getattr(request.user, "advisor", None)
+    if not advisor or len(university_id) != 9:
+        return None
+    formatted_id = f"{university_id[:3]}/{university_id[3:7]}/{university_id[7:]}"
+    return [advisor_namespace(advisor.id), student_namespace(formatted_id)]
+
+
 class StudentDetailView(APIView):
     """Retrieve details of a specific student using university_id"""
     permission_classes = [AllowAny]
     throttle_scope = 'advisor'
     throttle_classes = [ScopedRateThrottle]
 
-    @method_decorator(cache_page(1800))
-    @method_decorator(vary_on_headers('Authorization'))
+    @cache_response(1800, student_detail_namespaces)
     def get(self, request, university_id):
         if len(university_id) == 9:  # Assuming format is fixed
             formatted_id = f"{university_id[:3]}/{university_id[3:7]}/{university_id[7:]}"
@@ -338,14 +453,7 @@ class StudentDetailView(APIView):
         else:
             student_data["internship_offer_letter"] = None
 
-        student_data["internship_reports"] = []
-        for report in reports:
-            student_data["internship_reports"].append({
-                "report_number": report.report_number,
-                "document_url": report.document_url,
-                "submission_date": report.submission_date,
-                "created_at": report.created_at,
-            })
+        student_data["internship_reports"] = InternshipReportReadSerializer(reports, many=True).data
 
         student_data["department"] = student.department.name
 
@@ -393,28 +501,17 @@ class ApproveOfferLetterView(APIView):
         if status_value == "Approved":
             now = timezone.now().date()
 
-            offer_letter.advisor_approved = "Approved"
-            offer_letter.approval_date = timezone.now()
-            offer_letter.save()
+            with transaction.atomic():
+                offer_letter.advisor_approved = "Approved"
+                offer_letter.approval_date = timezone.now()
+                offer_letter.save()
 
-            student.start_date = now
-            student.end_date = now + timedelta(days=internship_duration_days)
-            student.status = "Ongoing"
-            student.save()
+                student.start_date = now
+                student.end_date = now + timedelta(days=internship_duration_days)
+                student.status = "Ongoing"
+                student.save()
 
-            if student.telegram_id:
-                payload = {
-                    "telegram_id": student.telegram_id,
-                    "status": "Approved"
-                }
-                try:
-                    response = requests.post(
-                        "https://is-internship-tracking-bot.onrender.com/update-status",
-                        json=payload
-                    )
-                    response.raise_for_status()
-                except requests.RequestException as e:
-                    print("Notification failed:", e)
+                queue_status_update(student.telegram_id, "Approved")
 
             return Response({
                 "message": "Offer letter approved successfully",
@@ -425,21 +522,10 @@ class ApproveOfferLetterView(APIView):
         elif status_value == "Rejected":
             telegram_id = student.telegram_id
             full_name = student.full_name
-            offer_letter.delete()
 
-            if telegram_id:
-                payload = {
-                    "telegram_id": telegram_id,
-                    "status": "Rejected"
-                }
-                try:
-                    response = requests.post(
-                        "https://is-internship-tracking-bot.onrender.com/update-status",
-                        json=payload
-                    )
-                    response.raise_for_status()
-                except requests.RequestException as e:
-                    print("Notification failed:", e)
+            with transaction.atomic():
+                offer_letter.delete()
+                queue_status_update(telegram_id, "Rejected")
 
             return Response({
                 "message": "Student rejected successfully",
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import ThirdYearStudentList, InternStudentList,Department,  Company, Internship ,InternshipHistory
+from .models import ThirdYearStudentList, InternStudentList,Department,  Company, Internship ,InternshipHistory, InternshipHistoryRollup, ImportJob
 
 admin.site.register(ThirdYearStudentList)
 admin.site.register(Company)
@@ -8,3 +8,5 @@ admin.site.register(InternStudentList)
 admin.site.register(InternshipHistory)
 admin.site.register(Internship)
 admin.site.register(Department)
+admin.site.register(InternshipHistoryRollup)
+admin.site.register(ImportJob)
@@ -0,0 +1,116 @@
+# internships/analytics.py
+"""
+GROUP BY rollups of InternshipHistory.
+
+`refresh_history_rollup(year)` rebuilds one year's rows in
+InternshipHistoryRollup at three grains (year, department, company); the
+analytics endpoint reads only those pre-aggregated rows. Rebuilds of the same
+year are serialized with an advisory lock, so two refreshes can't both
+insert a year's rows.
+"""
+from django.db import connection, models, transaction
+from django.db.models import Count, Sum
+
+from utils.cache_namespaces import bump, ADMIN_NAMESPACE
+from .models import InternshipHistory, InternshipHistoryRollup
+
+
+class DaysBetween(models.Func):
+    """end_date - start_date; subtracting two DATE columns yields whole days in Postgres"""
+    arg_joiner = ' - '
+    template = '(%(expressions)s)'
+    output_field = models.IntegerField()
+
+
+class Median(models.Aggregate):
+    function = 'percentile_cont'
+    name = 'Median'
+    template = '%(function)s(0.5) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = models.FloatField()
+
+
+# Class key for pg_advisory_xact_lock(key, year)
+ROLLUP_LOCK_KEY = 0x41415532
+
+GRAIN_COLUMNS = {
+    'year': (),
+    'department': ('student__department__name',),
+    'company': ('student__department__name', 'company__name'),
+}
+
+
+def lock_rollup(year):
+    """Serialize rebuilds of one year's rollup until the current transaction ends (Postgres only)"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", [ROLLUP_LOCK_KEY, year])
+
+
+def refresh_history_rollup(year):
+    """Rebuild the rollup rows for one year from InternshipHistory"""
+    with transaction.atomic():
+        # Aggregated after the lock, so a refresh that waited sees the rows committed before it
+        lock_rollup(year)
+        history = InternshipHistory.objects.filter(year=year).annotate(
+            duration_days=DaysBetween('end_date', 'start_date')
+        )
+
+        rollups = []
+        for grain, columns in GRAIN_COLUMNS.items():
+            groups = history.values('year', *columns).annotate(
+                internship_count=Count('id'),
+                total_duration_days=Sum('duration_days'),
+                median_duration_days=Median('duration_days'),
+            ).order_by()
+            for group in groups:
+                rollups.append(InternshipHistoryRollup(
+                    year=year,
+                    grain=grain,
+                    department_name=group.get('student__department__name'),
+                    company_name=group.get('company__name'),
+                    internship_count=group['internship_count'],
+                    total_duration_days=group['total_duration_days'] or 0,
+                    median_duration_days=group['median_duration_days'],
+                ))
+
+        InternshipHistoryRollup.objects.filter(year=year).delete()
+        InternshipHistoryRollup.objects.bulk_create(rollups)
+        bump(ADMIN_NAMESPACE)
+    return len(rollups)
+
+
+def refresh_all_history_rollups():
+    years = InternshipHistory.objects.values_list('year', flat=True).distinct()
+    return sum(refresh_history_rollup(year) for year in years)
+
+
+def history_analytics(year=None, top=5):
+    """Shape rollup rows for the admin charts; `top` limits companies per year/department"""
+    rollups = InternshipHistoryRollup.objects.all()
+    if year is not None:
+        rollups = rollups.filter(year=year)
+
+    years, departments, top_companies = [], [], []
+    companies_seen = {}
+    for row in rollups.order_by('-year', 'department_name', '-internship_count', 'company_name'):
+        entry = {
+            "year": row.year,
+            "internship_count": row.internship_count,
+            "total_duration_days": row.total_duration_days,
+            "median_duration_days": row.median_duration_days,
+        }
+        if row.grain == 'year':
+            years.append(entry)
+        elif row.grain == 'department':
+            departments.append({"department": row.department_name, **entry})
+        else:
+            group = (row.year, row.department_name)
+            companies_seen[group] = companies_seen.get(group, 0) + 1
+            if companies_seen[group] <= top:
+                top_companies.append({"department": row.department_name, "company": row.company_name, **entry})
+
+    return {
+        "years": years,
+        "departments": departments,
+        "top_companies": top_companies,
+    }
@@ -0,0 +1,228 @@
+# internships/copy_import.py
+"""
+Postgres fast path for large CSV rosters.
+
+The file is streamed with COPY into a temporary staging table and every row
+from the job's resume cursor on is classified in one statement against the
+existing records. Rows whose university ID (up to case) appears more than
+once go through imports.SheetClaims in row order, so the categories match
+imports.RowClassifier exactly. New rows are then merged into
+ThirdYearStudentList COMMIT_CHUNK_ROWS at a time with INSERT ... ON CONFLICT
+DO NOTHING; each chunk takes its advisors from one AdvisorAssignmentEngine
+pass under the assignment lock and saves the job's progress in the same
+transaction, so a retry resumes after the last committed chunk.
+"""
+import csv
+import time
+import uuid
+
+from django.db import connection, transaction
+
+from advisors.assignment import AdvisorAssignmentEngine, apply_assignments, lock_assignments
+from advisors.models import Advisor
+from advisors.tasks import queue_assignment_digests
+from students.models import Student
+from utils.cache_namespaces import bump, advisor_namespace, ADMIN_NAMESPACE
+from .imports import REQUIRED_COLUMNS, ROW_CATEGORIES, COMMIT_CHUNK_ROWS, SheetClaims
+from .models import ThirdYearStudentList
+
+# imports.UNIVERSITY_ID_PATTERN without the length lookahead; the length is checked separately
+UNIVERSITY_ID_SQL_PATTERN = r'^[A-Za-z]{2,5}/[0-9]{1,6}/[0-9]{2}$'
+
+
+def supports_copy():
+    return connection.vendor == 'postgresql'
+
+
+def read_csv_headers(reader):
+    headers = [header.strip() for header in next(reader, [])]
+    if not REQUIRED_COLUMNS.issubset(headers):
+        raise ValueError(f"Missing columns. Required: {REQUIRED_COLUMNS}")
+    return headers
+
+
+def open_csv(file_path):
+    return open(file_path, newline='', encoding='utf-8-sig')
+
+
+def iter_csv_rows(csv_file, min_row=2):
+    """Yield (row_number, university_id, full_name) like imports.iter_sheet_rows; csv_file is a text stream"""
+    reader = csv.reader(csv_file)
+    headers = read_csv_headers(reader)
+    for row_number, row in enumerate(reader, start=2):
+        if row_number < min_row:
+            continue
+        row_data = dict(zip(headers, row))
+        if not (row_data.get('university_id') or '').strip():  # Skip empty rows
+            continue
+        yield row_number, row_data['university_id'].strip(), (row_data.get('full_name') or '').strip()
+
+
+# Trimming matches Python's str.strip(); btrim() only removes spaces
+CLASSIFY_SQL = """
+CREATE TEMP TABLE {classified} AS
+WITH parsed AS (
+    SELECT row_number + 1 AS row_number,
+           regexp_replace({university_id}, '^\\s+|\\s+$', '', 'g') AS university_id,
+           regexp_replace(coalesce({full_name}, ''), '^\\s+|\\s+$', '', 'g') AS full_name
+    FROM {raw}
+    WHERE row_number + 1 >= %(min_row)s
+),
+checked AS (
+    SELECT p.*,
+           CASE WHEN p.full_name <> '' THEN
+               lower((regexp_split_to_array(p.full_name, '\\s+'))[1])
+               || '.' || replace(lower(p.university_id), '/', '-') || '@aau.edu.et'
+           END AS email,
+           CASE
+               WHEN length(p.university_id) > 20 OR p.university_id !~ %(id_pattern)s THEN 'invalid_id'
+               WHEN p.full_name = '' THEN 'missing_name'
+               WHEN s.university_id IS NOT NULL THEN 'registered'
+               WHEN t.university_id IS NOT NULL THEN 'in_third_year_list'
+           END AS category
+    FROM parsed p
+    LEFT JOIN {student_table} s ON s.university_id = p.university_id
+    LEFT JOIN {third_year_table} t ON t.university_id = p.university_id
+    WHERE p.university_id <> ''
+),
+taken_emails AS (
+    SELECT lower(institutional_email) AS email FROM {student_table}
+    UNION
+    SELECT lower(institutional_email) FROM {third_year_table}
+)
+SELECT c.row_number, c.university_id, c.full_name, c.email,
+       e.email IS NOT NULL AS email_taken,
+       CASE
+           WHEN c.category IS NOT NULL THEN c.category
+           -- Rows sharing an ID can claim each other's ID or email; left NULL for resolve_shared_ids()
+           WHEN count(*) OVER (PARTITION BY c.category IS NULL, lower(c.university_id)) > 1 THEN NULL
+           WHEN e.email IS NOT NULL THEN 'email_collision'
+           ELSE 'new'
+       END AS category
+FROM checked c
+LEFT JOIN taken_emails e ON c.category IS NULL AND e.email = lower(c.email)
+"""
+
+MERGE_SQL = """
+INSERT INTO {third_year_table} (university_id, full_name, institutional_email)
+SELECT university_id, full_name, email
+FROM {classified}
+WHERE category = 'new' AND row_number >= %s AND row_number < %s
+ORDER BY row_number
+ON CONFLICT DO NOTHING
+RETURNING university_id
+"""
+
+
+def stage_roster(cursor, names, columns, file_path, min_row):
+    """COPY the file into {raw} and classify rows from `min_row` on into {classified}"""
+    cursor.execute(
+        f"CREATE TEMP TABLE {names['raw']} (row_number bigserial, "
+        + ", ".join(f"{column} text" for column in columns) + ")"
+    )
+    with open(file_path, 'rb') as csv_file:
+        cursor.copy_expert(
+            f"COPY {names['raw']} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, HEADER true, ENCODING 'UTF8')",
+            csv_file,
+        )
+    cursor.execute(CLASSIFY_SQL.format(**names), {'id_pattern': UNIVERSITY_ID_SQL_PATTERN, 'min_row': min_row})
+    cursor.execute(f"ALTER TABLE {names['classified']} ADD PRIMARY KEY (row_number)")
+    resolve_shared_ids(cursor, names['classified'])
+
+
+def resolve_shared_ids(cursor, classified):
+    """Classify rows whose university ID repeats in row order, as RowClassifier does"""
+    cursor.execute(
+        f"SELECT row_number, university_id, email, email_taken FROM {classified} "
+        f"WHERE category IS NULL ORDER BY row_number"
+    )
+    claims = SheetClaims()
+    categories = [
+        (claims.claim(university_id, email, email_taken), row_number)
+        for row_number, university_id, email, email_taken in cursor.fetchall()
+    ]
+    cursor.executemany(f"UPDATE {classified} SET category = %s WHERE row_number = %s", categories)
+
+
+def merge_chunk(cursor, names, start, end):
+    """
+    Merge the new rows numbered [start, end) and assign their advisors; call
+    inside the chunk's transaction. Returns (rows_seen, created, errors).
+    """
+    lock_assignments()
+    cursor.execute(
+        f"SELECT count(*) FROM {names['classified']} WHERE row_number >= %s AND row_number < %s", [start, end]
+    )
+    rows_seen = cursor.fetchone()[0]
+
+    cursor.execute(MERGE_SQL.format(**names), [start, end])
+    merged = [university_id for university_id, in cursor.fetchall()]
+    assignments = AdvisorAssignmentEngine().assign(merged)
+    apply_assignments(ThirdYearStudentList, assignments)
+    created = [(assignments.get(university_id), university_id) for university_id in merged]
+
+    cursor.execute(
+        f"SELECT row_number, university_id, category FROM {names['classified']} "
+        f"WHERE category <> 'new' AND row_number >= %s AND row_number < %s ORDER BY row_number",
+        [start, end],
+    )
+    errors = [
+        {"row": row_number, "university_id": university_id, "category": category,
+         "error": ROW_CATEGORIES[category]}
+        for row_number, university_id, category in cursor.fetchall()
+    ]
+
+    # Raw SQL skips the ORM signals, so digests and cache invalidation happen here
+    queue_assignment_digests(created)
+    bump(ADMIN_NAMESPACE, *(advisor_namespace(advisor_id) for advisor_id in set(assignments.values())))
+    return rows_seen, created, errors
+
+
+def copy_csv_roster(task, job, file_path):
+    """
+    Import a CSV roster from job.next_row on with COPY and set-based SQL,
+    recording each committed chunk on the job like import_rows_in_chunks.
+    """
+    with open_csv(file_path) as csv_file:
+        headers = read_csv_headers(csv.reader(csv_file))
+    if not Advisor.objects.exists():
+        raise ValueError("No available advisor.")
+
+    suffix = uuid.uuid4().hex
+    quote = connection.ops.quote_name
+    columns = [f'c{index}' for index in range(len(headers))]
+    names = {
+        'raw': quote(f'roster_raw_{suffix}'),
+        'classified': quote(f'roster_classified_{suffix}'),
+        'university_id': columns[headers.index('university_id')],
+        'full_name': columns[headers.index('full_name')],
+        'student_table': quote(Student._meta.db_table),
+        'third_year_table': quote(ThirdYearStudentList._meta.db_table),
+    }
+
+    with connection.cursor() as cursor:
+        try:
+            started = time.monotonic()
+            stage_roster(cursor, names, columns, file_path, job.next_row)
+            cursor.execute(f"SELECT max(row_number) FROM {names['classified']}")
+            last_row = cursor.fetchone()[0] or 0
+            parse_seconds = time.monotonic() - started
+
+            for start in range(job.next_row, last_row + 1, COMMIT_CHUNK_ROWS):
+                end = min(start + COMMIT_CHUNK_ROWS, last_row + 1)
+                started = time.monotonic()
+                with transaction.atomic():
+                    rows_seen, created, errors = merge_chunk(cursor, names, start, end)
+                    job.record_chunk(
+                        rows_seen=rows_seen,
+                        rows_created=len(created),
+                        next_row=end,
+                        errors=errors,
+                        parse_seconds=parse_seconds,
+                        write_seconds=time.monotonic() - started,
+                    )
+                parse_seconds = 0
+                task.update_state(state='PROGRESS', meta=job.progress())
+        finally:
+            # Temporary tables only live as long as the connection, but a worker keeps its connection
+            cursor.execute(f"DROP TABLE IF EXISTS {names['raw']}, {names['classified']}")
@@ -0,0 +1,198 @@
+# internships/exports.py
+"""
+Constant-query querysets and row streaming for the admin student registry
+and the CSV / XLSX exports.
+
+Rows are read with `QuerySet.iterator(chunk_size=...)` and written out one
+chunk at a time, so memory stays flat however large the registry grows.
+"""
+import csv
+import json
+import tempfile
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import OuterRef, Subquery
+from openpyxl import Workbook
+
+from students.models import Student, InternshipOfferLetter
+from .models import ThirdYearStudentList, InternshipHistory
+
+EXPORT_CHUNK_SIZE = 2000
+STREAM_BUFFER_ROWS = 200
+
+STUDENT_COLUMNS = (
+    'id', 'university_id', 'institutional_email', 'otp_verified', 'full_name', 'phone_number',
+    'telegram_id', 'status', 'start_date', 'end_date', 'internship_year', 'company', 'updated_at',
+)
+
+
+def admin_student_queryset():
+    """Registered students with department, advisor and offer-letter company resolved in one query"""
+    company_name = InternshipOfferLetter.objects.filter(student=OuterRef('pk')).values('company_name')[:1]
+    return (
+        Student.objects.select_related('department', 'assigned_advisor')
+        .annotate(company_name=Subquery(company_name))
+        .order_by('id')
+    )
+
+
+def third_year_queryset():
+    return ThirdYearStudentList.objects.select_related('assigned_advisor').order_by('university_id')
+
+
+def advisor_full_name(first_name, last_name):
+    return f"{first_name or ''} {last_name or ''}".strip() or None
+
+
+def iter_student_rows(queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield registered students as flat dicts, in the shape AdminStudentSerializer produces"""
+    queryset = admin_student_queryset() if queryset is None else queryset
+    rows = queryset.values(
+        *STUDENT_COLUMNS, 'company_name', 'department__name',
+        'assigned_advisor_id', 'assigned_advisor__first_name', 'assigned_advisor__last_name',
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        advisor_id = row.pop('assigned_advisor_id')
+        first_name = row.pop('assigned_advisor__first_name')
+        last_name = row.pop('assigned_advisor__last_name')
+        row['department'] = row.pop('department__name')
+        row['assigned_advisor'] = (
+            {'id': advisor_id, 'first_name': first_name, 'last_name': last_name} if advisor_id else None
+        )
+        yield row
+
+
+def iter_third_year_rows(queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    queryset = third_year_queryset() if queryset is None else queryset
+    current_year = datetime.now().year
+    rows = queryset.values(
+        'university_id', 'full_name', 'institutional_email',
+        'assigned_advisor__first_name', 'assigned_advisor__last_name',
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        row['assigned_advisor'] = advisor_full_name(
+            row.pop('assigned_advisor__first_name'), row.pop('assigned_advisor__last_name')
+        )
+        row['internship_year'] = current_year
+        yield row
+
+
+def stream_json_document(sections):
+    """
+    Encode `{name: [rows...], ...}` incrementally. `sections` is a sequence of
+    (name, row iterator) pairs; only a small buffer of encoded rows is held.
+    """
+    encoder = DjangoJSONEncoder()
+    yield '{'
+    for index, (name, rows) in enumerate(sections):
+        yield f'{"," if index else ""}{json.dumps(name)}:['
+        buffer = []
+        for position, row in enumerate(rows):
+            buffer.append(('' if position == 0 else ',') + encoder.encode(row))
+            if len(buffer) >= STREAM_BUFFER_ROWS:
+                yield ''.join(buffer)
+                buffer = []
+        yield ''.join(buffer) + ']'
+    yield '}'
+
+
+# Flat exports
+
+class Echo:
+    """File-like object whose write() hands the line back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(Echo())
+    buffer = [writer.writerow([label for _, label in columns])]
+    for row in rows:
+        buffer.append(writer.writerow([row[name] for name, _ in columns]))
+        if len(buffer) >= STREAM_BUFFER_ROWS:
+            yield ''.join(buffer)
+            buffer = []
+    yield ''.join(buffer)
+
+
+def build_xlsx(columns, rows, title):
+    """
+    Write rows into a write-only workbook spooled to a temporary file. Only the
+    current row is held in memory; the returned file is positioned at the start.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    sheet.append([label for _, label in columns])
+    for row in rows:
+        sheet.append([row[name] for name, _ in columns])
+
+    output = tempfile.TemporaryFile(suffix='.xlsx')
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def export_student_rows(request):
+    for row in iter_student_rows():
+        advisor = row['assigned_advisor']
+        row['assigned_advisor'] = advisor_full_name(advisor['first_name'], advisor['last_name']) if advisor else None
+        yield row
+
+
+def export_third_year_rows(request):
+    return iter_third_year_rows()
+
+
+def requested_year(request):
+    """The optional ?year= filter as an int; raises ValueError when it isn't one"""
+    year = request.query_params.get('year')
+    if not year:
+        return None
+    try:
+        return int(year)
+    except ValueError:
+        raise ValueError("year must be an integer")
+
+
+def export_history_rows(request):
+    queryset = InternshipHistory.objects.order_by('year', 'id')
+    year = requested_year(request)
+    if year is not None:
+        queryset = queryset.filter(year=year)
+    rows = queryset.values(
+        'id', 'year', 'start_date', 'end_date',
+        'student__university_id', 'student__full_name', 'company__name',
+    )
+    return rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+EXPORT_DATASETS = {
+    'students': (
+        [
+            ('id', 'ID'), ('university_id', 'University ID'), ('full_name', 'Full name'),
+            ('institutional_email', 'Institutional email'), ('phone_number', 'Phone number'),
+            ('telegram_id', 'Telegram ID'), ('status', 'Status'), ('department', 'Department'),
+            ('assigned_advisor', 'Advisor'), ('company_name', 'Company'), ('start_date', 'Start date'),
+            ('end_date', 'End date'), ('internship_year', 'Internship year'),
+        ],
+        export_student_rows,
+    ),
+    'third-year-students': (
+        [
+            ('university_id', 'University ID'), ('full_name', 'Full name'),
+            ('institutional_email', 'Institutional email'), ('assigned_advisor', 'Advisor'),
+            ('internship_year', 'Internship year'),
+        ],
+        export_third_year_rows,
+    ),
+    'internship-history': (
+        [
+            ('id', 'ID'), ('year', 'Year'), ('student__university_id', 'University ID'),
+            ('student__full_name', 'Student'), ('company__name', 'Company'),
+            ('start_date', 'Start date'), ('end_date', 'End date'),
+        ],
+        export_history_rows,
+    ),
+}
@@ -0,0 +1,221 @@
+# internships/imports.py
+"""
+Set-based import of registrar sheets into ThirdYearStudentList.
+
+Existing keys are loaded into memory with one query, rows are classified
+against them in a single pass (shared with the dry-run preview), each
+chunk's advisors come from one AdvisorAssignmentEngine pass under the
+assignment lock, and new rows are written with bulk_create, so an import
+costs a handful of statements rather than several round trips per row.
+
+Sheets are read in openpyxl read-only mode and committed in chunks of
+COMMIT_CHUNK_ROWS; the row number after the last committed chunk is the
+cursor a retried task resumes from.
+"""
+import hashlib
+import re
+import tempfile
+from itertools import islice
+
+from django.db.models import Value
+
+from advisors.assignment import AdvisorAssignmentEngine, lock_assignments
+from advisors.models import Advisor
+from advisors.tasks import queue_assignment_digests
+from students.models import Student
+from utils.cache_namespaces import bump, advisor_namespace, ADMIN_NAMESPACE
+from utils.generate_email import generate_email
+from .models import ThirdYearStudentList
+
+REQUIRED_COLUMNS = {'university_id', 'full_name'}
+BULK_BATCH_SIZE = 500
+COMMIT_CHUNK_ROWS = 1000
+PREVIEW_SAMPLE_SIZE = 5
+
+# e.g. UGR/3345/16; the length cap matches ThirdYearStudentList.university_id
+UNIVERSITY_ID_PATTERN = re.compile(r'^(?=.{1,20}$)[A-Za-z]{2,5}/\d{1,6}/\d{2}$')
+
+ROW_CATEGORIES = {
+    'new': "New student.",
+    'invalid_id': "University ID is not in the form UGR/3345/16.",
+    'missing_name': "Missing full name.",
+    'registered': "Already registered as a student.",
+    'in_third_year_list': "Already in the third-year list.",
+    'duplicate_in_sheet': "University ID appears earlier in this sheet.",
+    'email_collision': "Generated email already exists.",
+}
+
+
+def spool_upload(uploaded_file, suffix='.xlsx', directory=None):
+    """Copy an upload to a temporary file for the worker; returns (path, sha256 hex digest)"""
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=directory) as tmp_file:
+        for chunk in uploaded_file.chunks():
+            digest.update(chunk)
+            tmp_file.write(chunk)
+    return tmp_file.name, digest.hexdigest()
+
+
+class ExistingKeys:
+    """University IDs and emails already in ThirdYearStudentList or Student, loaded with one UNION query"""
+
+    def __init__(self):
+        third_year = ThirdYearStudentList.objects.annotate(source=Value('third_year')).values_list(
+            'university_id', 'institutional_email', 'source'
+        )
+        registered = Student.objects.annotate(source=Value('student')).values_list(
+            'university_id', 'institutional_email', 'source'
+        )
+        self.third_year_ids, self.student_ids, self.emails = set(), set(), set()
+        for university_id, email, source in third_year.union(registered, all=True):
+            (self.third_year_ids if source == 'third_year' else self.student_ids).add(university_id)
+            self.emails.add(email.lower())
+
+
+def read_headers(sheet):
+    headers = [cell.value for cell in next(sheet.iter_rows(min_row=1, max_row=1))]
+    if not REQUIRED_COLUMNS.issubset(headers):
+        raise ValueError(f"Missing columns. Required: {REQUIRED_COLUMNS}")
+    return headers
+
+
+def iter_sheet_rows(sheet, headers, min_row=2):
+    """Yield (row_number, university_id, full_name) for every non-empty data row"""
+    for row_number, row in enumerate(sheet.iter_rows(min_row=min_row, values_only=True), start=min_row):
+        row_data = dict(zip(headers, row or ()))
+        if not row_data.get('university_id'):  # Skip empty rows
+            continue
+        university_id = str(row_data['university_id']).strip()
+        full_name = str(row_data['full_name'] or '').strip()
+        yield row_number, university_id, full_name
+
+
+def iter_chunks(rows, size=COMMIT_CHUNK_ROWS):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+class SheetClaims:
+    """
+    The in-sheet checks: a university ID or email counts as taken once an
+    earlier row in the same run was accepted as new.
+    """
+
+    def __init__(self):
+        self.seen_ids, self.seen_emails = set(), set()
+
+    def claim(self, university_id, email, email_taken):
+        """Category of a row that passed the per-row checks; `email_taken` if the email already exists"""
+        if university_id in self.seen_ids:
+            return 'duplicate_in_sheet'
+        if email_taken or email.lower() in self.seen_emails:
+            return 'email_collision'
+
+        self.seen_ids.add(university_id)
+        self.seen_emails.add(email.lower())
+        return 'new'
+
+
+class RowClassifier(SheetClaims):
+    """
+    Sorts sheet rows into ROW_CATEGORIES against pre-fetched key sets. Used
+    by both the dry-run preview and the real import, so they always agree.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.existing = ExistingKeys()
+
+    def classify(self, university_id, full_name):
+        """Returns (category, generated email)"""
+        if not UNIVERSITY_ID_PATTERN.match(university_id):
+            return 'invalid_id', None
+        if not full_name:
+            return 'missing_name', None
+        email = generate_email(full_name, university_id)
+        if university_id in self.existing.student_ids:
+            return 'registered', email
+        if university_id in self.existing.third_year_ids:
+            return 'in_third_year_list', email
+        return self.claim(university_id, email, email.lower() in self.existing.emails), email
+
+
+def preview_import(rows, sample_size=PREVIEW_SAMPLE_SIZE):
+    """Classify parsed rows without writing anything; returns counts and sample rows per category"""
+    classifier = RowClassifier()
+    summary = {category: 0 for category in ROW_CATEGORIES}
+    samples = {category: [] for category in ROW_CATEGORIES}
+    for row_number, university_id, full_name in rows:
+        category, email = classifier.classify(university_id, full_name)
+        summary[category] += 1
+        if len(samples[category]) < sample_size:
+            samples[category].append({
+                "row": row_number,
+                "university_id": university_id,
+                "full_name": full_name,
+                "email": email,
+            })
+    return {
+        "total_rows": sum(summary.values()),
+        "summary": summary,
+        "categories": ROW_CATEGORIES,
+        "samples": {category: rows for category, rows in samples.items() if rows},
+    }
+
+
+class ThirdYearImport(RowClassifier):
+    """One import run: classified rows, running counts and row errors"""
+
+    def __init__(self, batch_size=BULK_BATCH_SIZE):
+        super().__init__()
+        self.batch_size = batch_size
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+
+        if not Advisor.objects.exists():
+            raise ValueError("No available advisor.")
+
+    def build(self, rows):
+        """Turn parsed rows into unsaved ThirdYearStudentList objects, skipping every row that is not new"""
+        students = []
+        for row_number, university_id, full_name in rows:
+            category, email = self.classify(university_id, full_name)
+            if category != 'new':
+                self.skipped += 1
+                self.errors.append({
+                    "row": row_number,
+                    "university_id": university_id,
+                    "category": category,
+                    "error": ROW_CATEGORIES[category],
+                })
+                continue
+
+            students.append(ThirdYearStudentList(
+                university_id=university_id,
+                full_name=full_name,
+                institutional_email=email,
+            ))
+        return students
+
+    def take_errors(self):
+        errors, self.errors = self.errors, []
+        return errors
+
+    def save(self, students):
+        """
+        Assign advisors and create the rows; call inside a transaction. Rows
+        left over once every advisor is full are created unassigned.
+        bulk_create skips the post_save hooks, so the affected caches are
+        invalidated here.
+        """
+        lock_assignments()
+        engine = AdvisorAssignmentEngine()
+        for student in students:
+            student.assigned_advisor_id = engine.next_advisor_id()
+        ThirdYearStudentList.objects.bulk_create(students, batch_size=self.batch_size)
+        advisor_ids = {student.assigned_advisor_id for student in students if student.assigned_advisor_id}
+        bump(ADMIN_NAMESPACE, *(advisor_namespace(advisor_id) for advisor_id in advisor_ids))
+        queue_assignment_digests((student.assigned_advisor_id, student.university_id) for student in students)
+        self.created += len(students)
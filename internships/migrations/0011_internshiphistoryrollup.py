@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('internships', '0010_company_telegram_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InternshipHistoryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('grain', models.CharField(choices=[('year', 'Year'), ('department', 'Department'), ('company', 'Company')], max_length=10)),
+                ('department_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('company_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('internship_count', models.PositiveIntegerField(default=0)),
+                ('total_duration_days', models.IntegerField(default=0)),
+                ('median_duration_days', models.FloatField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-year', 'grain', '-internship_count'],
+                'indexes': [models.Index(fields=['year', 'grain'], name='internships_year_974378_idx')],
+            },
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.db import models
+from django.conf import settings
+from django.utils import timezone
 from advisors.models import Advisor
 from django.apps import apps
-from datetime import datetime
+from datetime import datetime, timedelta
+import uuid
 
 class Department(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -85,3 +88,132 @@ class InternshipHistory(models.Model):
     def __str__(self):
         return f"{self.student.full_name} - {self.year}"
 
+
+class InternshipHistoryRollup(models.Model):
+    """Pre-aggregated InternshipHistory per year, year/department and year/department/company"""
+    GRAIN_CHOICES = [
+        ('year', 'Year'),
+        ('department', 'Department'),
+        ('company', 'Company'),
+    ]
+
+    year = models.PositiveIntegerField()
+    grain = models.CharField(max_length=10, choices=GRAIN_CHOICES)
+    department_name = models.CharField(max_length=100, null=True, blank=True)
+    company_name = models.CharField(max_length=255, null=True, blank=True)
+    internship_count = models.PositiveIntegerField(default=0)
+    total_duration_days = models.IntegerField(default=0)
+    median_duration_days = models.FloatField(null=True, blank=True)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['year', 'grain'])]
+        ordering = ['-year', 'grain', '-internship_count']
+
+    def __str__(self):
+        return f"{self.year} {self.grain}: {self.internship_count}"
+
+
+class ImportJob(models.Model):
+    """One uploaded registrar sheet and the progress of the Celery task importing it"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    KIND_CHOICES = [
+        ('third_year_students', 'Third-year students'),
+        ('advisors', 'Advisors'),
+    ]
+    ACTIVE_STATUSES = ('pending', 'running')
+    MAX_ERRORS = 500
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='import_jobs'
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='third_year_students')
+    file_name = models.CharField(max_length=255, blank=True)
+    file_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    task_id = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    next_row = models.PositiveIntegerField(default=2)
+    rows_seen = models.PositiveIntegerField(default=0)
+    rows_created = models.PositiveIntegerField(default=0)
+    rows_skipped = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    skipped_by_category = models.JSONField(default=dict, blank=True)
+    parse_seconds = models.FloatField(default=0)
+    write_seconds = models.FloatField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Last progress; a job that stops moving is abandoned
+
+    class Meta:
+        indexes = [models.Index(fields=['created_by', '-created_at'])]
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import {self.id} ({self.status})"
+
+    @classmethod
+    def active_for_file(cls, kind, file_sha256):
+        """A pending or running job already importing the same file, if any"""
+        # A job that was never picked up, or whose worker died, stops blocking the file after a while
+        stale_before = timezone.now() - timedelta(seconds=settings.IMPORT_JOB_STALE_SECONDS)
+        return cls.objects.filter(
+            kind=kind, file_sha256=file_sha256, status__in=cls.ACTIVE_STATUSES, updated_at__gte=stale_before
+        ).first()
+
+    @property
+    def duration_seconds(self):
+        if not self.started_at:
+            return None
+        return ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+
+    def add_errors(self, errors):
+        self.errors = (self.errors + list(errors))[:self.MAX_ERRORS]
+
+    def mark_running(self, task_id):
+        self.status = 'running'
+        self.task_id = task_id or self.task_id
+        self.started_at = self.started_at or timezone.now()
+        self.save(update_fields=['status', 'task_id', 'started_at', 'updated_at'])
+
+    def record_chunk(self, rows_seen, rows_created, next_row, errors, parse_seconds, write_seconds):
+        """Save the progress of one committed chunk; call inside the chunk's transaction"""
+        self.rows_seen += rows_seen
+        self.rows_created += rows_created
+        self.rows_skipped += rows_seen - rows_created
+        self.next_row = next_row
+        self.parse_seconds += parse_seconds
+        self.write_seconds += write_seconds
+        self.add_errors(errors)
+        # errors is capped at MAX_ERRORS, so the per-category counts are kept separately
+        for error in errors:
+            if 'category' in error:
+                self.skipped_by_category[error['category']] = self.skipped_by_category.get(error['category'], 0) + 1
+        self.save(update_fields=[
+            'rows_seen', 'rows_created', 'rows_skipped', 'skipped_by_category', 'next_row', 'errors',
+            'parse_seconds', 'write_seconds', 'updated_at',
+        ])
+
+    def finish(self, status, error=None):
+        self.status = status
+        self.finished_at = timezone.now()
+        if error:
+            self.add_errors([{"row": self.next_row, "error": error}])
+        self.save(update_fields=['status', 'finished_at', 'errors', 'updated_at'])
+
+    def progress(self):
+        return {
+            "job_id": str(self.id),
+            "status": self.status,
+            "next_row": self.next_row,
+            "rows_seen": self.rows_seen,
+            "rows_created": self.rows_created,
+            "rows_skipped": self.rows_skipped,
+            "skipped_by_category": self.skipped_by_category,
+        }
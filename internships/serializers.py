@@ -1,5 +1,6 @@
+from datetime import datetime
 from rest_framework import serializers
-from .models import Company, Internship, ThirdYearStudentList, InternStudentList, InternshipHistory
+from .models import Company, Internship, ThirdYearStudentList, InternStudentList, InternshipHistory, ImportJob
 from students.serializers import DepartmentSerializer
 from advisors.models import Advisor
 from students.models import Student, InternshipOfferLetter
@@ -9,6 +10,35 @@ class AdvisorBasicSerializer(serializers.ModelSerializer):
         model = Advisor
         fields = ['id', 'first_name', 'last_name']
 
+class AdminStudentSerializer(serializers.ModelSerializer):
+    """Registered student row for the admin list; expects admin_student_queryset() annotations"""
+    department = serializers.CharField(source='department.name', read_only=True, default=None)
+    assigned_advisor = AdvisorBasicSerializer(read_only=True)
+    company_name = serializers.CharField(read_only=True, default=None)
+
+    class Meta:
+        model = Student
+        fields = '__all__'
+
+
+class ThirdYearStudentAdminSerializer(serializers.ModelSerializer):
+    assigned_advisor = serializers.SerializerMethodField()
+    internship_year = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ThirdYearStudentList
+        fields = ['university_id', 'full_name', 'institutional_email', 'assigned_advisor', 'internship_year']
+
+    def get_assigned_advisor(self, obj):
+        advisor = obj.assigned_advisor
+        if not advisor:
+            return None
+        return f"{advisor.first_name or ''} {advisor.last_name or ''}".strip()
+
+    def get_internship_year(self, obj):
+        return datetime.now().year
+
+
 class CompanySerializer(serializers.ModelSerializer):
     class Meta:
         model = Company
@@ -47,4 +77,17 @@ class InternshipHistorySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = InternshipHistory
-        fields = ['id', 'student_name', 'company_name', 'year', 'start_date', 'end_date']
\ No newline at end of file
+        fields = ['id', 'student_name', 'company_name', 'year', 'start_date', 'end_date']
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    created_by = serializers.CharField(source='created_by.username', read_only=True, default=None)
+    duration_seconds = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'kind', 'created_by', 'file_name', 'status', 'rows_seen', 'rows_created', 'rows_skipped',
+            'skipped_by_category', 'errors', 'parse_seconds', 'write_seconds', 'duration_seconds',
+            'created_at', 'started_at', 'finished_at',
+        ]
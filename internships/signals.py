@@ -1,34 +1,41 @@
 # internships/signals.py
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
+from utils.cache_namespaces import bump, telegram_namespace, ADMIN_NAMESPACE
 from .models import Company, ThirdYearStudentList, InternshipHistory
+from .tasks import schedule_rollup_refresh
 
-def clear_internship_cache():
-    """Clear all internship-related cache"""
-    cache.delete_pattern('internship_*')
-    cache.delete_pattern('company_*')
-    cache.delete_pattern('admin_students_*')
-    cache.delete_pattern('admin_advisors_*')
+def clear_internship_cache(*namespaces):
+    """Invalidate the admin lists, plus any extra namespaces given"""
+    bump(ADMIN_NAMESPACE, *namespaces)
 
 @receiver([post_save, post_delete], sender=Company)
 def invalidate_company_cache(sender, instance, **kwargs):
     """Clear cache when company data changes"""
-    clear_internship_cache()
-    cache.delete_pattern(f'company_{instance.id}_*')
-    cache.delete_pattern(f'company_telegram_{instance.telegram_id}_*')
+    clear_internship_cache(telegram_namespace(instance.telegram_id))
 
 @receiver([post_save, post_delete], sender=ThirdYearStudentList)
 def invalidate_third_year_cache(sender, instance, **kwargs):
     """Clear cache when third year student data changes"""
     clear_internship_cache()
-    cache.delete_pattern('third_year_students_*')
-    if instance.assigned_advisor:
-        cache.delete_pattern(f'advisor_{instance.assigned_advisor.id}_*')
 
 @receiver([post_save, post_delete], sender=InternshipHistory)
 def invalidate_internship_history_cache(sender, instance, **kwargs):
     """Clear cache when internship history changes"""
     clear_internship_cache()
-    cache.delete_pattern('internship_history_*')
-    cache.delete_pattern(f'internship_history_year_{instance.year}_*')
+
+@receiver(pre_save, sender=InternshipHistory)
+def remember_previous_year(sender, instance, **kwargs):
+    instance._previous_year = None
+    if instance.pk:
+        instance._previous_year = (
+            InternshipHistory.objects.filter(pk=instance.pk).values_list('year', flat=True).first()
+        )
+
+@receiver([post_save, post_delete], sender=InternshipHistory)
+def refresh_internship_history_rollup(sender, instance, **kwargs):
+    """Rebuild the analytics rollup for the affected years once the write commits"""
+    schedule_rollup_refresh(instance.year)
+    previous_year = getattr(instance, '_previous_year', None)
+    if previous_year is not None and previous_year != instance.year:
+        schedule_rollup_refresh(previous_year)
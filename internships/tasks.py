@@ -1,79 +1,130 @@
+from functools import partial
 from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
 from openpyxl import load_workbook
-from internships.models import ThirdYearStudentList
-from advisors.models import Advisor
-from advisors.tasks import notify_advisor_task
-from utils.generate_email import generate_email
-from utils.get_next_available_advisor import get_next_available_advisor
+from internships.imports import ThirdYearImport, read_headers, iter_sheet_rows, iter_chunks
+from internships.copy_import import supports_copy, copy_csv_roster, open_csv, iter_csv_rows
+from internships.analytics import refresh_history_rollup, refresh_all_history_rollups
+from internships.models import ImportJob
 import os
+import time
 
-@shared_task(bind=True, max_retries=3)
-def process_student_excel_task(self, file_path):
-    """Process student Excel file asynchronously using openpyxl"""
-    try:
-        # Load workbook using openpyxl
-        workbook = load_workbook(filename=file_path)
-        sheet = workbook.active
-        
-        # Get headers
-        headers = [cell.value for cell in sheet[1]]
-        required_columns = {'university_id', 'full_name'}
-        
-        if not all(col in headers for col in required_columns):
-            raise ValueError(f"Missing columns. Required: {required_columns}")
-
-        created_students = []
-        
+def import_rows_in_chunks(task, job, rows):
+    """
+    Commit parsed rows in chunks. Each chunk's progress is saved on the
+    ImportJob in the same transaction, so a retry resumes at `job.next_row`,
+    the first row after the last committed chunk.
+    """
+    student_import = ThirdYearImport()
+    chunks = iter_chunks(rows)
+    while True:
+        started = time.monotonic()
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        students = student_import.build(chunk)
+        parsed = time.monotonic()
         with transaction.atomic():
-            # Iterate through rows (starting from row 2 to skip headers)
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                if not row[0]:  # Skip empty rows
-                    continue
-                    
-                # Create a dictionary from row values and headers
-                row_data = dict(zip(headers, row))
-                
-                university_id = str(row_data['university_id']).strip()[:20]
-                full_name = str(row_data['full_name']).strip()
-
-                if ThirdYearStudentList.objects.filter(university_id=university_id).exists():
-                    continue
-
-                email = generate_email(full_name, university_id)
-                advisor = get_next_available_advisor()
-                
-                if not advisor:
-                    raise ValueError("No available advisor.")
-
-                student = ThirdYearStudentList.objects.create(
-                    university_id=university_id,
-                    full_name=full_name,
-                    institutional_email=email,
-                    assigned_advisor=advisor
-                )
-
-                created_students.append({
-                    "university_id": university_id,
-                    "full_name": full_name,
-                    "email": email,
-                    "advisor": advisor.first_name
-                })
-
-        # Notify all advisors about their new students
-        for advisor in Advisor.objects.all():
-            notify_advisor_task.delay(advisor.id)
-
-        # Clean up temporary file
+            student_import.save(students)
+            job.record_chunk(
+                rows_seen=len(chunk),
+                rows_created=len(students),
+                next_row=chunk[-1][0] + 1,
+                errors=student_import.take_errors(),
+                parse_seconds=parsed - started,
+                write_seconds=time.monotonic() - parsed,
+            )
+        task.update_state(state='PROGRESS', meta=job.progress())
+
+
+def retry_or_fail(task, job, file_path, exc):
+    if task.request.retries >= task.max_retries:
+        job.finish('failed', error=str(exc))
         if os.path.exists(file_path):
             os.unlink(file_path)
+        raise exc
+    # Keep the file: the retry resumes after the last committed chunk
+    raise task.retry(countdown=60, exc=exc)
+
+
+def finish_import(job, file_path):
+    # Advisors hear about their new students through the assignment digest
+    job.finish('completed')
+
+    # Clean up temporary file
+    if os.path.exists(file_path):
+        os.unlink(file_path)
+
+    return job.progress()
 
-        return {
-            "message": f"{len(created_students)} students uploaded successfully.",
-            "data": created_students
-        }
+
+@shared_task(bind=True, max_retries=3)
+def process_student_excel_task(self, job_id, file_path):
+    """Stream the sheet in read-only mode and commit it in chunks"""
+    job = ImportJob.objects.get(pk=job_id)
+    job.mark_running(self.request.id)
+    try:
+        workbook = load_workbook(filename=file_path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            import_rows_in_chunks(self, job, iter_sheet_rows(sheet, read_headers(sheet), min_row=job.next_row))
+        finally:
+            workbook.close()
     except Exception as e:
-        # Clean up temporary file on error
-        if os.path.exists(file_path):
-            os.unlink(file_path)
-        self.retry(countdown=60, exc=e)
+        retry_or_fail(self, job, file_path, e)
+
+    return finish_import(job, file_path)
+
+
+@shared_task(bind=True, max_retries=3)
+def process_student_csv_task(self, job_id, file_path):
+    """
+    CSV rosters: on Postgres the file is COPYed into a staging table and merged
+    in chunks; other databases fall back to the chunked ORM import.
+    """
+    job = ImportJob.objects.get(pk=job_id)
+    job.mark_running(self.request.id)
+    try:
+        if supports_copy():
+            copy_csv_roster(self, job, file_path)
+        else:
+            with open_csv(file_path) as csv_file:
+                import_rows_in_chunks(self, job, iter_csv_rows(csv_file, min_row=job.next_row))
+    except Exception as e:
+        retry_or_fail(self, job, file_path, e)
+
+    return finish_import(job, file_path)
+
+
+def rollup_scheduled_key(year):
+    return f'internship-rollup-scheduled:{year}'
+
+
+def schedule_rollup_refresh(year):
+    """
+    Rebuild `year`'s rollup ROLLUP_REFRESH_DELAY_SECONDS after the current
+    transaction commits; writes in the meantime share that one rebuild.
+    """
+    transaction.on_commit(partial(start_rollup_refresh, year))
+
+
+def start_rollup_refresh(year):
+    delay = settings.ROLLUP_REFRESH_DELAY_SECONDS
+    # The flag outlives the countdown slightly so a year is never scheduled twice per delay
+    if cache.add(rollup_scheduled_key(year), 1, timeout=delay + 60):
+        refresh_internship_rollup_task.apply_async(args=[year], countdown=delay)
+
+
+@shared_task(bind=True, max_retries=3)
+def refresh_internship_rollup_task(self, year=None):
+    """Rebuild the InternshipHistoryRollup rows for one year (or every year)"""
+    try:
+        if year is None:
+            return refresh_all_history_rollups()
+        # Writes committed from here on schedule the next rebuild
+        cache.delete(rollup_scheduled_key(year))
+        return refresh_history_rollup(year)
+    except Exception as e:
+        self.retry(countdown=30, exc=e)
@@ -1,3 +1,491 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import Workbook, load_workbook
+from rest_framework.test import APIClient
+
+from advisors.assignment import apply_assignments
+from advisors.models import Advisor
+from students.models import Student, InternshipOfferLetter
+from .analytics import refresh_history_rollup
+from .copy_import import open_csv, iter_csv_rows
+from .imports import ThirdYearImport, RowClassifier, iter_chunks
+from .models import Department, ThirdYearStudentList, InternshipHistory, InternshipHistoryRollup, Company, ImportJob
+from .tasks import refresh_internship_rollup_task, process_student_excel_task, process_student_csv_task
+
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class AdminTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="registrar", password="secret-pass")
+        cls.department = Department.objects.create(
+            name="Software Engineering",
+            internship_duration_weeks=12,
+            internship_start=date(2025, 6, 1),
+            internship_end=date(2025, 9, 1),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def add_students(self, count, prefix="UGR"):
+        advisor = Advisor.objects.create(first_name="Abebe", last_name="Kebede")
+        students = Student.objects.bulk_create([
+            Student(
+                university_id=f"{prefix}/{i:04d}/15",
+                institutional_email=f"{prefix.lower()}{i}@aau.edu.et",
+                full_name=f"Student {i}",
+                department=self.department,
+                assigned_advisor=advisor,
+            )
+            for i in range(count)
+        ])
+        InternshipOfferLetter.objects.bulk_create([
+            InternshipOfferLetter(student=student, company_name=f"Company {student.pk}") for student in students
+        ])
+        ThirdYearStudentList.objects.bulk_create([
+            ThirdYearStudentList(
+                university_id=f"{prefix}/{i:04d}/16",
+                full_name=f"Third Year {i}",
+                institutional_email=f"{prefix.lower()}.3y{i}@aau.edu.et",
+                assigned_advisor=advisor,
+            )
+            for i in range(count)
+        ])
+        return students
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AdminStudentsListViewTest(AdminTestCase):
+    def query_count(self, path):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_query_count_is_independent_of_registry_size(self):
+        self.add_students(2, prefix="AA")
+        small, _ = self.query_count("/aau_api/internship/students/")
+        self.add_students(30, prefix="BB")
+        large, response = self.query_count("/aau_api/internship/students/")
+
+        self.assertEqual(small, large)
+        first = response.data["registered_students"]["results"][0]
+        self.assertEqual(first["department"], "Software Engineering")
+        self.assertEqual(first["company_name"], f"Company {first['id']}")
+        self.assertEqual(response.data["third_year_students"]["results"][0]["assigned_advisor"], "Abebe Kebede")
+
+    def test_stream_returns_the_whole_registry(self):
+        self.add_students(3)
+        response = self.client.get("/aau_api/internship/students/?stream=true")
+
+        document = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(len(document["registered_students"]), 3)
+        self.assertEqual(len(document["third_year_students"]), 3)
+        self.assertEqual(document["registered_students"][0]["assigned_advisor"]["first_name"], "Abebe")
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AdminExportViewTest(AdminTestCase):
+    def test_students_csv_is_streamed_with_one_query(self):
+        self.add_students(25)
+        with self.assertNumQueries(1):
+            response = self.client.get("/aau_api/internship/export/students/csv/")
+            rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+
+        self.assertEqual(rows[0][:3], ["ID", "University ID", "Full name"])
+        self.assertEqual(len(rows), 26)
+        self.assertEqual(rows[1][rows[0].index("Advisor")], "Abebe Kebede")
+
+    def test_third_year_xlsx(self):
+        self.add_students(3)
+        response = self.client.get("/aau_api/internship/export/third-year-students/xlsx/")
+
+        workbook = load_workbook(io.BytesIO(b"".join(response.streaming_content)), read_only=True)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(rows[0][0], "University ID")
+        self.assertEqual([row[0] for row in rows[1:]], ["UGR/0000/16", "UGR/0001/16", "UGR/0002/16"])
+
+    def test_history_year_filter(self):
+        student = self.add_students(1)[0]
+        for year in (2024, 2025):
+            InternshipHistory.objects.create(
+                student=student, year=year, start_date=date(year, 6, 1), end_date=date(year, 9, 1)
+            )
+
+        response = self.client.get("/aau_api/internship/export/internship-history/csv/?year=2025")
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual([row[1] for row in rows[1:]], ["2025"])
+
+        response = self.client.get("/aau_api/internship/export/internship-history/csv/?year=last")
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, ROLLUP_REFRESH_DELAY_SECONDS=60)
+class InternshipHistoryRollupTest(AdminTestCase):
+    def add_history(self, student, year, company=None, weeks=12):
+        return InternshipHistory.objects.create(
+            student=student, company=company, year=year,
+            start_date=date(year, 6, 1), end_date=date(year, 6, 1) + timedelta(weeks=weeks),
+        )
+
+    def scheduled_years(self, write):
+        with mock.patch.object(refresh_internship_rollup_task, 'apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+        return [call.kwargs['args'][0] for call in apply_async.call_args_list]
+
+    def test_writes_in_one_window_share_a_rebuild(self):
+        students = self.add_students(3)
+
+        self.assertEqual(self.scheduled_years(lambda: [self.add_history(s, 2025) for s in students]), [2025])
+        # Still inside the window of the first write
+        self.assertEqual(self.scheduled_years(lambda: self.add_history(students[0], 2025)), [])
+
+    def test_moving_a_row_to_another_year_rebuilds_both(self):
+        history = self.add_history(self.add_students(1)[0], 2025)
+        cache.clear()
+
+        def move():
+            history.year = 2024
+            history.save()
+
+        self.assertEqual(sorted(self.scheduled_years(move)), [2024, 2025])
+
+    def test_non_integer_year_is_rejected(self):
+        for path in ("/aau_api/internship/internship-history/", "/aau_api/internship/internship-history/analytics/"):
+            self.assertEqual(self.client.get(path, {"year": "2025a"}).status_code, 400)
+
+    @skipUnless(connection.vendor == 'postgresql', "The rollup's median uses percentile_cont")
+    def test_rollup_rebuild_replaces_the_year(self):
+        students = self.add_students(3)
+        company = Company.objects.create(name="Ethio Telecom", telegram_id="c1")
+        self.add_history(students[0], 2025, company, weeks=8)
+        self.add_history(students[1], 2025, company, weeks=12)
+        self.add_history(students[2], 2025, weeks=16)
+
+        refresh_history_rollup(2025)
+        refresh_history_rollup(2025)
+
+        year = InternshipHistoryRollup.objects.get(year=2025, grain='year')
+        self.assertEqual(year.internship_count, 3)
+        self.assertEqual(year.median_duration_days, 84)
+        self.assertEqual(InternshipHistoryRollup.objects.filter(year=2025, grain='company').count(), 2)
+
+        data = self.client.get("/aau_api/internship/internship-history/analytics/", {"year": 2025}).data
+        self.assertEqual(data["years"][0]["internship_count"], 3)
+
+
+def sheet_rows(count, start=0, year=16):
+    return [(row + 2, f"UGR/{start + row:04d}/{year}", f"Student Number {start + row}") for row in range(count)]
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ThirdYearImportTest(AdminTestCase):
+    def run_import(self, rows):
+        student_import = ThirdYearImport()
+        with CaptureQueriesContext(connection) as queries:
+            students = student_import.build(rows)
+            student_import.save(students)
+        return student_import, len(queries)
+
+    def test_query_count_is_independent_of_sheet_size(self):
+        Advisor.objects.create(first_name="Abebe")
+        _, small = self.run_import(sheet_rows(3))
+        _, large = self.run_import(sheet_rows(60, start=100))
+
+        self.assertEqual(small, large)
+        self.assertEqual(ThirdYearStudentList.objects.count(), 63)
+        self.assertFalse(ThirdYearStudentList.objects.filter(assigned_advisor=None).exists())
+
+    def test_existing_and_repeated_rows_are_skipped(self):
+        self.add_students(1)  # Registers UGR/0000/15 and lists UGR/0000/16
+        rows = [
+            (2, "UGR/0000/15", "Already Registered"),
+            (3, "UGR/0000/16", "Already Listed"),
+            (4, "UGR/0001/16", "New Student"),
+            (5, "UGR/0001/16", "New Student"),
+        ]
+        student_import, _ = self.run_import(rows)
+
+        self.assertEqual(student_import.created, 1)
+        self.assertEqual(
+            [error["category"] for error in student_import.errors],
+            ["registered", "in_third_year_list", "duplicate_in_sheet"],
+        )
+
+    def test_university_id_format(self):
+        classifier = RowClassifier()
+        for university_id in ["UGR/3345/16", "ugr/1/16", "ATR/123456/09", "GSR/0042/15"]:
+            self.assertEqual(classifier.classify(university_id, "Some Student")[0], 'new', university_id)
+        for university_id in [
+            "UGR/3345/2016", "UGR 3345 16", "UGR-3345-16", "3345/16", "UGR/3345/16/1", "UGR/1234567/16",
+            "U/3345/16", "UGR/33A5/16",
+        ]:
+            self.assertEqual(classifier.classify(university_id, "Some Student"), ('invalid_id', None), university_id)
+
+
+def write_sheet(rows):
+    """An .xlsx registrar sheet in a temporary file; returns its path"""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["university_id", "full_name"])
+    for _, university_id, full_name in rows:
+        sheet.append([university_id, full_name])
+    with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as sheet_file:
+        workbook.save(sheet_file)
+    return sheet_file.name
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ChunkedImportResumeTest(AdminTestCase):
+    def test_retry_resumes_after_the_last_committed_chunk(self):
+        Advisor.objects.create(first_name="Abebe")
+        path = write_sheet(sheet_rows(5))
+        job = ImportJob.objects.create(file_name="sheet.xlsx")
+
+        save = ThirdYearImport.save
+        calls = []
+
+        def fail_second_chunk_once(student_import, students):
+            calls.append(len(students))
+            if len(calls) == 2:
+                raise RuntimeError("connection lost")
+            return save(student_import, students)
+
+        with mock.patch('internships.tasks.iter_chunks', lambda rows: iter_chunks(rows, size=2)), \
+                mock.patch.object(ThirdYearImport, 'save', autospec=True, side_effect=fail_second_chunk_once):
+            process_student_excel_task.apply(args=[str(job.pk), path])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        # The first chunk was not read again by the retry
+        self.assertEqual(calls, [2, 2, 2, 1])
+        self.assertEqual((job.rows_seen, job.rows_created, job.rows_skipped), (5, 5, 0))
+        self.assertEqual(ThirdYearStudentList.objects.count(), 5)
+        self.assertFalse(os.path.exists(path))
+
+    def test_skipped_rows_are_counted_by_category(self):
+        Advisor.objects.create(first_name="Abebe")
+        rows = sheet_rows(3) + [
+            (5, "UGR/3345/2016", "Long Year"), (6, "UGR 3346 16", "No Slashes"), (7, "UGR/0000/16", "Again"),
+        ]
+        path = write_sheet(rows)
+        job = ImportJob.objects.create(file_name="sheet.xlsx")
+
+        with mock.patch('internships.tasks.iter_chunks', lambda rows: iter_chunks(rows, size=2)):
+            process_student_excel_task.apply(args=[str(job.pk), path])
+
+        job.refresh_from_db()
+        self.assertEqual((job.rows_created, job.rows_skipped), (3, 3))
+        self.assertEqual(job.skipped_by_category, {"invalid_id": 2, "duplicate_in_sheet": 1})
+        self.assertEqual(
+            [(error["university_id"], error["category"]) for error in job.errors],
+            [("UGR/3345/2016", "invalid_id"), ("UGR 3346 16", "invalid_id"), ("UGR/0000/16", "duplicate_in_sheet")],
+        )
+        detail = self.client.get(f"/aau_api/internship/import-jobs/{job.pk}/")
+        self.assertEqual(detail.data["skipped_by_category"], {"invalid_id": 2, "duplicate_in_sheet": 1})
+
+
+def write_csv(rows):
+    """A CSV roster in a temporary file; `rows` are [university_id, full_name] lists"""
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, newline='', encoding='utf-8') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["university_id", "full_name"])
+        writer.writerows(rows)
+    return csv_file.name
+
+
+@skipUnless(connection.vendor == 'postgresql', "The CSV fast path uses COPY")
+@override_settings(CACHES=LOCMEM_CACHE)
+class CopyRosterImportTest(AdminTestCase):
+    def test_categories_match_the_row_classifier(self):
+        self.add_students(1)  # Registers UGR/0000/15 and lists UGR/0000/16
+        ThirdYearStudentList.objects.create(
+            university_id="GSR/0001/15", full_name="Taken Person", institutional_email="taken.ugr-0100-16@aau.edu.et"
+        )
+        path = write_csv([
+            ["UGR/0000/15", "Already Registered"],
+            ["UGR/0000/16", "Already Listed"],
+            ["UGR/0100/16", "Taken Person"],  # Email exists, so the ID is not claimed...
+            ["UGR/0100/16", "Other Person"],  # ...and the next row with it is new
+            ["UGR/0100/16", "Other Again"],
+            ["ugr/0101/16", "Abebe One"],
+            ["UGR/0101/16", "Abebe Two"],  # Same generated email as the row above
+            ["UGR/0101/16", "Kebede Two"],
+            ["UGR/0102/2016", "Long Year"],
+            ["  UGR/0103/16\t", "\tTabbed  Name "],
+            ["UGR/0104/16", ""],
+            ["", "Empty Row"],
+            ["UGR/0105/16", "Plain New"],
+        ])
+        with open_csv(path) as csv_file:
+            classifier = RowClassifier()
+            expected = [
+                (row_number, university_id, classifier.classify(university_id, full_name))
+                for row_number, university_id, full_name in iter_csv_rows(csv_file)
+            ]
+        job = ImportJob.objects.create(file_name="roster.csv")
+
+        with mock.patch('internships.copy_import.COMMIT_CHUNK_ROWS', 3):
+            process_student_csv_task.apply(args=[str(job.pk), path])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(
+            [(error["row"], error["university_id"], error["category"]) for error in job.errors],
+            [(row, university_id, category) for row, university_id, (category, _) in expected if category != 'new'],
+        )
+        new_rows = {university_id: email for _, university_id, (category, email) in expected if category == 'new'}
+        self.assertEqual(
+            dict(ThirdYearStudentList.objects.filter(university_id__in=new_rows).values_list(
+                'university_id', 'institutional_email'
+            )),
+            new_rows,
+        )
+        self.assertEqual((job.rows_seen, job.rows_created), (len(expected), len(new_rows)))
+
+    def test_retry_resumes_after_the_last_committed_chunk(self):
+        Advisor.objects.create(first_name="Abebe")
+        path = write_csv([[university_id, full_name] for _, university_id, full_name in sheet_rows(5)])
+        job = ImportJob.objects.create(file_name="roster.csv")
+
+        calls = []
+
+        def fail_second_chunk_once(model, assignments):
+            calls.append(len(assignments))
+            if len(calls) == 2:
+                raise RuntimeError("connection lost")
+            return apply_assignments(model, assignments)
+
+        with mock.patch('internships.copy_import.COMMIT_CHUNK_ROWS', 2), \
+                mock.patch('internships.copy_import.apply_assignments', side_effect=fail_second_chunk_once):
+            process_student_csv_task.apply(args=[str(job.pk), path])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(calls, [2, 2, 2, 1])
+        self.assertEqual((job.rows_seen, job.rows_created, job.rows_skipped, job.errors), (5, 5, 0, []))
+        self.assertEqual(ThirdYearStudentList.objects.count(), 5)
+        self.assertFalse(os.path.exists(path))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ImportJobEndpointsTest(AdminTestCase):
+    def upload(self, content):
+        sheet = SimpleUploadedFile("students.xlsx", content)
+        return self.client.post("/aau_api/internship/upload-students/", {"file": sheet}, format='multipart')
+
+    def sheet_content(self):
+        path = write_sheet(sheet_rows(3))
+        with open(path, 'rb') as sheet_file:
+            content = sheet_file.read()
+        os.unlink(path)
+        return content
+
+    def test_upload_is_tracked_by_a_pollable_job(self):
+        content = self.sheet_content()
+
+        with mock.patch.object(process_student_excel_task, 'delay') as delay:
+            delay.return_value.id = "task-1"
+            accepted = self.upload(content)
+            again = self.upload(content)
+        spooled = delay.call_args.args[1]
+        self.addCleanup(os.unlink, spooled)
+
+        self.assertEqual(accepted.status_code, 202)
+        job_id = accepted.data["job_id"]
+        # The same file while the first import is pending is not queued again
+        self.assertEqual(delay.call_count, 1)
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(str(again.data["job"]["id"]), job_id)
+
+        detail = self.client.get(f"/aau_api/internship/import-jobs/{job_id}/")
+        self.assertEqual((detail.data["status"], detail.data["created_by"]), ("pending", "registrar"))
+        latest = self.client.get("/aau_api/internship/import-jobs/latest/")
+        self.assertEqual(str(latest.data["id"]), job_id)
+        self.assertEqual(ImportJob.objects.get(pk=job_id).task_id, "task-1")
+
+    def test_failed_enqueue_does_not_block_the_file(self):
+        content = self.sheet_content()
+        broker_down = ConnectionError("broker down")
+        with mock.patch.object(process_student_excel_task, 'delay', side_effect=broker_down) as delay:
+            failed = self.upload(content)
+        spooled = delay.call_args.args[1]
+
+        self.assertEqual(failed.status_code, 500)
+        self.assertFalse(os.path.exists(spooled))
+        job = ImportJob.objects.get()
+        self.assertEqual(job.status, "failed")
+        self.assertIn("broker down", job.errors[0]["error"])
+
+        with mock.patch.object(process_student_excel_task, 'delay') as delay:
+            delay.return_value.id = "task-2"
+            retried = self.upload(content)
+        self.addCleanup(os.unlink, delay.call_args.args[1])
+        self.assertEqual(retried.status_code, 202)
+
+    @override_settings(IMPORT_JOB_STALE_SECONDS=60)
+    def test_job_without_progress_stops_blocking_the_file(self):
+        content = self.sheet_content()
+        with mock.patch.object(process_student_excel_task, 'delay') as delay:
+            delay.return_value.id = "task-1"
+            self.upload(content)
+            ImportJob.objects.update(status='running', updated_at=timezone.now() - timedelta(minutes=5))
+            again = self.upload(content)
+        for call in delay.call_args_list:
+            self.addCleanup(os.unlink, call.args[1])
+
+        self.assertEqual(again.status_code, 202)
+        self.assertEqual(delay.call_count, 2)
+
+    def test_dry_run_classifies_rows_without_writing(self):
+        self.add_students(1)  # Registers UGR/0000/15 and lists UGR/0000/16
+        rows = [
+            (2, "UGR/0000/15", "Already Registered"),
+            (3, "UGR/0000/16", "Already Listed"),
+            (4, "UGR/0001/16", "New Student"),
+            (5, "UGR/0001/16", "New Student"),
+            (6, "UGR/0002/2016", "Long Year"),
+            (7, "UGR/0003/16", None),
+        ]
+        path = write_sheet(rows)
+        with open(path, 'rb') as sheet_file:
+            sheet = SimpleUploadedFile("students.xlsx", sheet_file.read())
+        os.unlink(path)
+
+        with mock.patch.object(process_student_excel_task, 'delay') as delay:
+            response = self.client.post(
+                "/aau_api/internship/upload-students/?dry_run=true", {"file": sheet}, format='multipart'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        delay.assert_not_called()
+        self.assertFalse(ImportJob.objects.exists())
+        self.assertEqual(ThirdYearStudentList.objects.count(), 1)
+        self.assertEqual(response.data["total_rows"], 6)
+        self.assertEqual(response.data["summary"], {
+            "new": 1, "invalid_id": 1, "missing_name": 1, "registered": 1,
+            "in_third_year_list": 1, "duplicate_in_sheet": 1, "email_collision": 0,
+        })
+        self.assertEqual(response.data["samples"]["invalid_id"][0]["row"], 6)
+        self.assertEqual(response.data["samples"]["new"][0]["university_id"], "UGR/0001/16")
+        self.assertIn("UGR/3345/16", response.data["categories"]["invalid_id"])
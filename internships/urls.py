@@ -6,7 +6,11 @@ from .views import (
     AutoAssignAdvisorsView,
     CompanyListCreateView,
     InternshipHistoryListView,
-    UploadStudentExcelView
+    UploadStudentExcelView,
+    AdminExportView,
+    InternshipHistoryAnalyticsView,
+    ImportJobDetailView,
+    LatestImportJobView
 )
 
 
@@ -15,6 +19,11 @@ urlpatterns = [
     path('companies/', CompanyListCreateView.as_view(), name='company-list-create'),
     path('advisors/', AdminAdvisorsListView.as_view(), name='admin-advisors-list'),
     path('assign-advisor/', AssignAdvisorView.as_view(), name='assign-advisor'),
+    path('auto-assign-advisors/', AutoAssignAdvisorsView.as_view(), name='auto-assign-advisors'),
     path('upload-students/', UploadStudentExcelView.as_view(), name='upload-students'),
+    path('import-jobs/latest/', LatestImportJobView.as_view(), name='import-job-latest'),
+    path('import-jobs/<uuid:job_id>/', ImportJobDetailView.as_view(), name='import-job-detail'),
     path('internship-history/', InternshipHistoryListView.as_view(), name='internship-history-list'),
+    path('internship-history/analytics/', InternshipHistoryAnalyticsView.as_view(), name='internship-history-analytics'),
+    path('export/<str:dataset>/<str:file_format>/', AdminExportView.as_view(), name='admin-export'),
 ]
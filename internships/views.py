@@ -1,88 +1,89 @@
 from django.utils import timezone
+import io
+import os
 from django.shortcuts import get_object_or_404
 from django.db.models import Count
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from apscheduler.schedulers.background import BackgroundScheduler
-from students.models import Student, InternshipOfferLetter, InternshipReport
+from students.models import Student, InternshipReport
 from advisors.models import Advisor
-from students.serializers import StudentSerializer, InternshipOfferLetterSerializer, InternshipReportSerializer
+from students.serializers import InternshipOfferLetterSerializer, InternshipReportSerializer
 from advisors.serializers import AdvisorSerializer
 from internships.serializers import CompanySerializer
-from .models import Company, ThirdYearStudentList
+from .models import Company, ThirdYearStudentList, ImportJob
 from utils.generate_email import generate_email
 from utils.get_next_available_advisor import get_next_available_advisor
+from advisors.assignment import assign_students_to_advisors
 from django.db import models
-from .models import InternshipHistory
-from .serializers import InternshipHistorySerializer
+from .models import InternshipHistory, InternshipHistoryRollup
+from .analytics import history_analytics, refresh_all_history_rollups
+from .serializers import (
+    InternshipHistorySerializer, AdminStudentSerializer, ThirdYearStudentAdminSerializer, ImportJobSerializer,
+)
+from .exports import (
+    admin_student_queryset, third_year_queryset, requested_year,
+    iter_student_rows, iter_third_year_rows, stream_json_document,
+    EXPORT_DATASETS, stream_csv, build_xlsx,
+)
+from django.http import StreamingHttpResponse, FileResponse
+from rest_framework.pagination import PageNumberPagination
 from django.core.mail import send_mail
 from django.db import IntegrityError, transaction
 from background_task import background
-from datetime import datetime
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_headers
+from utils.cache_namespaces import cache_response, admin_namespaces, telegram_namespace, ADMIN_NAMESPACE
 from rest_framework.throttling import ScopedRateThrottle
-from .tasks import process_student_excel_task
+from .tasks import process_student_excel_task, process_student_csv_task
+from .imports import spool_upload, preview_import, iter_sheet_rows, read_headers
+from .copy_import import iter_csv_rows
+from openpyxl import load_workbook
+
+
+class ThirdYearStudentPagination(PageNumberPagination):
+    page_query_param = 'third_year_page'
 
 
 class AdminStudentsListView(generics.ListAPIView):
-    """Admin can view all students (registered + third year list)"""
-    serializer_class = StudentSerializer
+    """
+    Admin can view all students (registered + third year list).
+
+    Both lists are paginated (`page` and `third_year_page`). `?stream=true`
+    streams the complete registry as one JSON document instead, for exports.
+    """
+    serializer_class = AdminStudentSerializer
     permission_classes = [permissions.IsAdminUser]
     throttle_scope = 'admin'
     throttle_classes = [ScopedRateThrottle]
 
     def get_queryset(self):
-        queryset = Student.objects.all()
-        for student in queryset:
-            student.department_name = student.department.name if student.department else None
-        return queryset
+        return admin_student_queryset()
 
-    @method_decorator(cache_page(300))  # Cache for 5 minutes
-    @method_decorator(vary_on_headers('Authorization'))  # Different cache per user
+    def get(self, request, *args, **kwargs):
+        if request.query_params.get('stream', '').lower() in ('1', 'true', 'yes'):
+            return self.stream(request)
+        return self.list(request, *args, **kwargs)
+
+    def stream(self, request):
+        document = stream_json_document([
+            ("registered_students", iter_student_rows()),
+            ("third_year_students", iter_third_year_rows()),
+        ])
+        return StreamingHttpResponse(document, content_type='application/json')
+
+    @cache_response(300, admin_namespaces)
     def list(self, request, *args, **kwargs):
         registered_response = super().list(request, *args, **kwargs)
-    
-        for student_data in registered_response.data:
-            department = student_data.get('department')
-            if isinstance(department, dict):
-                student_data['department'] = department.get('name')
-            else:
-                student_data['department'] = department  # keep string or None as is
-    
-            student_id = student_data.get('id')
-            try:
-                offer_letter = InternshipOfferLetter.objects.get(student_id=student_id)
-                student_data['company_name'] = offer_letter.company_name
-            except InternshipOfferLetter.DoesNotExist:
-                student_data['company_name'] = None
-    
-        # Prepare third year students with advisor name and year
-        current_year = datetime.now().year
-        third_year_students = []
-    
-        for student in ThirdYearStudentList.objects.all():
-            advisor_name = None
-            if student.assigned_advisor_id:
-                try:
-                    advisor = Advisor.objects.get(id=student.assigned_advisor_id)
-                    advisor_name = f"{advisor.first_name or ''} {advisor.last_name or ''}".strip()
-                except Advisor.DoesNotExist:
-                    advisor_name = None
-    
-            third_year_students.append({
-                "university_id": student.university_id,
-                "full_name": student.full_name,
-                "institutional_email": student.institutional_email,
-                "assigned_advisor": advisor_name,
-                "internship_year": current_year
-            })
-    
+
+        third_year_paginator = ThirdYearStudentPagination()
+        third_year_page = third_year_paginator.paginate_queryset(third_year_queryset(), request, view=self)
+        third_year_response = third_year_paginator.get_paginated_response(
+            ThirdYearStudentAdminSerializer(third_year_page, many=True).data
+        )
+
         return Response({
             "registered_students": registered_response.data,
-            "third_year_students": third_year_students
+            "third_year_students": third_year_response.data
         })
 
 class AdminAdvisorsListView(generics.ListAPIView):
@@ -93,8 +94,7 @@ class AdminAdvisorsListView(generics.ListAPIView):
     throttle_classes = [ScopedRateThrottle]
     queryset = Advisor.objects.all()
 
-    @method_decorator(cache_page(300))
-    @method_decorator(vary_on_headers('Authorization'))
+    @cache_response(300, admin_namespaces)
     def get(self, request, *args, **kwargs):
         request.user_id = request.user.id
         return super().get(request, *args, **kwargs)
@@ -119,10 +119,6 @@ class AssignAdvisorView(APIView):
         return Response({"message": "Student assigned to advisor successfully"}, 
             status=status.HTTP_200_OK)
 
-def assign_students_to_advisors():
-    """Helper function for auto-assigning students to advisors"""
-    pass
-
 class AutoAssignAdvisorsView(APIView):
     """Triggers auto assignment manually from frontend"""
     permission_classes = [permissions.IsAdminUser]
@@ -130,9 +126,17 @@ class AutoAssignAdvisorsView(APIView):
     throttle_classes = [ScopedRateThrottle]
 
     def post(self, request):
-        assign_students_to_advisors()
-        return Response({"message": "Automatic advisor assignment triggered"}, 
-            status=status.HTTP_200_OK)
+        assigned, unassigned = assign_students_to_advisors()
+        return Response({
+            "message": "Automatic advisor assignment completed",
+            "assigned": assigned,
+            "unassigned": unassigned,
+        }, status=status.HTTP_200_OK)
+
+
+def company_namespaces(view, request, *args, **kwargs):
+    telegram_id = request.query_params.get('telegram_id')
+    return [telegram_namespace(telegram_id)] if telegram_id else [ADMIN_NAMESPACE]
 
 
 class CompanyListCreateView(generics.ListCreateAPIView):
@@ -148,8 +152,7 @@ class CompanyListCreateView(generics.ListCreateAPIView):
         return [permissions.AllowAny()]
 
     
-    @method_decorator(cache_page(300))
-    @method_decorator(vary_on_headers('Authorization'))
+    @cache_response(300, company_namespaces)
     def get(self, request, *args, **kwargs):
         telegram_id = request.query_params.get('telegram_id')
         
@@ -301,6 +304,7 @@ def notify_advisor_immediately(advisor_id):
 
 
 class UploadStudentExcelView(APIView):
+    """Queue a registrar sheet (.xlsx) or CSV roster for import; returns the ImportJob to poll"""
     permission_classes = [permissions.AllowAny]
     throttle_scope = 'upload'
     throttle_classes = [ScopedRateThrottle]
@@ -310,49 +314,187 @@ class UploadStudentExcelView(APIView):
         if not excel_file:
             return Response({"error": "No file uploaded."}, status=status.HTTP_400_BAD_REQUEST)
 
+        is_csv = excel_file.name.lower().endswith('.csv')
+        dry_run = request.query_params.get('dry_run') or request.data.get('dry_run') or ''
+        if str(dry_run).lower() in ('1', 'true', 'yes'):
+            return self.dry_run(excel_file, is_csv)
+
         try:
-            # Save file to temporary location
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-                for chunk in excel_file.chunks():
-                    tmp_file.write(chunk)
-                tmp_file_path = tmp_file.name
+            # Save file to temporary location, hashing it on the way
+            tmp_file_path, file_sha256 = spool_upload(excel_file, suffix='.csv' if is_csv else '.xlsx')
+
+            # The same sheet is already being imported: point at that job instead
+            active_job = ImportJob.active_for_file('third_year_students', file_sha256)
+            if active_job:
+                os.unlink(tmp_file_path)
+                return Response({
+                    "message": "This file is already being processed.",
+                    "job": ImportJobSerializer(active_job).data,
+                }, status=status.HTTP_200_OK)
+
+            job = ImportJob.objects.create(
+                kind='third_year_students',
+                created_by=request.user if request.user.is_authenticated else None,
+                file_name=excel_file.name[:255],
+                file_sha256=file_sha256,
+            )
 
             # Process file asynchronously with Celery
-            process_student_excel_task.delay(tmp_file_path)
+            import_task = process_student_csv_task if is_csv else process_student_excel_task
+            result = import_task.delay(str(job.id), tmp_file_path)
+            ImportJob.objects.filter(pk=job.pk, task_id='').update(task_id=result.id)
 
             return Response({
                 "message": "Student upload is being processed. You will be notified when complete.",
-                "task_status": "processing"
+                "task_status": "processing",
+                "job_id": str(job.id),
             }, status=status.HTTP_202_ACCEPTED)
 
         except Exception as e:
             # Clean up temporary file if error occurs
             if 'tmp_file_path' in locals() and os.path.exists(tmp_file_path):
                 os.unlink(tmp_file_path)
+            # A job that was never queued would otherwise block this file as "already being processed"
+            if 'job' in locals():
+                job.finish('failed', error=f"Could not queue the import: {e}")
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+    def dry_run(self, excel_file, is_csv):
+        """Classify every row against the existing records without writing anything"""
+        if is_csv:
+            csv_file = io.TextIOWrapper(excel_file.file, encoding='utf-8-sig', newline='')
+            try:
+                preview = preview_import(iter_csv_rows(csv_file))
+            except (ValueError, UnicodeDecodeError) as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"dry_run": True, **preview}, status=status.HTTP_200_OK)
+
+        try:
+            workbook = load_workbook(excel_file, read_only=True, data_only=True)
+        except Exception as e:
+            return Response({"error": f"Could not read the file: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            sheet = workbook.active
+            preview = preview_import(iter_sheet_rows(sheet, read_headers(sheet)))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            workbook.close()
+
+        return Response({"dry_run": True, **preview}, status=status.HTTP_200_OK)
+
+
+class ImportJobDetailView(generics.RetrieveAPIView):
+    """Poll the progress of one student import"""
+    queryset = ImportJob.objects.select_related('created_by')
+    serializer_class = ImportJobSerializer
+    permission_classes = [permissions.IsAdminUser]
+    throttle_scope = 'admin'
+    throttle_classes = [ScopedRateThrottle]
+    lookup_url_kwarg = 'job_id'
+
+
+class LatestImportJobView(APIView):
+    """The most recent import started by the requesting admin (optionally `?kind=advisors`)"""
+    permission_classes = [permissions.IsAdminUser]
+    throttle_scope = 'admin'
+    throttle_classes = [ScopedRateThrottle]
+
+    def get(self, request):
+        jobs = ImportJob.objects.select_related('created_by').filter(created_by=request.user)
+        kind = request.query_params.get('kind')
+        if kind:
+            jobs = jobs.filter(kind=kind)
+        job = jobs.first()
+        if not job:
+            return Response({"error": "No imports found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ImportJobSerializer(job).data)
+
+
 class InternshipHistoryListView(generics.ListAPIView):
     serializer_class = InternshipHistorySerializer
     permission_classes = [permissions.IsAdminUser]
     throttle_scope = 'admin'
     throttle_classes = [ScopedRateThrottle]
 
-    @method_decorator(cache_page(3600))
-    @method_decorator(vary_on_headers('Authorization'))
+    @cache_response(3600, admin_namespaces)
     def get(self, request, *args, **kwargs):
         request.user_id = request.user.id
-        year = self.request.query_params.get('year', None)
-        if year:
-            request.year = year
+        try:
+            request.year = requested_year(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return super().get(request, *args, **kwargs)
     
     def get_queryset(self):
-        year = self.request.query_params.get('year', None)
+        year = self.request.year
         
-        if year:
+        if year is not None:
             return InternshipHistory.objects.filter(year=year)
         
         return InternshipHistory.objects.all()
 
 
+class AdminExportView(APIView):
+    """
+    Stream a dataset (students, third-year-students, internship-history) as CSV
+    or XLSX. CSV rows are written as they are read; XLSX is built with a
+    write-only workbook in a temporary file and streamed from disk.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    throttle_scope = 'admin'
+    throttle_classes = [ScopedRateThrottle]
+
+    def get(self, request, dataset, file_format):
+        if dataset not in EXPORT_DATASETS:
+            return Response({"error": f"Unknown dataset. Choose one of: {', '.join(EXPORT_DATASETS)}"},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        columns, rows_for = EXPORT_DATASETS[dataset]
+        filename = f"{dataset}-{timezone.now():%Y%m%d}"
+        try:
+            rows = rows_for(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if file_format == 'csv':
+            response = StreamingHttpResponse(stream_csv(columns, rows), content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+            return response
+
+        if file_format == 'xlsx':
+            return FileResponse(
+                build_xlsx(columns, rows, title=dataset),
+                as_attachment=True,
+                filename=f"{filename}.xlsx",
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            )
+
+        return Response({"error": "Unsupported format. Use csv or xlsx."}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class InternshipHistoryAnalyticsView(APIView):
+    """
+    Internship counts, median durations and top companies per year and
+    department, read from the pre-aggregated InternshipHistoryRollup table.
+    Optional `year` and `top` (companies per year/department, default 5).
+    """
+    permission_classes = [permissions.IsAdminUser]
+    throttle_scope = 'admin'
+    throttle_classes = [ScopedRateThrottle]
+
+    @cache_response(3600, admin_namespaces)
+    def get(self, request):
+        try:
+            year = requested_year(request)
+            top = max(int(request.query_params.get('top', 5)), 1)
+        except ValueError:
+            return Response({"error": "year and top must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # First read after deploy: build the rollup before serving it
+        if not InternshipHistoryRollup.objects.exists() and InternshipHistory.objects.exists():
+            refresh_all_history_rollups()
+
+        return Response(history_analytics(year=year, top=top), status=status.HTTP_200_OK)
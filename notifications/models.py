@@ -0,0 +1,61 @@
+import hashlib
+
+from django.db import models
+from django.utils import timezone
+
+
+class EmailOutbox(models.Model):
+    """An email written in the same transaction as the change that triggered it, sent later by the drain task"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    # Lower is sent first; time-limited mail such as OTP codes must not queue behind bulk mail
+    PRIORITY_URGENT = 0
+    PRIORITY_NORMAL = 1
+    PRIORITY_CHOICES = [
+        (PRIORITY_URGENT, 'Urgent'),
+        (PRIORITY_NORMAL, 'Normal'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    dedupe_key = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=PRIORITY_NORMAL)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    latency_seconds = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'priority', 'created_at'])]
+        constraints = [
+            # An identical message already waiting to go out is not queued twice
+            models.UniqueConstraint(
+                fields=['dedupe_key'], condition=models.Q(status='pending'), name='unique_pending_email'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+    @staticmethod
+    def make_dedupe_key(subject, body, from_email, to):
+        return hashlib.sha256('\x1f'.join([from_email, ','.join(to), subject, body]).encode()).hexdigest()
+
+    def mark_sent(self):
+        self.status = 'sent'
+        self.sent_at = timezone.now()
+        self.latency_seconds = (self.sent_at - self.created_at).total_seconds()
+        # Bodies carry OTP codes and passwords; they are not kept once delivered
+        self.body = ''
+
+    def mark_failed(self):
+        self.status = 'failed'
+        # Never delivered, but a failed row is kept for good, so its password or OTP code is not
+        self.body = ''
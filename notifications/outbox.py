@@ -0,0 +1,46 @@
+# notifications/outbox.py
+"""
+Transactional email outbox.
+
+`enqueue(*messages)` stores EmailMessage objects as EmailOutbox rows in the
+caller's transaction and schedules one drain after commit. The drain task
+sends pending rows over a single SMTP connection per batch, within the
+provider's per-minute quota (EMAIL_OUTBOX_RATE_PER_MINUTE), urgent rows
+first and then oldest first.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import EmailOutbox
+
+DRAIN_SCHEDULED_KEY = 'email-outbox-drain-scheduled'
+
+
+def enqueue(*messages, priority=EmailOutbox.PRIORITY_NORMAL):
+    """Queue django EmailMessage objects; identical pending messages are only stored once"""
+    rows = []
+    for message in messages:
+        from_email = message.from_email or settings.DEFAULT_FROM_EMAIL
+        to = list(message.to)
+        rows.append(EmailOutbox(
+            subject=message.subject,
+            body=message.body,
+            from_email=from_email,
+            to=to,
+            priority=priority,
+            dedupe_key=EmailOutbox.make_dedupe_key(message.subject, message.body, from_email, to),
+        ))
+    if not rows:
+        return
+
+    EmailOutbox.objects.bulk_create(rows, ignore_conflicts=True)
+    transaction.on_commit(schedule_drain)
+
+
+def schedule_drain(countdown=0):
+    """Queue one drain task unless one is already waiting to run"""
+    from .tasks import drain_email_outbox_task
+
+    if cache.add(DRAIN_SCHEDULED_KEY, 1, timeout=countdown + 60):
+        drain_email_outbox_task.apply_async(countdown=countdown)
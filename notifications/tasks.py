@@ -0,0 +1,109 @@
+# notifications/tasks.py
+import time
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import get_connection, EmailMessage
+
+from .models import EmailOutbox
+from .outbox import DRAIN_SCHEDULED_KEY, schedule_drain
+
+DRAIN_LOCK_KEY = 'email-outbox-drain-lock'
+DRAIN_LOCK_SECONDS = 300
+RETRY_FAILED_AFTER_SECONDS = 60
+
+
+def sent_this_minute_key():
+    return f'email-outbox-sent:{int(time.time() // 60)}'
+
+
+def record_failure(row, error):
+    row.last_error = str(error)
+    if row.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        row.mark_failed()
+
+
+def send_batch(batch):
+    """Send rows over one SMTP connection; returns how many were delivered"""
+    delivered = 0
+    try:
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            # Counted against every row, so mail for a provider that stays down eventually fails
+            for row in batch:
+                row.attempts += 1
+                record_failure(row, e)
+            return 0
+
+        try:
+            for row in batch:
+                row.attempts += 1
+                try:
+                    EmailMessage(row.subject, row.body, row.from_email, row.to, connection=connection).send()
+                except Exception as e:
+                    record_failure(row, e)
+                else:
+                    row.mark_sent()
+                    delivered += 1
+        finally:
+            connection.close()
+    finally:
+        EmailOutbox.objects.bulk_update(
+            batch, ['status', 'attempts', 'last_error', 'sent_at', 'latency_seconds', 'body']
+        )
+    return delivered
+
+
+def drain_outbox():
+    """
+    Send pending rows, urgent first, until none are left, a send fails or this
+    minute's quota is used up. Returns the seconds to wait before draining
+    again, or None when the outbox is empty.
+    """
+    while True:
+        key = sent_this_minute_key()
+        budget = settings.EMAIL_OUTBOX_RATE_PER_MINUTE - (cache.get(key) or 0)
+        if budget <= 0:
+            return 60 - time.time() % 60
+
+        batch = list(
+            EmailOutbox.objects.filter(status='pending')
+            .order_by('priority', 'created_at')[:min(settings.EMAIL_OUTBOX_BATCH_SIZE, budget)]
+        )
+        if not batch:
+            return None
+
+        delivered = send_batch(batch)
+        cache.add(key, 0, timeout=120)
+        cache.incr(key, delivered)
+        if delivered < len(batch):
+            return RETRY_FAILED_AFTER_SECONDS
+
+
+@shared_task(bind=True, max_retries=3)
+def drain_email_outbox_task(self):
+    """Deliver queued EmailOutbox rows; only one drain runs at a time"""
+    cache.delete(DRAIN_SCHEDULED_KEY)
+    if not cache.add(DRAIN_LOCK_KEY, 1, timeout=DRAIN_LOCK_SECONDS):
+        # The running drain picks up new rows, or reschedules itself below
+        return
+
+    try:
+        wait = drain_outbox()
+    except Exception as e:
+        cache.delete(DRAIN_LOCK_KEY)
+        if self.request.retries >= self.max_retries:
+            # Pending mail must not wait for some unrelated enqueue to schedule the next drain
+            schedule_drain(countdown=RETRY_FAILED_AFTER_SECONDS)
+            raise
+        raise self.retry(countdown=30, exc=e)
+    cache.delete(DRAIN_LOCK_KEY)
+
+    # Rows committed while the last batch was sending are picked up here too
+    if wait is None and EmailOutbox.objects.filter(status='pending').exists():
+        wait = 0
+    if wait is not None:
+        schedule_drain(countdown=int(wait) + 1)
@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.test import TestCase, override_settings
+
+from . import outbox
+from .models import EmailOutbox
+from .tasks import drain_outbox, drain_email_outbox_task, RETRY_FAILED_AFTER_SECONDS
+
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def message(number, to="student@aau.edu.et"):
+    return EmailMessage(f"Message {number}", f"Body {number}", "aau57.sis@gmail.com", [to])
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHE,
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    EMAIL_OUTBOX_RATE_PER_MINUTE=2,
+    EMAIL_OUTBOX_BATCH_SIZE=50,
+    EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+)
+class EmailOutboxTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_identical_pending_message_is_stored_once(self):
+        outbox.enqueue(message(1), message(1), message(2))
+        self.assertEqual(EmailOutbox.objects.count(), 2)
+
+        drain_outbox()
+        # Once sent, the same message can be queued again
+        outbox.enqueue(message(1))
+        self.assertEqual(EmailOutbox.objects.filter(status='pending').count(), 1)
+
+    def test_quota_leaves_the_rest_for_the_next_minute(self):
+        outbox.enqueue(message(1), message(2), message(3))
+
+        wait = drain_outbox()
+
+        self.assertGreater(wait, 0)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(EmailOutbox.objects.filter(status='pending').count(), 1)
+
+    def test_urgent_mail_is_sent_before_older_bulk_mail(self):
+        outbox.enqueue(message(1), message(2), message(3))
+        outbox.enqueue(message("OTP"), priority=EmailOutbox.PRIORITY_URGENT)
+
+        drain_outbox()
+
+        self.assertEqual([sent.subject for sent in mail.outbox], ["Message OTP", "Message 1"])
+
+    def test_failed_sends_count_attempts_until_the_row_fails(self):
+        outbox.enqueue(message(1))
+        with mock.patch.object(EmailMessage, "send", side_effect=OSError("mailbox unavailable")):
+            self.assertEqual(drain_outbox(), RETRY_FAILED_AFTER_SECONDS)
+            row = EmailOutbox.objects.get()
+            self.assertEqual((row.status, row.attempts, row.last_error), ("pending", 1, "mailbox unavailable"))
+
+            drain_outbox()
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts, row.body), ("failed", 2, ""))
+
+    def test_connection_failure_counts_an_attempt(self):
+        outbox.enqueue(message(1), message(2))
+        connection = mock.Mock()
+        connection.open.side_effect = ConnectionRefusedError("smtp down")
+
+        with mock.patch("notifications.tasks.get_connection", return_value=connection):
+            self.assertEqual(drain_outbox(), RETRY_FAILED_AFTER_SECONDS)
+
+        self.assertEqual(
+            list(EmailOutbox.objects.values_list("attempts", "last_error")), [(1, "smtp down"), (1, "smtp down")]
+        )
+
+    def test_drain_that_keeps_failing_reschedules_itself(self):
+        outbox.enqueue(message(1))
+        with mock.patch("notifications.tasks.drain_outbox", side_effect=RuntimeError("database went away")), \
+                mock.patch("notifications.tasks.schedule_drain") as schedule_drain:
+            drain_email_outbox_task.apply()
+
+        schedule_drain.assert_called_once_with(countdown=RETRY_FAILED_AFTER_SECONDS)
+
+    def test_drain_over_quota_reschedules_itself(self):
+        outbox.enqueue(message(1), message(2), message(3))
+        with mock.patch("notifications.tasks.schedule_drain") as schedule_drain:
+            drain_email_outbox_task.apply()
+
+        schedule_drain.assert_called_once()
+        self.assertEqual(EmailOutbox.objects.filter(status='pending').count(), 1)
@@ -1,7 +1,8 @@
 from django.contrib import admin
-from .models import Student, InternshipOfferLetter, InternshipReport
+from .models import Student, InternshipOfferLetter, InternshipReport, DocumentSubmission
 
 
 admin.site.register(Student)
 admin.site.register(InternshipOfferLetter)
 admin.site.register(InternshipReport)
+admin.site.register(DocumentSubmission)
@@ -0,0 +1,225 @@
+# students/documents.py
+"""
+Submission rules and bookkeeping for reports and offer letters, shared by
+the upload endpoints, the staged offer letter task and direct uploads.
+
+Direct uploads take two small JSON requests: the student asks for a signed
+upload URL and gets it with an upload token; after PUTting the file to
+storage they send the token back to finalize. The signed URL points at a
+one-off staging key (uploads/{telegram_id}/{upload_id}.pdf), never at a
+document: finalize moves the object to reports/... or offer_letters/...,
+where only the server writes, and checks its size and type before the row
+is created. Finalize never reads the object itself: a report's SHA-256 is
+recorded when inspect_report_task downloads it.
+
+Documents uploaded through Django carry the SHA-256 of their content and
+are stored under it ({prefix}/{telegram_id}/{sha256}.pdf), so an object
+never changes once written. When a student sends bytes they already stored,
+the existing object's URL is reused and nothing is written to storage again.
+
+Every recorded report is then inspected in the background (see inspection.py).
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from internships.models import Company, InternshipHistory
+from telegram_bot.dispatcher import queue_status_update
+from .models import InternshipOfferLetter, InternshipReport
+from .storage import get_storage
+
+UPLOAD_TOKEN_SALT = 'students.documents.upload'
+STAGING_PREFIX = 'uploads'
+KIND_PREFIXES = {'report': 'reports', 'offer_letter': 'offer_letters'}
+ALLOWED_CONTENT_TYPES = {'application/pdf'}
+
+
+def document_path(kind, telegram_id, file_name):
+    return f"{KIND_PREFIXES[kind]}/{telegram_id}/{get_valid_filename(os.path.basename(file_name))}"
+
+
+def content_path(kind, telegram_id, sha256):
+    """Where a document received through Django is stored: keyed by its content"""
+    return f"{KIND_PREFIXES[kind]}/{telegram_id}/{sha256}.pdf"
+
+
+def staging_path(telegram_id, upload_id):
+    """Where a signed direct upload lands until it is finalized"""
+    return f"{STAGING_PREFIX}/{telegram_id}/{upload_id}.pdf"
+
+
+def make_upload_token(claims):
+    return signing.dumps(claims, salt=UPLOAD_TOKEN_SALT)
+
+
+def read_upload_token(token):
+    """The claims of a token issued within DOCUMENT_SIGNED_UPLOAD_EXPIRY; raises signing.BadSignature"""
+    return signing.loads(token, salt=UPLOAD_TOKEN_SALT, max_age=settings.DOCUMENT_SIGNED_UPLOAD_EXPIRY)
+
+
+def stored_object_error(info, expected_size):
+    """Why a directly uploaded object can't be accepted, or None"""
+    if info is None:
+        return "File not found in storage. Upload it before finalizing."
+    if info['size'] != expected_size or info['size'] > settings.DOCUMENT_MAX_UPLOAD_SIZE:
+        return "The uploaded file does not match the announced size."
+    if info['content_type'] not in ALLOWED_CONTENT_TYPES:
+        return "Unsupported file type. Please upload a PDF."
+    return None
+
+
+class DigestWriter:
+    """Wraps the binary file `target`, keeping the SHA-256 of what is written through it"""
+
+    def __init__(self, target):
+        self.target = target
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.target.write(data)
+        self.digest.update(data)
+        self.size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.size
+
+
+def stored_document_url(student, sha256):
+    """URL of a document `student` already stored with this content, or None"""
+    if not sha256:
+        return None
+    # Only content-addressed objects are reused; one stored under its file name may have been replaced since
+    storage = get_storage()
+    urls = [storage.url(content_path(kind, student.telegram_id, sha256)) for kind in KIND_PREFIXES]
+    for model in (InternshipReport, InternshipOfferLetter):
+        url = (
+            model.objects.filter(student=student, sha256=sha256, document_url__in=urls)
+            .values_list('document_url', flat=True).first()
+        )
+        if url:
+            return url
+    return None
+
+
+def offer_letter_submission_error(student):
+    """Why `student` can't submit an offer letter now, as a response body, or None"""
+    if not student.assigned_advisor:
+        return {"error": "Advisor not assigned yet"}
+    if InternshipOfferLetter.objects.filter(student=student, advisor_approved='Approved').exists():
+        return {"error": "Approved offer letter already exists"}
+    return None
+
+
+def record_offer_letter(student, company_name, file_url, sha256=''):
+    # A rejected or still pending letter is replaced by the new upload
+    InternshipOfferLetter.objects.update_or_create(
+        student=student,
+        defaults={
+            "document_url": file_url,
+            "sha256": sha256,
+            "company_name": company_name,
+            "advisor_approved": 'Pending',
+            "approval_date": None,
+        },
+    )
+
+
+def report_submission_error(student, report_number):
+    """Why `student` can't submit report `report_number` now, as a response body, or None"""
+    advisor = student.assigned_advisor
+    if not advisor:
+        return {"error": "No advisor assigned to this student"}
+
+    required_reports = advisor.number_of_expected_reports
+    interval_days = advisor.report_submission_interval_days
+
+    existing_reports = InternshipReport.objects.filter(student=student)
+
+    if existing_reports.filter(report_number=report_number).exists():
+        return {"error": f"Report {report_number} already submitted"}
+
+    expected_report = existing_reports.count() + 1
+    if report_number != expected_report:
+        return {
+            "error": f"Expected report #{expected_report} next",
+            "current_progress": f"{existing_reports.count()}/{required_reports} reports submitted"
+        }
+
+    today = timezone.now().date()
+    if existing_reports.exists():
+        last_report = existing_reports.order_by('-report_number').first()
+        last_upload_date = last_report.created_at.date()
+        days_since_last = (today - last_upload_date).days
+        if days_since_last < interval_days:
+            return {
+                "error": f"Report {report_number} cannot be submitted yet.",
+                "hint": f"Wait {interval_days - days_since_last} more day(s).",
+                "last_uploaded": last_upload_date,
+                "interval_days": interval_days
+            }
+    else:
+        if student.start_date and today < student.start_date:
+            return {
+                "error": "Internship has not officially started yet.",
+                "start_date": student.start_date
+            }
+    return None
+
+
+def record_report(student, report_number, file_url, sha256=''):
+    """Create the report, completing the internship after the last one; returns the response body"""
+    required_reports = student.assigned_advisor.number_of_expected_reports
+    telegram_id = student.telegram_id
+
+    report = InternshipReport.objects.create(
+        student=student,
+        report_number=report_number,
+        document_url=file_url,
+        sha256=sha256,
+    )
+    queue_report_inspection(report.pk)
+
+    progress = f"{report_number}/{required_reports} reports submitted"
+    remaining = required_reports - report_number
+
+    response_data = {
+        "message": f"📘 Report {report_number} submitted successfully!",
+        "progress": progress,
+        "remaining_reports": remaining,
+        "document_url": file_url
+    }
+
+    if report_number == required_reports:
+        company = Company.objects.filter(telegram_id=telegram_id).first()
+
+        with transaction.atomic():
+            student.status = "Completed"
+            student.save()
+
+            InternshipHistory.objects.create(
+                student=student,
+                company=company,
+                start_date=student.start_date,
+                end_date=timezone.now().date()
+            )
+
+            queue_status_update(telegram_id, "Completed")
+
+        response_data["status"] = "Completed"
+        response_data["message"] += " 🎉 Internship completed!"
+
+    return response_data
+
+
+def queue_report_inspection(report_id):
+    """Read the report's page count and text in the background once it is committed"""
+    from .tasks import inspect_report_task
+
+    transaction.on_commit(lambda: inspect_report_task.delay(report_id))
@@ -0,0 +1,94 @@
+# students/inspection.py
+"""
+Checks and metadata for uploaded PDFs, in two stages.
+
+The cheap checks run while the upload streams in (InspectingUploadHandler):
+the first chunk must look like a PDF and the file must fit
+DOCUMENT_MAX_UPLOAD_SIZE, so a bad file is dropped before it is spooled or
+sent to storage.
+
+Parsing runs after the report is accepted, in inspect_report_task: pypdf
+reads the page count and text in a process pool, so a malformed or huge PDF
+can't hold the worker longer than DOCUMENT_INSPECTION_TIMEOUT. Where the
+worker can't start child processes (Celery's prefork children are daemons)
+the PDF is parsed in-process instead.
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+PDF_MAGIC = b'%PDF-'
+MAGIC_SEARCH_BYTES = 1024  # PDF readers accept the header anywhere in the first kilobyte
+TEXT_LIMIT = 100_000  # Characters of text kept per report
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class InspectionError(Exception):
+    pass
+
+
+def looks_like_pdf(head):
+    return PDF_MAGIC in head[:MAGIC_SEARCH_BYTES]
+
+
+def extract_pdf(path):
+    """(page count, text) of the PDF at `path`; runs in a pool process"""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise InspectionError("Report inspection needs pypdf: pip install pypdf")
+
+    try:
+        reader = PdfReader(path)
+        parts, length = [], 0
+        for page in reader.pages:
+            if length >= TEXT_LIMIT:
+                break
+            text = page.extract_text() or ''
+            parts.append(text)
+            length += len(text)
+        return len(reader.pages), '\n'.join(parts)[:TEXT_LIMIT]
+    except Exception as e:
+        # pypdf's own exceptions don't always unpickle in the parent
+        raise InspectionError(f"Unreadable PDF: {e}")
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.DOCUMENT_INSPECTION_WORKERS)
+        return _pool
+
+
+def discard_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        for process in list((pool._processes or {}).values()):
+            process.terminate()  # A parse that overran is stopped, not waited for
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def inspect_pdf(path):
+    """(page count, text) of the PDF at `path`; raises InspectionError"""
+    try:
+        future = get_pool().submit(extract_pdf, path)
+    except (AssertionError, OSError):
+        # "daemonic processes are not allowed to have children"
+        discard_pool()
+        return extract_pdf(path)
+
+    try:
+        return future.result(timeout=settings.DOCUMENT_INSPECTION_TIMEOUT)
+    except TimeoutError:
+        discard_pool()
+        raise InspectionError(f"Parsing took longer than {settings.DOCUMENT_INSPECTION_TIMEOUT}s")
+    except BrokenProcessPool:
+        discard_pool()
+        raise InspectionError("The PDF crashed the parser")
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0011_document_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='internshipreport',
+            name='inspected_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='internshipreport',
+            name='inspection_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='internshipreport',
+            name='inspection_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('inspected', 'Inspected'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='internshipreport',
+            name='page_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='internshipreport',
+            name='text',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -1,4 +1,6 @@
+import uuid
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from advisors.models import Advisor
 from internships.models import Department, Company
@@ -29,6 +31,7 @@ class Student(models.Model):
         null=True,
         blank=True
     )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.full_name} ({self.university_id})"
@@ -58,6 +61,7 @@ class InternshipOfferLetter(models.Model):
     document = models.FileField(upload_to='offer_letters/', null=True, blank=True)
     document_url = models.URLField(blank=True, null=True)
     company_name = models.CharField(max_length=255, null=True, blank=True)  # ✅ Add this line
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
     advisor_approved = models.CharField(
         max_length=10,
         choices=[('Pending', 'Pending'), ('Approved', 'Approved'), ('Rejected', 'Rejected')],
@@ -65,6 +69,7 @@ class InternshipOfferLetter(models.Model):
     )
     approval_date = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     
     def __str__(self):
@@ -73,12 +78,25 @@ class InternshipOfferLetter(models.Model):
 
 class InternshipReport(models.Model):
     REPORT_CHOICES = [(i, f"{i} Report") for i in range(1, 5)]
+    INSPECTION_CHOICES = [
+        ('pending', 'Pending'),
+        ('inspected', 'Inspected'),
+        ('failed', 'Failed'),
+    ]
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     document = models.FileField(upload_to='offer_letters/', null=True, blank=True)
     document_url = models.URLField(blank=True, null=True)
     submission_date = models.DateTimeField(auto_now_add=True)
     report_number = models.IntegerField(choices=REPORT_CHOICES)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    # Filled in by inspect_report_task once the document is stored
+    inspection_status = models.CharField(max_length=10, choices=INSPECTION_CHOICES, default='pending')
+    inspection_error = models.TextField(blank=True)
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    text = models.TextField(blank=True)
+    inspected_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True) 
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
 
     class Meta:
@@ -89,3 +107,54 @@ class InternshipReport(models.Model):
     def __str__(self):
         return f"Report {self.report_number} - {self.student.full_name}"
 
+    def finish_inspection(self, status, page_count=None, text='', error=''):
+        self.inspection_status = status
+        self.page_count = page_count
+        self.text = text
+        self.inspection_error = error
+        self.inspected_at = timezone.now()
+        self.save(update_fields=[
+            'inspection_status', 'page_count', 'text', 'inspection_error', 'inspected_at', 'updated_at'
+        ])
+
+
+class DocumentSubmission(models.Model):
+    """An offer letter accepted by the API, staged in the spool until a worker uploads it"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('uploading', 'Uploading'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    FINISHED_STATUSES = ('completed', 'failed')
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='document_submissions')
+    company_name = models.CharField(max_length=255, null=True, blank=True)
+    spool_path = models.CharField(max_length=500)
+    storage_path = models.CharField(max_length=500)
+    content_type = models.CharField(max_length=100)
+    size = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    document_url = models.URLField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Submission {self.id} ({self.status})"
+
+    def mark_uploading(self):
+        self.status = 'uploading'
+        self.save(update_fields=['status'])
+
+    def finish(self, status, document_url=None, error=''):
+        self.status = status
+        self.document_url = document_url
+        self.error = error
+        self.finished_at = timezone.now()
+        self.save(update_fields=['status', 'document_url', 'error', 'finished_at'])
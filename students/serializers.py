@@ -1,6 +1,10 @@
 from rest_framework import serializers
-from .models import Department, Student, InternshipReport, InternshipOfferLetter
+from .models import Department, Student, InternshipReport, InternshipOfferLetter, DocumentSubmission
 from advisors.models import Advisor
+from django.conf import settings
+from .documents import ALLOWED_CONTENT_TYPES, KIND_PREFIXES
+
+TEXT_EXCERPT_LENGTH = 500  # Characters of a report's text shown in listings
 
 class AdvisorBasicSerializer(serializers.ModelSerializer):
     class Meta:
@@ -37,9 +41,17 @@ class InternshipOfferLetterSerializer(serializers.ModelSerializer):
         fields = ['telegram_id', 'company_name', 'document']
         
 class InternshipReportReadSerializer(serializers.ModelSerializer):
+    text_excerpt = serializers.SerializerMethodField()
+
     class Meta:
         model = InternshipReport
-        fields = [ 'report_number', 'document_url', 'submission_date', 'created_at']
+        fields = [
+            'report_number', 'document_url', 'submission_date', 'created_at',
+            'inspection_status', 'page_count', 'text_excerpt',
+        ]
+
+    def get_text_excerpt(self, obj):
+        return obj.text[:TEXT_EXCERPT_LENGTH]
 
 
 class InternshipOfferLetterReadSerializer(serializers.ModelSerializer):
@@ -55,3 +67,48 @@ class InternshipOfferLetterReadSerializer(serializers.ModelSerializer):
             'submission_date',
             'created_at',
         ]
+
+
+class DocumentSubmissionSerializer(serializers.ModelSerializer):
+    submission_id = serializers.UUIDField(source='id', read_only=True)
+
+    class Meta:
+        model = DocumentSubmission
+        fields = ['submission_id', 'status', 'document_url', 'error', 'created_at', 'finished_at']
+
+
+class SignedUploadRequestSerializer(serializers.Serializer):
+    telegram_id = serializers.CharField()
+    kind = serializers.ChoiceField(choices=list(KIND_PREFIXES))
+    file_name = serializers.CharField(max_length=255)
+    content_type = serializers.CharField()
+    size = serializers.IntegerField(min_value=1)
+    report_number = serializers.ChoiceField(choices=[(i, f'Report {i}') for i in range(1, 16)], required=False)
+    company_name = serializers.CharField(max_length=255, required=False, allow_blank=True)
+
+    def validate_file_name(self, value):
+        if not value.lower().endswith('.pdf'):
+            raise serializers.ValidationError("Unsupported file type. Please upload a PDF (.pdf).")
+        return value
+
+    def validate_content_type(self, value):
+        if value not in ALLOWED_CONTENT_TYPES:
+            raise serializers.ValidationError("Unsupported file type. Please upload a PDF (.pdf).")
+        return value
+
+    def validate_size(self, value):
+        if value > settings.DOCUMENT_MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                f"File is too large. The limit is {settings.DOCUMENT_MAX_UPLOAD_SIZE // (1024 * 1024)} MB."
+            )
+        return value
+
+    def validate(self, data):
+        if data['kind'] == 'report' and 'report_number' not in data:
+            raise serializers.ValidationError({"report_number": "This field is required for reports."})
+        return data
+
+
+class FinalizeUploadSerializer(serializers.Serializer):
+    telegram_id = serializers.CharField()
+    upload_token = serializers.CharField()
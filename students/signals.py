@@ -1,38 +1,28 @@
 # students/signals.py
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
+from utils.cache_namespaces import bump, student_namespace, telegram_namespace, ADMIN_NAMESPACE
 from .models import Student, InternshipOfferLetter, InternshipReport
 
-def clear_student_cache(student_id=None):
-    """Clear student-related cache"""
-    if student_id:
-        cache.delete_pattern(f'student_{student_id}_*')
-        cache.delete_pattern(f'telegram_{student_id}_*')
-    cache.delete_pattern('student_*')
-    cache.delete_pattern('offer_letter_*')
-    cache.delete_pattern('internship_report_*')
+def clear_student_cache(student):
+    """Invalidate responses cached for a student (by university_id and telegram_id) and the admin lists"""
+    bump(
+        student_namespace(student.university_id),
+        telegram_namespace(student.telegram_id) if student.telegram_id else None,
+        ADMIN_NAMESPACE,
+    )
 
 @receiver([post_save, post_delete], sender=Student)
 def invalidate_student_cache(sender, instance, **kwargs):
     """Clear cache when student data changes"""
-    clear_student_cache(instance.id)
-    if instance.telegram_id:
-        cache.delete_pattern(f'telegram_{instance.telegram_id}_*')
-    if instance.assigned_advisor:
-        cache.delete_pattern(f'advisor_{instance.assigned_advisor.id}_*')
+    clear_student_cache(instance)
 
 @receiver([post_save, post_delete], sender=InternshipOfferLetter)
 def invalidate_offer_letter_cache(sender, instance, **kwargs):
     """Clear cache when offer letter changes"""
-    clear_student_cache()
-    if instance.student:
-        clear_student_cache(instance.student.id)
+    clear_student_cache(instance.student)
 
 @receiver([post_save, post_delete], sender=InternshipReport)
 def invalidate_report_cache(sender, instance, **kwargs):
     """Clear cache when report changes"""
-    clear_student_cache()
-    if instance.student:
-        clear_student_cache(instance.student.id)
-
+    clear_student_cache(instance.student)
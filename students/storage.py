@@ -0,0 +1,499 @@
+# students/storage.py
+"""
+Student document storage.
+
+`get_storage()` returns the backend named by DOCUMENT_STORAGE_BACKEND:
+LocalFileStorage (a directory on disk, for development and benchmarks),
+SupabaseStorage or S3Storage (any S3-compatible service; needs boto3). Every
+upload and download goes through StorageBackend, which times it into
+`metrics`. Backends can also issue signed URLs that let a client PUT a
+file straight into storage, report an object's size and type, and move or
+delete objects.
+
+Uploads are streamed from the file Django received (spooled to disk above
+FILE_UPLOAD_MAX_MEMORY_SIZE) instead of being read into memory. On Supabase,
+files up to DOCUMENT_RESUMABLE_THRESHOLD go up in one streamed PUT; larger
+ones use the TUS resumable endpoint in DOCUMENT_UPLOAD_CHUNK_SIZE pieces. The
+TUS upload URL is cached per object, so after a dropped connection, or in a
+retried task, the upload continues from the last acknowledged offset
+instead of starting over.
+"""
+import base64
+import logging
+import mimetypes
+import os
+import shutil
+import tempfile
+import threading
+import time
+from urllib.parse import urljoin
+
+import requests
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import reverse
+from django.utils._os import safe_join
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+TUS_VERSION = '1.0.0'
+RESUMABLE_URL_TTL = 24 * 60 * 60  # Supabase keeps unfinished uploads for a day
+MAX_CHUNK_ATTEMPTS = 3
+COPY_BUFFER_SIZE = 1024 * 1024
+LOCAL_UPLOAD_SALT = 'students.storage.local-upload'
+
+
+class UploadError(Exception):
+    pass
+
+
+class StorageMetrics:
+    """Per-process count, bytes and seconds of storage calls by backend and operation"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}
+
+    def record(self, backend, operation, size, seconds):
+        with self.lock:
+            totals = self.totals.setdefault(f'{backend}.{operation}', {'count': 0, 'bytes': 0, 'seconds': 0.0})
+            totals['count'] += 1
+            totals['bytes'] += size
+            totals['seconds'] += seconds
+        logger.info("%s %s: %d bytes in %.3fs", backend, operation, size, seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {name: dict(totals) for name, totals in self.totals.items()}
+
+    def reset(self):
+        with self.lock:
+            self.totals.clear()
+
+
+metrics = StorageMetrics()
+
+
+def get_storage():
+    return import_string(settings.DOCUMENT_STORAGE_BACKEND)()
+
+
+def upload_document(file, path_in_bucket, content_type):
+    """Stream `file` (an UploadedFile or binary file object) into storage; returns its public URL"""
+    return get_storage().upload(file, path_in_bucket, content_type)
+
+
+def file_size(file):
+    file.seek(0, 2)
+    size = file.tell()
+    file.seek(0)
+    return size
+
+
+class StorageBackend:
+    """
+    Backends implement put/get/url, plus signed_upload/stat for direct
+    uploads; callers use upload/download, which are timed.
+    """
+    name = 'storage'
+
+    def upload(self, file, path, content_type):
+        size = file_size(file)
+        started = time.monotonic()
+        self.put(file, path, content_type, size)
+        metrics.record(self.name, 'upload', size, time.monotonic() - started)
+        return self.url(path)
+
+    def download(self, path, destination):
+        """Write the object into the binary file `destination`"""
+        started = time.monotonic()
+        size = self.get(path, destination)
+        metrics.record(self.name, 'download', size, time.monotonic() - started)
+
+    def put(self, file, path, content_type, size):
+        raise NotImplementedError
+
+    def get(self, path, destination):
+        """Copy the object into `destination`; returns the number of bytes written"""
+        raise NotImplementedError
+
+    def url(self, path):
+        raise NotImplementedError
+
+    def path_of(self, url):
+        """The object path behind a URL returned by url(), or None when it isn't one of ours"""
+        prefix = self.url('')
+        if not url or not url.startswith(prefix):
+            return None
+        return url[len(prefix):] or None
+
+    def signed_upload(self, path, content_type, expires_in):
+        """
+        Where and how a client can PUT `path` directly: {"url", "method",
+        "headers"}. Sign one-off staging keys only, never a document's final
+        path: a link may outlive its `expires_in` (Supabase) or be reused.
+        """
+        raise NotImplementedError
+
+    def stat(self, path):
+        """{"size", "content_type"} of a stored object, or None when it does not exist"""
+        raise NotImplementedError
+
+    def move(self, source, destination):
+        """Rename an object; returns False when `source` does not exist"""
+        raise NotImplementedError
+
+    def delete(self, path):
+        """Remove an object if it exists"""
+        raise NotImplementedError
+
+
+class LocalFileStorage(StorageBackend):
+    """Documents under DOCUMENT_STORAGE_LOCAL_ROOT, served at DOCUMENT_STORAGE_LOCAL_URL when DEBUG is on"""
+    name = 'local'
+
+    def full_path(self, path):
+        return safe_join(settings.DOCUMENT_STORAGE_LOCAL_ROOT, path)
+
+    def put(self, file, path, content_type, size):
+        full_path = self.full_path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # Written beside the target and renamed, so readers never see half a file
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(full_path), delete=False) as tmp_file:
+            shutil.copyfileobj(file, tmp_file, COPY_BUFFER_SIZE)
+        os.replace(tmp_file.name, full_path)
+
+    def get(self, path, destination):
+        with open(self.full_path(path), 'rb') as stored_file:
+            shutil.copyfileobj(stored_file, destination, COPY_BUFFER_SIZE)
+            return stored_file.tell()
+
+    def url(self, path):
+        return f"{settings.DOCUMENT_STORAGE_LOCAL_URL.rstrip('/')}/{path}"
+
+    def signed_upload(self, path, content_type, expires_in):
+        # Uploads land on LocalDocumentUploadView, which checks the token
+        token = signing.dumps({"path": path, "content_type": content_type}, salt=LOCAL_UPLOAD_SALT)
+        return {
+            "url": reverse('local-document-upload', args=[token]),
+            "method": "PUT",
+            "headers": {"Content-Type": content_type},
+        }
+
+    @staticmethod
+    def read_upload_token(token, max_age):
+        return signing.loads(token, salt=LOCAL_UPLOAD_SALT, max_age=max_age)
+
+    def stat(self, path):
+        full_path = self.full_path(path)
+        if not os.path.isfile(full_path):
+            return None
+        return {"size": os.path.getsize(full_path), "content_type": mimetypes.guess_type(full_path)[0]}
+
+    def move(self, source, destination):
+        full_destination = self.full_path(destination)
+        os.makedirs(os.path.dirname(full_destination), exist_ok=True)
+        try:
+            os.replace(self.full_path(source), full_destination)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def delete(self, path):
+        try:
+            os.remove(self.full_path(path))
+        except FileNotFoundError:
+            pass
+
+
+class SupabaseStorage(StorageBackend):
+    """Supabase storage over one keep-alive session per process"""
+    name = 'supabase'
+    _session = None
+    _session_lock = threading.Lock()
+
+    def __init__(self):
+        if not settings.SUPABASE_API_KEY:
+            raise ImproperlyConfigured("SupabaseStorage needs SUPABASE_API_KEY")
+
+    @classmethod
+    def session(cls):
+        with cls._session_lock:
+            if cls._session is None:
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.DOCUMENT_STORAGE_POOL_SIZE)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                cls._session = session
+        return cls._session
+
+    def request(self, method, url, **kwargs):
+        return self.session().request(method, url, timeout=settings.DOCUMENT_STORAGE_TIMEOUT, **kwargs)
+
+    def auth_headers(self):
+        return {
+            "apikey": settings.SUPABASE_API_KEY,
+            "Authorization": f"Bearer {settings.SUPABASE_API_KEY}",
+        }
+
+    def write_headers(self):
+        # Server-side writes may replace the object, so a retried upload can finish
+        return {**self.auth_headers(), "x-upsert": "true"}
+
+    def tus_headers(self):
+        return {**self.write_headers(), "Tus-Resumable": TUS_VERSION}
+
+    def object_url(self, path):
+        return f"{settings.SUPABASE_URL}/storage/v1/object/{settings.SUPABASE_BUCKET}/{path}"
+
+    def url(self, path):
+        return f"{settings.SUPABASE_URL}/storage/v1/object/public/{settings.SUPABASE_BUCKET}/{path}"
+
+    def signed_upload(self, path, content_type, expires_in):
+        # Supabase keeps signed upload URLs valid for two hours whatever `expires_in` says. Signed
+        # without x-upsert, the link can only create `path`, so callers hand out one-off staging keys
+        # and the upload token (which does honour `expires_in`) bounds when they are finalized.
+        response = self.request(
+            'POST',
+            f"{settings.SUPABASE_URL}/storage/v1/object/upload/sign/{settings.SUPABASE_BUCKET}/{path}",
+            headers=self.auth_headers(),
+        )
+        if response.status_code != 200:
+            raise UploadError(f"Could not sign upload: {response.status_code} - {response.text}")
+        return {
+            "url": f"{settings.SUPABASE_URL}/storage/v1{response.json()['url']}",
+            "method": "PUT",
+            "headers": {"Content-Type": content_type},
+        }
+
+    def stat(self, path):
+        response = self.request('HEAD', self.object_url(path), headers=self.auth_headers())
+        if response.status_code in [400, 404]:
+            return None
+        response.raise_for_status()
+        return {
+            "size": int(response.headers.get('Content-Length', 0)),
+            "content_type": response.headers.get('Content-Type', '').split(';')[0].strip(),
+        }
+
+    def move(self, source, destination):
+        response = self.request(
+            'POST',
+            f"{settings.SUPABASE_URL}/storage/v1/object/move",
+            headers=self.auth_headers(),
+            json={"bucketId": settings.SUPABASE_BUCKET, "sourceKey": source, "destinationKey": destination},
+        )
+        if response.status_code in [400, 404]:
+            return False
+        response.raise_for_status()
+        return True
+
+    def delete(self, path):
+        response = self.request('DELETE', self.object_url(path), headers=self.auth_headers())
+        if response.status_code not in [200, 400, 404]:
+            response.raise_for_status()
+
+    def put(self, file, path, content_type, size):
+        if size > settings.DOCUMENT_RESUMABLE_THRESHOLD:
+            self.resumable_upload(file, path, content_type, size)
+        else:
+            self.stream_upload(file, path, content_type)
+
+    def get(self, path, destination):
+        with self.request('GET', self.object_url(path), headers=self.auth_headers(), stream=True) as response:
+            if response.status_code != 200:
+                raise UploadError(f"Download failed: {response.status_code} - {response.text}")
+            size = 0
+            for chunk in response.iter_content(COPY_BUFFER_SIZE):
+                destination.write(chunk)
+                size += len(chunk)
+        return size
+
+    def stream_upload(self, file, path, content_type):
+        # A file-like body is sent in small blocks with its Content-Length, never loaded whole.
+        # The raw file under an UploadedFile is measured by its bytes, not the declared size.
+        response = self.request(
+            'PUT',
+            self.object_url(path),
+            headers={**self.write_headers(), "Content-Type": content_type},
+            data=getattr(file, 'file', file),
+        )
+        if response.status_code not in [200, 201]:
+            raise UploadError(f"Upload failed: {response.status_code} - {response.text}")
+
+    def resumable_key(self, path, size):
+        return f'resumable-upload:{settings.SUPABASE_BUCKET}/{path}:{size}'
+
+    def create_resumable_upload(self, path, content_type, size):
+        metadata = {"bucketName": settings.SUPABASE_BUCKET, "objectName": path, "contentType": content_type}
+        endpoint = f"{settings.SUPABASE_URL}/storage/v1/upload/resumable"
+        response = self.request(
+            'POST',
+            endpoint,
+            headers={
+                **self.tus_headers(),
+                "Upload-Length": str(size),
+                "Upload-Metadata": ",".join(
+                    f"{name} {base64.b64encode(value.encode()).decode()}" for name, value in metadata.items()
+                ),
+            },
+        )
+        if response.status_code != 201:
+            raise UploadError(f"Could not start resumable upload: {response.status_code} - {response.text}")
+        return urljoin(endpoint, response.headers['Location'])
+
+    def upload_offset(self, upload_url):
+        """Bytes the server already holds for an upload, or None when it no longer exists"""
+        response = self.request('HEAD', upload_url, headers=self.tus_headers())
+        if response.status_code in [404, 410]:
+            return None
+        response.raise_for_status()
+        return int(response.headers['Upload-Offset'])
+
+    def resumable_upload(self, file, path, content_type, size):
+        key = self.resumable_key(path, size)
+        upload_url = cache.get(key)
+        offset = self.upload_offset(upload_url) if upload_url else None
+        if offset is None:
+            upload_url = self.create_resumable_upload(path, content_type, size)
+            cache.set(key, upload_url, RESUMABLE_URL_TTL)
+            offset = 0
+
+        failures = 0
+        while offset < size:
+            file.seek(offset)
+            chunk = file.read(settings.DOCUMENT_UPLOAD_CHUNK_SIZE)
+            try:
+                response = self.request(
+                    'PATCH',
+                    upload_url,
+                    headers={
+                        **self.tus_headers(),
+                        "Upload-Offset": str(offset),
+                        "Content-Type": "application/offset+octet-stream",
+                    },
+                    data=chunk,
+                )
+                response.raise_for_status()
+                offset = int(response.headers['Upload-Offset'])
+            except requests.RequestException as e:
+                failures += 1
+                if failures >= MAX_CHUNK_ATTEMPTS:
+                    raise UploadError(f"Upload interrupted at byte {offset} of {size}: {e}") from e
+                # Continue from whatever the server acknowledged before the failure
+                offset = self.upload_offset(upload_url)
+                if offset is None:
+                    cache.delete(key)
+                    raise UploadError("Resumable upload expired; it will restart on the next attempt") from e
+
+        cache.delete(key)
+
+
+class S3Storage(StorageBackend):
+    """
+    Any S3-compatible bucket (AWS, MinIO, R2, Supabase's S3 endpoint). Large
+    files go up as multipart uploads in DOCUMENT_UPLOAD_CHUNK_SIZE parts.
+    """
+    name = 's3'
+    _client = None
+    _client_lock = threading.Lock()
+
+    @classmethod
+    def client(cls):
+        with cls._client_lock:
+            if cls._client is None:
+                try:
+                    import boto3
+                    from botocore.config import Config
+                except ImportError:
+                    raise ImproperlyConfigured("S3Storage needs boto3: pip install boto3")
+                connect_timeout, read_timeout = settings.DOCUMENT_STORAGE_TIMEOUT
+                cls._client = boto3.client(
+                    's3',
+                    endpoint_url=settings.DOCUMENT_STORAGE_S3_ENDPOINT_URL or None,
+                    region_name=settings.DOCUMENT_STORAGE_S3_REGION or None,
+                    aws_access_key_id=settings.DOCUMENT_STORAGE_S3_ACCESS_KEY_ID or None,
+                    aws_secret_access_key=settings.DOCUMENT_STORAGE_S3_SECRET_ACCESS_KEY or None,
+                    config=Config(
+                        connect_timeout=connect_timeout,
+                        read_timeout=read_timeout,
+                        max_pool_connections=settings.DOCUMENT_STORAGE_POOL_SIZE,
+                    ),
+                )
+        return cls._client
+
+    def transfer_config(self):
+        from boto3.s3.transfer import TransferConfig
+
+        return TransferConfig(
+            multipart_threshold=settings.DOCUMENT_RESUMABLE_THRESHOLD,
+            multipart_chunksize=settings.DOCUMENT_UPLOAD_CHUNK_SIZE,
+        )
+
+    def put(self, file, path, content_type, size):
+        self.client().upload_fileobj(
+            file, settings.DOCUMENT_STORAGE_S3_BUCKET, path,
+            ExtraArgs={'ContentType': content_type}, Config=self.transfer_config(),
+        )
+
+    def get(self, path, destination):
+        start = destination.tell()
+        self.client().download_fileobj(
+            settings.DOCUMENT_STORAGE_S3_BUCKET, path, destination, Config=self.transfer_config(),
+        )
+        return destination.tell() - start
+
+    def url(self, path):
+        return f"{self.public_base_url()}/{path}"
+
+    def public_base_url(self):
+        """DOCUMENT_STORAGE_S3_PUBLIC_URL, or the bucket on its own endpoint when that is unset"""
+        if settings.DOCUMENT_STORAGE_S3_PUBLIC_URL:
+            return settings.DOCUMENT_STORAGE_S3_PUBLIC_URL.rstrip('/')
+        bucket = settings.DOCUMENT_STORAGE_S3_BUCKET
+        if settings.DOCUMENT_STORAGE_S3_ENDPOINT_URL:
+            return f"{settings.DOCUMENT_STORAGE_S3_ENDPOINT_URL.rstrip('/')}/{bucket}"
+        if settings.DOCUMENT_STORAGE_S3_REGION:
+            return f"https://{bucket}.s3.{settings.DOCUMENT_STORAGE_S3_REGION}.amazonaws.com"
+        return f"https://{bucket}.s3.amazonaws.com"
+
+    def signed_upload(self, path, content_type, expires_in):
+        url = self.client().generate_presigned_url(
+            'put_object',
+            Params={'Bucket': settings.DOCUMENT_STORAGE_S3_BUCKET, 'Key': path, 'ContentType': content_type},
+            ExpiresIn=expires_in,
+        )
+        return {"url": url, "method": "PUT", "headers": {"Content-Type": content_type}}
+
+    def stat(self, path):
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client().head_object(Bucket=settings.DOCUMENT_STORAGE_S3_BUCKET, Key=path)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return {"size": head['ContentLength'], "content_type": head.get('ContentType', '')}
+
+    def move(self, source, destination):
+        from botocore.exceptions import ClientError
+
+        bucket = settings.DOCUMENT_STORAGE_S3_BUCKET
+        try:
+            self.client().copy_object(
+                Bucket=bucket, Key=destination, CopySource={'Bucket': bucket, 'Key': source},
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        self.delete(source)
+        return True
+
+    def delete(self, path):
+        self.client().delete_object(Bucket=settings.DOCUMENT_STORAGE_S3_BUCKET, Key=path)
@@ -0,0 +1,170 @@
+# students/testing.py
+"""
+A local stand-in for Supabase storage, for tests and local development.
+
+    with LocalSupabase() as supabase, override_settings(SUPABASE_URL=supabase.url, SUPABASE_API_KEY="test"):
+        ...
+    supabase.objects  # {"student-document/reports/1/a.pdf": b"...", ...}
+
+Supports object PUT, GET, HEAD and DELETE, moves, signed uploads and the TUS resumable endpoints. As on
+Supabase, a PUT without x-upsert can't replace an existing object. `fail_patches`
+makes the first N chunk PATCHes answer 503 after keeping half the chunk, like
+a connection dropped mid-transfer.
+"""
+import base64
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+OBJECT_PREFIX = '/storage/v1/object/'
+MOVE_PATH = '/storage/v1/object/move'
+SIGNED_UPLOAD_PREFIX = '/storage/v1/object/upload/sign/'
+RESUMABLE_PATH = '/storage/v1/upload/resumable'
+
+
+class LocalSupabase:
+    def __init__(self, fail_patches=0):
+        self.fail_patches = fail_patches
+        self.objects = {}
+        self.content_types = {}
+        self.uploads = {}
+        self.requests = []
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        storage = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def body(self):
+                return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+            def reply(self, code, **headers):
+                self.send_response(code)
+                for name, value in headers.items():
+                    self.send_header(name.replace('_', '-'), value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def reply_json(self, code, data):
+                body = json.dumps(data).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_PUT(self):
+                storage.requests.append(('PUT', self.path))
+                path = self.path.split('?')[0]
+                if path.startswith(SIGNED_UPLOAD_PREFIX):
+                    key = path[len(SIGNED_UPLOAD_PREFIX):]
+                elif path.startswith(OBJECT_PREFIX):
+                    key = path[len(OBJECT_PREFIX):]
+                else:
+                    return self.reply(404)
+                body = self.body()
+                if key in storage.objects and self.headers.get('x-upsert') != 'true':
+                    return self.reply_json(400, {"statusCode": "409", "error": "Duplicate"})
+                storage.objects[key] = body
+                storage.content_types[key] = self.headers.get('Content-Type', 'application/octet-stream')
+                self.reply(200)
+
+            def do_GET(self):
+                storage.requests.append(('GET', self.path))
+                content = storage.objects.get(self.path[len(OBJECT_PREFIX):])
+                if content is None:
+                    return self.reply(404)
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_DELETE(self):
+                storage.requests.append(('DELETE', self.path))
+                key = self.path[len(OBJECT_PREFIX):]
+                if storage.objects.pop(key, None) is None:
+                    return self.reply(400)
+                storage.content_types.pop(key, None)
+                self.reply(200)
+
+            def do_POST(self):
+                storage.requests.append(('POST', self.path))
+                body = self.body()
+                if self.path == MOVE_PATH:
+                    move = json.loads(body)
+                    source = f"{move['bucketId']}/{move['sourceKey']}"
+                    destination = f"{move['bucketId']}/{move['destinationKey']}"
+                    if source not in storage.objects:
+                        return self.reply_json(400, {"statusCode": "404", "error": "not_found"})
+                    if destination in storage.objects:
+                        return self.reply_json(400, {"statusCode": "409", "error": "Duplicate"})
+                    storage.objects[destination] = storage.objects.pop(source)
+                    storage.content_types[destination] = storage.content_types.pop(source, None)
+                    return self.reply_json(200, {"message": "Successfully moved"})
+                if self.path.startswith(SIGNED_UPLOAD_PREFIX):
+                    key = self.path[len(SIGNED_UPLOAD_PREFIX):]
+                    return self.reply_json(200, {"url": f"/object/upload/sign/{key}?token={uuid.uuid4().hex}"})
+                if self.path != RESUMABLE_PATH:
+                    return self.reply(404)
+                metadata = dict(item.split(' ') for item in self.headers['Upload-Metadata'].split(','))
+                metadata = {name: base64.b64decode(value).decode() for name, value in metadata.items()}
+                upload_id = uuid.uuid4().hex
+                storage.uploads[upload_id] = {
+                    'key': f"{metadata['bucketName']}/{metadata['objectName']}",
+                    'length': int(self.headers['Upload-Length']),
+                    'data': b'',
+                }
+                self.reply(201, Location=f"{RESUMABLE_PATH}/{upload_id}")
+
+            def do_HEAD(self):
+                storage.requests.append(('HEAD', self.path))
+                if not self.path.startswith(RESUMABLE_PATH):
+                    key = self.path[len(OBJECT_PREFIX):]
+                    if key not in storage.objects:
+                        return self.reply(400)  # Supabase answers 400 for a missing object
+                    self.send_response(200)
+                    self.send_header('Content-Length', str(len(storage.objects[key])))
+                    self.send_header('Content-Type', storage.content_types.get(key, 'application/octet-stream'))
+                    return self.end_headers()
+                upload = storage.uploads.get(self.path.rsplit('/', 1)[-1])
+                if upload is None:
+                    return self.reply(404)
+                self.reply(200, Upload_Offset=str(len(upload['data'])), Upload_Length=str(upload['length']))
+
+            def do_PATCH(self):
+                storage.requests.append(('PATCH', self.path))
+                chunk = self.body()
+                upload = storage.uploads.get(self.path.rsplit('/', 1)[-1])
+                if upload is None:
+                    return self.reply(404)
+                if int(self.headers['Upload-Offset']) != len(upload['data']):
+                    return self.reply(409)
+                if storage.fail_patches > 0:
+                    storage.fail_patches -= 1
+                    upload['data'] += chunk[:len(chunk) // 2]
+                    return self.reply(503)
+                upload['data'] += chunk
+                if len(upload['data']) == upload['length']:
+                    storage.objects[upload['key']] = upload['data']
+                self.reply(204, Upload_Offset=str(len(upload['data'])))
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
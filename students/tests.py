@@ -1,3 +1,449 @@
-from django.test import TestCase
+import datetime
+import hashlib
+import io
+import os
+import tempfile
+from concurrent.futures import TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from advisors.models import Advisor
+from internships.models import Department
+from students.models import Student, InternshipReport, InternshipOfferLetter, DocumentSubmission
+from students.storage import get_storage, metrics, upload_document, S3Storage
+from students.inspection import InspectionError, discard_pool, inspect_pdf
+from students.tasks import upload_offer_letter_task, inspect_report_task
+from students.testing import LocalSupabase
+
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHE,
+    DOCUMENT_STORAGE_BACKEND='students.storage.SupabaseStorage',
+    SUPABASE_API_KEY='test-key',
+    DOCUMENT_UPLOAD_CHUNK_SIZE=1024,
+    DOCUMENT_RESUMABLE_THRESHOLD=2048,
+)
+class SupabaseUploadTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def upload(self, supabase, content, path):
+        with override_settings(SUPABASE_URL=supabase.url):
+            return upload_document(io.BytesIO(content), path, 'application/pdf')
+
+    def test_small_file_is_put_in_one_request(self):
+        with LocalSupabase() as supabase:
+            url = self.upload(supabase, b'%PDF-1.4 small', 'reports/1/a.pdf')
+
+        self.assertTrue(url.endswith('/object/public/student-document/reports/1/a.pdf'))
+        self.assertEqual(supabase.objects['student-document/reports/1/a.pdf'], b'%PDF-1.4 small')
+        self.assertEqual([method for method, _ in supabase.requests], ['PUT'])
+
+    def test_interrupted_chunk_resumes_from_acknowledged_offset(self):
+        content = bytes(range(256)) * 20  # 5120 bytes, five chunks
+        with LocalSupabase(fail_patches=1) as supabase:
+            self.upload(supabase, content, 'reports/1/big.pdf')
+
+        self.assertEqual(supabase.objects['student-document/reports/1/big.pdf'], content)
+        methods = [method for method, _ in supabase.requests]
+        self.assertEqual(methods.count('POST'), 1)
+        self.assertEqual(methods.count('HEAD'), 1)
+        # Half of the failed chunk was kept, so one extra PATCH finishes it
+        self.assertEqual(methods.count('PATCH'), 6)
+
+
+class LocalFileStorageTest(TestCase):
+    def test_round_trip_is_timed(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            DOCUMENT_STORAGE_BACKEND='students.storage.LocalFileStorage',
+            DOCUMENT_STORAGE_LOCAL_ROOT=root,
+            DOCUMENT_STORAGE_LOCAL_URL='/documents/',
+        ):
+            metrics.reset()
+            url = upload_document(io.BytesIO(b'%PDF-1.4 local'), 'offer_letters/7/a.pdf', 'application/pdf')
+            downloaded = io.BytesIO()
+            get_storage().download('offer_letters/7/a.pdf', downloaded)
+
+        self.assertEqual(url, '/documents/offer_letters/7/a.pdf')
+        self.assertEqual(downloaded.getvalue(), b'%PDF-1.4 local')
+        totals = metrics.snapshot()
+        self.assertEqual(totals['local.upload']['bytes'], 14)
+        self.assertEqual(totals['local.download']['count'], 1)
+
+
+
+class StorageSettingsTest(TestCase):
+    @override_settings(DOCUMENT_STORAGE_BACKEND='students.storage.SupabaseStorage', SUPABASE_API_KEY='')
+    def test_supabase_needs_an_api_key(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_storage()
+
+    def test_s3_urls_default_to_the_bucket_endpoint(self):
+        storage = S3Storage()
+        cases = [
+            ({'DOCUMENT_STORAGE_S3_PUBLIC_URL': 'https://cdn.aau.edu.et/'}, 'https://cdn.aau.edu.et/a.pdf'),
+            ({'DOCUMENT_STORAGE_S3_ENDPOINT_URL': 'https://minio.aau.edu.et'}, 'https://minio.aau.edu.et/docs/a.pdf'),
+            ({'DOCUMENT_STORAGE_S3_REGION': 'eu-west-1'}, 'https://docs.s3.eu-west-1.amazonaws.com/a.pdf'),
+            ({}, 'https://docs.s3.amazonaws.com/a.pdf'),
+        ]
+        for overrides, expected in cases:
+            defaults = {
+                'DOCUMENT_STORAGE_S3_BUCKET': 'docs', 'DOCUMENT_STORAGE_S3_PUBLIC_URL': '',
+                'DOCUMENT_STORAGE_S3_ENDPOINT_URL': '', 'DOCUMENT_STORAGE_S3_REGION': '',
+            }
+            with override_settings(**{**defaults, **overrides}):
+                self.assertEqual(storage.url('a.pdf'), expected)
+
+
+def create_student():
+    department = Department.objects.create(
+        name='SE', internship_duration_weeks=8,
+        internship_start=datetime.date(2026, 1, 1), internship_end=datetime.date(2026, 3, 1),
+    )
+    return Student.objects.create(
+        university_id='UGR/1/14', full_name='Abebe Kebede', institutional_email='abebe@aau.edu.et',
+        department=department, assigned_advisor=Advisor.objects.create(first_name='A'), telegram_id='777',
+    )
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHE, DOCUMENT_STORAGE_BACKEND='students.storage.SupabaseStorage', SUPABASE_API_KEY='test-key',
+)
+class DirectUploadTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_student()
+        self.client = APIClient()
+
+    def test_signed_upload_is_finalized_after_object_check(self):
+        content = b'%PDF-1.4 report one'
+        with LocalSupabase() as supabase, override_settings(SUPABASE_URL=supabase.url):
+            issued = self.client.post('/aau_api/student/documents/upload-url/', {
+                'telegram_id': '777', 'kind': 'report', 'report_number': 1,
+                'file_name': 'report 1.pdf', 'content_type': 'application/pdf', 'size': len(content),
+            }, format='json')
+            self.assertEqual(issued.status_code, 200)
+            token = issued.json()['upload_token']
+
+            early = self.client.post('/aau_api/student/documents/finalize/', {
+                'telegram_id': '777', 'upload_token': token,
+            }, format='json')
+            self.assertEqual(early.status_code, 400)
+
+            upload = issued.json()['upload']
+            requests.put(upload['url'], data=content, headers=upload['headers']).raise_for_status()
+            finalized = self.client.post('/aau_api/student/documents/finalize/', {
+                'telegram_id': '777', 'upload_token': token,
+            }, format='json')
+
+        self.assertEqual(finalized.status_code, 201)
+        report = InternshipReport.objects.get(student__telegram_id='777', report_number=1)
+        self.assertEqual(report.sha256, '')  # Taken by the inspection task, which downloads the report anyway
+        path = report.document_url.split('/student-document/', 1)[1]
+        self.assertTrue(path.startswith('reports/777/'))
+        # Only the one-off staging key was signed, without upsert, and it is gone once finalized
+        self.assertNotIn('x-upsert', upload['headers'])
+        self.assertNotIn('reports/', upload['url'])
+        self.assertEqual(list(supabase.objects), [f'student-document/{path}'])
+        self.assertEqual(supabase.objects[f'student-document/{path}'], content)
+
+    def test_local_storage_receives_the_staged_upload(self):
+        content = b'%PDF-1.4 local report'
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            DOCUMENT_STORAGE_BACKEND='students.storage.LocalFileStorage', DOCUMENT_STORAGE_LOCAL_ROOT=root,
+        ):
+            issued = self.client.post('/aau_api/student/documents/upload-url/', {
+                'telegram_id': '777', 'kind': 'report', 'report_number': 1,
+                'file_name': 'report.pdf', 'content_type': 'application/pdf', 'size': len(content),
+            }, format='json').json()
+            put = self.client.generic('PUT', issued['upload']['url'], content, content_type='application/pdf')
+            self.assertEqual(put.status_code, 201)
+            finalized = self.client.post('/aau_api/student/documents/finalize/', {
+                'telegram_id': '777', 'upload_token': issued['upload_token'],
+            }, format='json')
+
+            self.assertEqual(finalized.status_code, 201)
+            report = InternshipReport.objects.get()
+            with open(os.path.join(root, get_storage().path_of(report.document_url)), 'rb') as stored_file:
+                self.assertEqual(stored_file.read(), content)
+            self.assertEqual(os.listdir(os.path.join(root, 'uploads', '777')), [])
+
+    def test_finalized_document_cannot_be_replaced_with_the_upload_link(self):
+        content = b'%PDF-1.4 offer letter'
+        with LocalSupabase() as supabase, override_settings(SUPABASE_URL=supabase.url):
+            issued = self.client.post('/aau_api/student/documents/upload-url/', {
+                'telegram_id': '777', 'kind': 'offer_letter', 'company_name': 'Ethio Telecom',
+                'file_name': 'offer.pdf', 'content_type': 'application/pdf', 'size': len(content),
+            }, format='json').json()
+            upload = issued['upload']
+            requests.put(upload['url'], data=content, headers=upload['headers']).raise_for_status()
+            finalize = {'telegram_id': '777', 'upload_token': issued['upload_token']}
+            finalized = self.client.post('/aau_api/student/documents/finalize/', finalize, format='json')
+            self.assertEqual(finalized.status_code, 201)
+
+            # The link still works on Supabase, but only recreates the staging key...
+            requests.put(upload['url'], data=b'%PDF-1.4 forged', headers=upload['headers']).raise_for_status()
+            # ...and the token can't move it over the finalized document
+            replay = self.client.post('/aau_api/student/documents/finalize/', finalize, format='json')
+
+        self.assertEqual(replay.status_code, 400)
+        offer_letter = InternshipOfferLetter.objects.get()
+        path = offer_letter.document_url.split('/student-document/', 1)[1]
+        self.assertEqual(supabase.objects[f'student-document/{path}'], content)
+
+
+class DocumentDedupeTest(TestCase):
+    def test_resent_report_is_not_stored_again(self):
+        create_student()
+        client = APIClient()
+
+        def send():
+            document = SimpleUploadedFile('report.pdf', b'%PDF-1.4 report', content_type='application/pdf')
+            return client.post('/aau_api/student/upload-report/', {
+                'telegram_id': '777', 'report_number': 1, 'document': document,
+            }, format='multipart')
+
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            DOCUMENT_STORAGE_BACKEND='students.storage.LocalFileStorage', DOCUMENT_STORAGE_LOCAL_ROOT=root,
+        ):
+            metrics.reset()
+            first, second = send(), send()
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['document_url'], first.json()['document_url'])
+        self.assertEqual(metrics.snapshot()['local.upload']['count'], 1)
+        report = InternshipReport.objects.get()
+        self.assertEqual(len(report.sha256), 64)
+
+
+class UploadInspectionTest(TestCase):
+    def test_non_pdf_is_dropped_before_storage(self):
+        create_student()
+        document = SimpleUploadedFile('report.pdf', b'MZ\x90\x00 not a pdf', content_type='application/pdf')
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            DOCUMENT_STORAGE_BACKEND='students.storage.LocalFileStorage', DOCUMENT_STORAGE_LOCAL_ROOT=root,
+        ):
+            metrics.reset()
+            response = APIClient().post('/aau_api/student/upload-report/', {
+                'telegram_id': '777', 'report_number': 1, 'document': document,
+            }, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(metrics.snapshot(), {})
+        self.assertFalse(InternshipReport.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHE, DOCUMENT_STORAGE_BACKEND='students.storage.LocalFileStorage')
+class OfferLetterSubmissionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_student()
+        self.client = APIClient()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        storage_settings = override_settings(DOCUMENT_STORAGE_LOCAL_ROOT=root.name, DOCUMENT_SPOOL_DIR=root.name)
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+
+    def submit(self):
+        document = SimpleUploadedFile('offer.pdf', b'%PDF-1.4 offer letter', content_type='application/pdf')
+        with mock.patch.object(upload_offer_letter_task, 'delay') as delay:
+            response = self.client.post('/aau_api/student/upload-offer-letter/', {
+                'telegram_id': '777', 'company_name': 'Ethio Telecom', 'document': document,
+            }, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        delay.assert_called_once_with(response.json()['submission_id'])
+        return DocumentSubmission.objects.get(pk=response.json()['submission_id'])
+
+    def status(self, submission, telegram_id='777'):
+        return self.client.get(
+            f'/aau_api/student/offer-letter-submissions/{submission.pk}/', {'telegram_id': telegram_id}
+        )
+
+    def test_staged_letter_is_uploaded_and_recorded(self):
+        submission = self.submit()
+        self.assertTrue(os.path.exists(submission.spool_path))
+        self.assertEqual(self.status(submission).json()['status'], 'pending')
+        self.assertEqual(self.status(submission, telegram_id='778').status_code, 404)
+        self.assertEqual(
+            self.client.get(f'/aau_api/student/offer-letter-submissions/{submission.pk}/').status_code, 400
+        )
+
+        upload_offer_letter_task.apply(args=[str(submission.pk)])
+
+        polled = self.status(submission).json()
+        self.assertEqual(polled['status'], 'completed')
+        offer_letter = InternshipOfferLetter.objects.get()
+        self.assertEqual(
+            (offer_letter.company_name, offer_letter.document_url), ('Ethio Telecom', polled['document_url'])
+        )
+        self.assertFalse(os.path.exists(submission.spool_path))
+
+    def test_failure_after_the_upload_fails_the_submission(self):
+        submission = self.submit()
+
+        with mock.patch('students.tasks.record_offer_letter', side_effect=DatabaseError("deadlock detected")) as record:
+            upload_offer_letter_task.apply(args=[str(submission.pk)])
+
+        self.assertEqual(record.call_count, upload_offer_letter_task.max_retries + 1)
+        submission.refresh_from_db()
+        self.assertEqual((submission.status, submission.error), ('failed', "deadlock detected"))
+        self.assertFalse(InternshipOfferLetter.objects.exists())
+        self.assertFalse(os.path.exists(submission.spool_path))
+
+    def test_failed_enqueue_fails_the_submission(self):
+        document = SimpleUploadedFile('offer.pdf', b'%PDF-1.4 offer letter', content_type='application/pdf')
+        with mock.patch.object(upload_offer_letter_task, 'delay', side_effect=ConnectionError("broker down")):
+            response = self.client.post('/aau_api/student/upload-offer-letter/', {
+                'telegram_id': '777', 'company_name': 'Ethio Telecom', 'document': document,
+            }, format='multipart')
+
+        self.assertEqual(response.status_code, 500)
+        submission = DocumentSubmission.objects.get()
+        self.assertEqual((submission.status, submission.error), ('failed', "broker down"))
+        self.assertFalse(os.path.exists(submission.spool_path))
+
+    def test_same_letter_reuses_only_content_addressed_objects(self):
+        sha256 = hashlib.sha256(b'%PDF-1.4 offer letter').hexdigest()
+        # Stored under its file name before keys were content-addressed; that object may have been replaced
+        InternshipReport.objects.create(
+            student=Student.objects.get(), report_number=1, sha256=sha256,
+            document_url='/documents/reports/777/offer.pdf',
+        )
+        metrics.reset()
+
+        first = self.submit()
+        upload_offer_letter_task.apply(args=[str(first.pk)])
+        again = self.submit()
+        upload_offer_letter_task.apply(args=[str(again.pk)])
+
+        first.refresh_from_db()
+        again.refresh_from_db()
+        self.assertEqual(first.document_url, get_storage().url(f'offer_letters/777/{sha256}.pdf'))
+        self.assertEqual((again.status, again.document_url), ('completed', first.document_url))
+        self.assertEqual(metrics.snapshot()['local.upload']['count'], 1)
+        self.assertFalse(os.path.exists(again.spool_path))
+
+
+def make_pdf(*pages):
+    """A minimal PDF with one line of Helvetica text per page"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append((
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objects)} 0 R "
+            f"/Resources << /Font << /F1 3 0 R >> >> >>"
+        ).encode())
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    pdf = io.BytesIO()
+    pdf.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(pdf.tell())
+        pdf.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = pdf.tell()
+    pdf.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        pdf.write(b"%010d 00000 n \n" % offset)
+    pdf.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return pdf.getvalue()
+
+
+@override_settings(CACHES=LOCMEM_CACHE, DOCUMENT_STORAGE_BACKEND='students.storage.LocalFileStorage')
+class ReportInspectionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = create_student()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        storage_settings = override_settings(DOCUMENT_STORAGE_LOCAL_ROOT=root.name, DOCUMENT_SPOOL_DIR=root.name)
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+        self.root = root.name
+
+    def inspect(self, content):
+        url = upload_document(io.BytesIO(content), 'reports/777/report.pdf', 'application/pdf')
+        report = InternshipReport.objects.create(student=self.student, report_number=1, document_url=url)
+        inspect_report_task.apply(args=[report.pk])
+        report.refresh_from_db()
+        return report
+
+    def test_pdf_is_parsed_in_the_pool(self):
+        self.addCleanup(discard_pool)
+        report = self.inspect(make_pdf("Week one at Ethio Telecom", "Week two"))
+
+        self.assertEqual((report.inspection_status, report.page_count), ('inspected', 2))
+        self.assertIn("Week one at Ethio Telecom", report.text)
+        self.assertEqual(os.listdir(self.root), ['reports'])  # The downloaded copy is removed
+
+    def test_download_records_the_digest_of_a_direct_upload(self):
+        content = b'%PDF-1.4\ngarbage\n%%EOF\n'
+        report = self.inspect(content)
+
+        self.assertEqual(report.sha256, hashlib.sha256(content).hexdigest())
+
+    def test_malformed_pdf_fails_inspection(self):
+        report = self.inspect(b'%PDF-1.4\ngarbage\n%%EOF\n')
+
+        self.assertEqual(report.inspection_status, 'failed')
+        self.assertTrue(report.inspection_error.startswith("Unreadable PDF"))
+        self.assertEqual(report.text, '')
+
+    def test_overrunning_or_crashed_parse_discards_the_pool(self):
+        for error, message in [(TimeoutError(), "Parsing took longer than"), (BrokenProcessPool(), "crashed")]:
+            with mock.patch('students.inspection.get_pool') as get_pool, \
+                    mock.patch('students.inspection.discard_pool') as discard:
+                get_pool.return_value.submit.return_value.result.side_effect = error
+                with self.assertRaisesMessage(InspectionError, message):
+                    inspect_pdf('/unused.pdf')
+            discard.assert_called_once_with()
+
+    def test_worker_without_child_processes_parses_in_process(self):
+        path = os.path.join(self.root, 'report.pdf')
+        with open(path, 'wb') as pdf_file:
+            pdf_file.write(make_pdf("In process"))
+
+        with mock.patch('students.inspection.get_pool') as get_pool, \
+                mock.patch('students.inspection.discard_pool') as discard:
+            get_pool.return_value.submit.side_effect = AssertionError(
+                "daemonic processes are not allowed to have children"
+            )
+            page_count, text = inspect_pdf(path)
+
+        self.assertEqual(page_count, 1)
+        self.assertIn("In process", text)
+        discard.assert_called_once_with()
+
+    def test_same_file_reuses_the_earlier_inspection(self):
+        sha256 = 'a' * 64
+        InternshipReport.objects.create(
+            student=self.student, report_number=1, document_url='/documents/reports/777/a.pdf', sha256=sha256,
+            inspection_status='inspected', page_count=3, text="Already parsed",
+        )
+        # Not in storage, so the report would fail if it were downloaded
+        report = InternshipReport.objects.create(
+            student=self.student, report_number=2, document_url='https://elsewhere.example/a.pdf', sha256=sha256,
+        )
+        metrics.reset()
+
+        inspect_report_task.apply(args=[report.pk])
+
+        report.refresh_from_db()
+        self.assertEqual((report.inspection_status, report.page_count, report.text), ('inspected', 3, "Already parsed"))
+        self.assertEqual(metrics.snapshot(), {})
@@ -0,0 +1,98 @@
+# students/uploadhandlers.py
+"""
+Upload handlers for student documents.
+
+HashingUploadHandler sits in front of Django's own handlers and hashes each
+file as its chunks stream past, so the SHA-256 is known as soon as the body
+is parsed without reading the file a second time.
+
+InspectingUploadHandler drops a file at its first chunk when it isn't a PDF
+or is over DOCUMENT_MAX_UPLOAD_SIZE; the rest of it is read and discarded,
+never spooled.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from rest_framework import status
+
+from .inspection import looks_like_pdf
+
+FORM_OVERHEAD = 64 * 1024  # Room for the other form fields and multipart headers
+
+
+class HashingUploadHandler(FileUploadHandler):
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.hashes = {}
+        self.digests = {}
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.hashes[field_name] = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hashes[self.field_name].update(raw_data)
+        return raw_data  # Passed on to the handler that stores the file
+
+    def file_complete(self, file_size):
+        self.digests[self.field_name] = self.hashes.pop(self.field_name).hexdigest()
+        return None  # The next handler returns the file
+
+    def digest(self, field_name):
+        return self.digests.get(field_name, '')
+
+
+class HashedUploadMixin:
+    """For DRF views: hash every uploaded file; `self.upload_hasher.digest(field)` gives its SHA-256"""
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Installed before DRF wraps the request, so nothing has parsed the body yet
+        self.upload_hasher = HashingUploadHandler(request)
+        request.upload_handlers.insert(0, self.upload_hasher)
+        return super().initialize_request(request, *args, **kwargs)
+
+
+class InspectingUploadHandler(FileUploadHandler):
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.body_too_large = False
+        self.rejections = {}
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.body_too_large = content_length > settings.DOCUMENT_MAX_UPLOAD_SIZE + FORM_OVERHEAD
+
+    def receive_data_chunk(self, raw_data, start):
+        if start == 0:
+            if self.body_too_large:
+                self.reject("File is too large", status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            if not looks_like_pdf(raw_data):
+                self.reject("The file is not a valid PDF document.", status.HTTP_400_BAD_REQUEST)
+        if start + len(raw_data) > settings.DOCUMENT_MAX_UPLOAD_SIZE:
+            # The request didn't announce its length honestly
+            self.reject("File is too large", status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+    def reject(self, message, status_code):
+        self.rejections[self.field_name] = (message, status_code)
+        raise SkipFile
+
+    def rejection(self, field_name):
+        """(message, status code) when the file in `field_name` was dropped, or None"""
+        return self.rejections.get(field_name)
+
+
+class InspectedUploadMixin:
+    """
+    For DRF views: drop uploads that fail the first-chunk checks; after the
+    body is parsed, `self.upload_inspector.rejection(field)` says why.
+    Listed after HashedUploadMixin, it runs first, so dropped files aren't hashed.
+    """
+
+    def initialize_request(self, request, *args, **kwargs):
+        self.upload_inspector = InspectingUploadHandler(request)
+        request.upload_handlers.insert(0, self.upload_inspector)
+        return super().initialize_request(request, *args, **kwargs)
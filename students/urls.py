@@ -4,7 +4,11 @@ from .views import (
     InternshipOfferLetterUploadView,
     InternshipReportUploadView,
     OfferLetterStatusView,
-    ReportStatusView
+    ReportStatusView,
+    DocumentSubmissionStatusView,
+    SignedUploadView,
+    FinalizeUploadView,
+    LocalDocumentUploadView,
 )
 
 urlpatterns = [
@@ -13,4 +17,8 @@ urlpatterns = [
     path("upload-report/", InternshipReportUploadView.as_view(), name="upload-report"),
     path("offer-letter-status/", OfferLetterStatusView.as_view(), name="offer-letter-status"),
     path("report-status/", ReportStatusView.as_view(), name="report-status"),
+    path("offer-letter-submissions/<uuid:submission_id>/", DocumentSubmissionStatusView.as_view(), name="offer-letter-submission"),
+    path("documents/upload-url/", SignedUploadView.as_view(), name="document-upload-url"),
+    path("documents/finalize/", FinalizeUploadView.as_view(), name="document-finalize"),
+    path("documents/local-upload/<str:token>/", LocalDocumentUploadView.as_view(), name="local-document-upload"),
 ]
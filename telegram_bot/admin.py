@@ -1,4 +1,5 @@
 from django.contrib import admin
-from .models import OTPVerification
+from .models import OTPVerification, PendingStatusUpdate
 
 admin.site.register(OTPVerification)
+admin.site.register(PendingStatusUpdate)
@@ -0,0 +1,114 @@
+# telegram_bot/dispatcher.py
+"""
+Queued internship status pushes to the Telegram bot.
+
+Views call `queue_status_update()` inside their transaction; it upserts one
+PendingStatusUpdate per telegram_id, so several changes before the next send
+collapse into the latest status. After commit a single dispatch task drains
+due rows in batches through the configured transport, backing off
+exponentially on rows whose send failed.
+"""
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+from .models import PendingStatusUpdate
+
+DISPATCH_SCHEDULED_KEY = 'telegram-status-dispatch-scheduled'
+BACKOFF_BASE_SECONDS = 15
+BACKOFF_MAX_SECONDS = 30 * 60
+
+
+class HttpStatusTransport:
+    """POSTs each update to the bot's /update-status endpoint over one keep-alive session"""
+    _session = None
+
+    @classmethod
+    def session(cls):
+        if cls._session is None:
+            session = requests.Session()
+            session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            cls._session = session
+        return cls._session
+
+    def send(self, telegram_id, status):
+        response = self.session().post(
+            f"{settings.TELEGRAM_BOT_URL.rstrip('/')}/update-status",
+            json={"telegram_id": telegram_id, "status": status},
+            timeout=settings.TELEGRAM_BOT_TIMEOUT,
+        )
+        response.raise_for_status()
+
+
+def get_transport():
+    return import_string(settings.TELEGRAM_BOT_TRANSPORT)()
+
+
+def queue_status_update(telegram_id, status):
+    """Record the student's latest status for the bot and dispatch it after commit"""
+    if not telegram_id:
+        return
+    PendingStatusUpdate.objects.update_or_create(
+        telegram_id=telegram_id,
+        defaults={"status": status, "attempts": 0, "next_attempt_at": timezone.now(), "last_error": ""},
+    )
+    transaction.on_commit(schedule_dispatch)
+
+
+def schedule_dispatch(countdown=0):
+    from .tasks import dispatch_status_updates_task
+
+    if cache.add(DISPATCH_SCHEDULED_KEY, 1, timeout=countdown + 60):
+        dispatch_status_updates_task.apply_async(countdown=countdown)
+
+
+def backoff_seconds(attempts):
+    return min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+
+
+def dispatch_due_updates(transport=None):
+    """
+    Send one batch of due updates. Returns (sent, seconds until the next
+    dispatch should run or None when nothing is left to retry).
+    """
+    transport = transport or get_transport()
+    now = timezone.now()
+    due = list(
+        PendingStatusUpdate.objects.filter(
+            next_attempt_at__lte=now, attempts__lt=settings.TELEGRAM_STATUS_MAX_ATTEMPTS
+        ).order_by('updated_at')[:settings.TELEGRAM_STATUS_BATCH_SIZE]
+    )
+
+    sent = 0
+    for update in due:
+        try:
+            transport.send(update.telegram_id, update.status)
+        except Exception as e:
+            attempts = update.attempts + 1
+            # Only back off the status we tried; a newer one queued meanwhile goes out as is
+            PendingStatusUpdate.objects.filter(pk=update.pk, updated_at=update.updated_at).update(
+                attempts=attempts,
+                next_attempt_at=now + timedelta(seconds=backoff_seconds(attempts)),
+                last_error=str(e)[:1000],
+            )
+        else:
+            PendingStatusUpdate.objects.filter(pk=update.pk, updated_at=update.updated_at).delete()
+            sent += 1
+
+    return sent, next_dispatch_wait()
+
+
+def next_dispatch_wait():
+    """Seconds until the earliest queued update is due, or None when nothing is left to send"""
+    remaining = PendingStatusUpdate.objects.filter(attempts__lt=settings.TELEGRAM_STATUS_MAX_ATTEMPTS)
+    next_attempt_at = remaining.order_by('next_attempt_at').values_list('next_attempt_at', flat=True).first()
+    if next_attempt_at is None:
+        return None
+    return max((next_attempt_at - timezone.now()).total_seconds(), 0)
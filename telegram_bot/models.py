@@ -18,3 +18,19 @@ class OTPVerification(models.Model):
 
     def __str__(self):
         return f"{self.university_id} - {self.otp_code}"
+
+
+class PendingStatusUpdate(models.Model):
+    """
+    The latest internship status to push to a student's Telegram chat. One row
+    per telegram_id: a newer status replaces one that has not been sent yet.
+    """
+    telegram_id = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=20)
+    updated_at = models.DateTimeField(auto_now=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now, db_index=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.telegram_id} -> {self.status}"
@@ -1,20 +1,34 @@
 from celery import shared_task
-from django.core.mail import send_mail
-from .models import OTPVerification
-import random
-from django.utils import timezone
+from django.core.cache import cache
+from .dispatcher import DISPATCH_SCHEDULED_KEY, dispatch_due_updates, next_dispatch_wait, schedule_dispatch
+
+DISPATCH_LOCK_KEY = 'telegram-status-dispatch-lock'
+DISPATCH_LOCK_SECONDS = 300
+RETRY_FAILED_AFTER_SECONDS = 60
+
 
 @shared_task(bind=True, max_retries=3)
-def send_otp_email_task(self, university_id, student_name, student_email, otp_code):
+def dispatch_status_updates_task(self):
+    """Push queued status updates to the Telegram bot; only one dispatch runs at a time"""
+    cache.delete(DISPATCH_SCHEDULED_KEY)
+    if not cache.add(DISPATCH_LOCK_KEY, 1, timeout=DISPATCH_LOCK_SECONDS):
+        # The running dispatch picks up new updates, or reschedules itself below
+        return
+
     try:
-        send_mail(
-            subject="Your AAU Internship OTP Code",
-            message=f"Hello {student_name},\n\nYour OTP code is: {otp_code}\nIt is valid for 10 minutes.\n\nAAU Internship Team",
-            from_email="aau57.sis@gmail.com",
-            recipient_list=[student_email],
-            fail_silently=False,
-        )
-        return f"OTP email sent to {student_email}"
+        sent, _ = dispatch_due_updates()
     except Exception as e:
-        # Retry after 30 seconds if email fails
-        self.retry(countdown=30, exc=e)
+        cache.delete(DISPATCH_LOCK_KEY)
+        if self.request.retries >= self.max_retries:
+            # Queued updates must not wait for some unrelated status change to schedule the next dispatch
+            schedule_dispatch(countdown=RETRY_FAILED_AFTER_SECONDS)
+            raise
+        raise self.retry(countdown=30, exc=e)
+    cache.delete(DISPATCH_LOCK_KEY)
+
+    # Next batch, or the earliest backed-off retry; measured after the lock is released,
+    # so updates committed while the batch was sending are picked up too
+    wait = next_dispatch_wait()
+    if wait is not None:
+        schedule_dispatch(countdown=int(wait) + 1 if wait else 0)
+    return f"{sent} status updates sent"
@@ -0,0 +1,56 @@
+# telegram_bot/testing.py
+"""
+A local stand-in for the Telegram bot host, for tests and local development.
+
+    with LocalBot() as bot, override_settings(TELEGRAM_BOT_URL=bot.url):
+        ...
+    bot.updates  # [{"telegram_id": ..., "status": ...}, ...]
+
+`fail_times` makes the first N requests answer 503, like a cold-starting host.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LocalBot:
+    def __init__(self, fail_times=0):
+        self.fail_times = fail_times
+        self.updates = []
+        self.requests = 0
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        bot = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                bot.requests += 1
+                if self.path != '/update-status':
+                    self.send_response(404)
+                elif bot.requests <= bot.fail_times:
+                    self.send_response(503)
+                else:
+                    bot.updates.append(body)
+                    self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,3 +1,74 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from telegram_bot.dispatcher import dispatch_due_updates, queue_status_update
+from telegram_bot.models import PendingStatusUpdate
+from telegram_bot.tasks import dispatch_status_updates_task, RETRY_FAILED_AFTER_SECONDS
+from telegram_bot.testing import LocalBot
+
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+@mock.patch('telegram_bot.tasks.dispatch_status_updates_task.apply_async')
+class StatusDispatcherTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_updates_for_one_student_coalesce(self, apply_async):
+        with self.captureOnCommitCallbacks(execute=True):
+            queue_status_update('1001', 'Approved')
+            queue_status_update('1001', 'Completed')
+            queue_status_update('1002', 'Rejected')
+
+        self.assertEqual(apply_async.call_count, 1)
+        with LocalBot() as bot, override_settings(TELEGRAM_BOT_URL=bot.url):
+            sent, wait = dispatch_due_updates()
+
+        self.assertEqual(sent, 2)
+        self.assertIsNone(wait)
+        self.assertCountEqual(bot.updates, [
+            {'telegram_id': '1001', 'status': 'Completed'},
+            {'telegram_id': '1002', 'status': 'Rejected'},
+        ])
+        self.assertFalse(PendingStatusUpdate.objects.exists())
+
+    def test_failed_send_backs_off(self, apply_async):
+        queue_status_update('1001', 'Approved')
+
+        with LocalBot(fail_times=1) as bot, override_settings(TELEGRAM_BOT_URL=bot.url):
+            sent, wait = dispatch_due_updates()
+
+        self.assertEqual(sent, 0)
+        self.assertGreater(wait, 0)
+        update = PendingStatusUpdate.objects.get(telegram_id='1001')
+        self.assertEqual(update.attempts, 1)
+        self.assertIn('503', update.last_error)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DispatchTaskTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_dispatch_that_keeps_failing_reschedules_itself(self):
+        queue_status_update('1001', 'Approved')
+        with mock.patch('telegram_bot.tasks.dispatch_due_updates', side_effect=RuntimeError("database went away")), \
+                mock.patch('telegram_bot.tasks.schedule_dispatch') as schedule_dispatch:
+            dispatch_status_updates_task.apply()
+
+        schedule_dispatch.assert_called_once_with(countdown=RETRY_FAILED_AFTER_SECONDS)
+
+    def test_update_queued_during_the_batch_is_dispatched(self):
+        def queue_meanwhile():
+            queue_status_update('1002', 'Rejected')
+            return 1, None
+
+        with mock.patch('telegram_bot.tasks.dispatch_due_updates', side_effect=queue_meanwhile), \
+                mock.patch('telegram_bot.tasks.schedule_dispatch') as schedule_dispatch:
+            dispatch_status_updates_task.apply()
+
+        schedule_dispatch.assert_called_once_with(countdown=0)
@@ -1,5 +1,6 @@
 import random
-from django.core.mail import send_mail
+from django.core.mail import send_mail, EmailMessage
+from django.db import transaction
 from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -7,7 +8,8 @@ from rest_framework import status
 from rest_framework.permissions import AllowAny
 from internships.models import ThirdYearStudentList  
 from .models import OTPVerification
-from .tasks import send_otp_email_task
+from notifications import outbox
+from notifications.models import EmailOutbox
 
 
 class SendOTPView(APIView):
@@ -26,22 +28,23 @@ class SendOTPView(APIView):
         otp_code = str(random.randint(100000, 999999))
 
 
-        otp_entry, created = OTPVerification.objects.update_or_create(
-            university_id=university_id,
-            defaults={
-                "otp_code": otp_code,
-                "created_at": timezone.now(),
-                "attempt_count": 0,
-                "locked_until": None,
-                "otp_verified": False  
-            }
-        )
-
-        send_otp_email_task.delay(
-            university_id, 
-            student.full_name, 
-            student.institutional_email, 
-            otp_code
-        )
+        with transaction.atomic():
+            otp_entry, created = OTPVerification.objects.update_or_create(
+                university_id=university_id,
+                defaults={
+                    "otp_code": otp_code,
+                    "created_at": timezone.now(),
+                    "attempt_count": 0,
+                    "locked_until": None,
+                    "otp_verified": False  
+                }
+            )
+
+            outbox.enqueue(EmailMessage(
+                subject="Your AAU Internship OTP Code",
+                body=f"Hello {student.full_name},\n\nYour OTP code is: {otp_code}\nIt is valid for 10 minutes.\n\nAAU Internship Team",
+                from_email="aau57.sis@gmail.com",
+                to=[student.institutional_email],
+            ), priority=EmailOutbox.PRIORITY_URGENT)
 
         return Response({"message": "OTP has been sent to your institutional email."}, status=status.HTTP_200_OK)
@@ -0,0 +1,179 @@
+"""
+Generation-counter cache namespaces.
+
+Every cached view response is stored under a key that embeds the current
+generation of the namespaces it depends on (an advisor, a student, a
+telegram_id or the global admin lists). Invalidating a namespace is a single
+INCR of its generation key: the old entries simply stop being addressed and
+expire on their own TTL, so no keyspace SCAN is needed.
+
+Invalidations raised inside a transaction are collected and deduplicated,
+then flushed once on commit in a single pipelined Redis round trip. A
+rolled-back transaction flushes nothing.
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+ADMIN_NAMESPACE = 'admin'
+
+
+def advisor_namespace(advisor_id):
+    return f'advisor:{advisor_id}'
+
+
+def student_namespace(university_id):
+    return f'student:{university_id}'
+
+
+def telegram_namespace(telegram_id):
+    return f'telegram:{telegram_id}'
+
+
+def generation_key(namespace):
+    return f'cachegen:{namespace}'
+
+
+def initial_generation():
+    # Time-based so a generation key lost to eviction never restarts at a
+    # value an older cached entry was built with
+    return time.time_ns() // 1000
+
+
+def bump(*namespaces):
+    """Invalidate every response cached under the given namespaces (deferred to commit inside a transaction)"""
+    namespaces = {namespace for namespace in namespaces if namespace}
+    if not namespaces:
+        return
+
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        flush_generations(namespaces)
+        return
+
+    batch = getattr(_local, 'batch', None)
+    if batch is None or not batch.is_scheduled(connection):
+        batch = InvalidationBatch()
+        _local.batch = batch
+        transaction.on_commit(batch.flush)
+    batch.namespaces.update(namespaces)
+
+
+class InvalidationBatch:
+    """Namespaces invalidated during one transaction, flushed by a single on_commit hook"""
+
+    def __init__(self):
+        self.namespaces = set()
+        self.flushed = False
+
+    def is_scheduled(self, connection):
+        # A rollback drops our hook from the connection; start a new batch then
+        if self.flushed:
+            return False
+        return any(entry[1] == self.flush for entry in connection.run_on_commit)
+
+    def flush(self):
+        self.flushed = True
+        flush_generations(self.namespaces)
+
+
+_local = threading.local()
+
+
+def get_redis_client():
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def flush_generations(namespaces):
+    keys = [generation_key(namespace) for namespace in namespaces]
+    if not keys:
+        return
+
+    client = get_redis_client()
+    if client is None:
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, initial_generation(), timeout=None)
+        return
+
+    pipeline = client.pipeline(transaction=False)
+    for key in keys:
+        redis_key = cache.make_key(key)
+        pipeline.set(redis_key, initial_generation(), nx=True)
+        pipeline.incr(redis_key)
+    pipeline.execute()
+
+
+def current_generations(namespaces):
+    keys = {generation_key(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(list(keys))
+    generations = {}
+    for key, namespace in keys.items():
+        if key not in found:
+            cache.add(key, initial_generation(), timeout=None)
+            found[key] = cache.get(key)
+        generations[namespace] = found[key]
+    return generations
+
+
+def response_cache_key(request, namespaces):
+    generations = current_generations(namespaces)
+    user_id = request.user.pk if request.user.is_authenticated else 'anon'
+    fingerprint = '|'.join([
+        request.get_full_path(),
+        str(user_id),
+        *(f'{namespace}={generations[namespace]}' for namespace in sorted(generations)),
+    ])
+    return f'view:{request.path}:{hashlib.sha1(fingerprint.encode()).hexdigest()}'
+
+
+def cache_response(timeout, namespaces):
+    """
+    Cache a DRF view method's 200 responses per user and URL, keyed on the
+    generations of the namespaces returned by `namespaces(view, request, *args, **kwargs)`.
+    Returning None from `namespaces` skips the cache for that request.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            names = namespaces(view, request, *args, **kwargs)
+            if names is None:
+                return view_method(view, request, *args, **kwargs)
+
+            key = response_cache_key(request, names)
+            cached = cache.get(key)
+            if cached is not None:
+                data, status_code = cached
+                return Response(data, status=status_code)
+
+            response = view_method(view, request, *args, **kwargs)
+            if isinstance(response, Response) and response.status_code == 200:
+                cache.set(key, (response.data, response.status_code), timeout)
+            return response
+        return wrapper
+    return decorator
+
+
+def advisor_namespaces(view, request, *args, **kwargs):
+    advisor = getattr(request.user, 'advisor', None)
+    return [advisor_namespace(advisor.id)] if advisor else None
+
+
+def telegram_namespaces(view, request, *args, **kwargs):
+    telegram_id = request.query_params.get('telegram_id')
+    return [telegram_namespace(telegram_id)] if telegram_id else None
+
+
+def admin_namespaces(view, request, *args, **kwargs):
+    return [ADMIN_NAMESPACE]
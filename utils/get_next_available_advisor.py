@@ -1,8 +1,7 @@
+from advisors.assignment import AdvisorAssignmentEngine
 from advisors.models import Advisor
-from django.db.models import Count
 
 def get_next_available_advisor():
-    advisors = Advisor.objects.annotate(
-        student_count=Count('thirdyearstudentlist')
-    ).order_by('student_count', 'first_name')
-    return advisors.first() if advisors.exists() else None
+    """The advisor the assignment engine would pick next, or None when every advisor is full"""
+    advisor_id = AdvisorAssignmentEngine().next_advisor_id()
+    return Advisor.objects.filter(pk=advisor_id).first() if advisor_id else None